@@ -1,8 +1,14 @@
 from flask import Flask
 from flask_login import LoginManager
 
+from .busca import busca_fts_disponivel
+from .cache import CacheTTL, CacheVersionado, JanelaDeduplicacao, LRUCache
+from .cadastros import garantir_versao
+from .eventos import BarramentoEventos
+from .importacao import ExecutorImportacoes, encerrar_jobs_interrompidos
+from .ingestao import FilaIngestao, MetricasIngestao, instalar_sigterm
 from .models import Configuracao, User, db
-from .rfid import rfid_bp
+from .rfid import gravar_leituras, rfid_bp
 from .routes import main_bp, seed_tamanhos, seed_tipos_peca
 
 
@@ -12,6 +18,26 @@ def create_app(config_overrides: dict | None = None) -> Flask:
         SECRET_KEY="change-me",
         SQLALCHEMY_DATABASE_URI="postgresql+psycopg://controle:controle123@db:5432/controle_enxoval",
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        CADASTROS_VERIFICACAO_SEGUNDOS=2,
+        DASHBOARD_TTL_SEGUNDOS=30,
+        ITENS_CONTAGEM="estimada",
+        ITENS_CONTAGEM_TTL_SEGUNDOS=30,
+        IMPORTACAO_LOTE=1000,
+        IMPORTACAO_EM_SEGUNDO_PLANO=True,
+        IMPORTACAO_TRABALHADORES=1,
+        IMPORTACAO_DIRETORIO=None,
+        RFID_LOTE_MAXIMO=1000,
+        RFID_VARREDURA_MAXIMO=50000,
+        RFID_CACHE_TAMANHO=20000,
+        RFID_JANELA_DEDUP_SEGUNDOS=10,
+        RFID_INGESTAO_ASSINCRONA=False,
+        RFID_FILA_CAPACIDADE=10000,
+        RFID_FILA_LOTE=500,
+        RFID_FILA_INTERVALO_MS=200,
+        RFID_EVENTOS_BUFFER=100,
+        RFID_EVENTOS_KEEPALIVE_SEGUNDOS=15,
+        RFID_STATUS_TTL_SEGUNDOS=5,
+        RFID_SINCRONIZACAO_MARGEM_SEGUNDOS=60,
     )
 
     app.config.from_prefixed_env()
@@ -19,6 +45,32 @@ def create_app(config_overrides: dict | None = None) -> Flask:
         app.config.update(config_overrides)
 
     db.init_app(app)
+    app.extensions["cache_tags_rfid"] = LRUCache(app.config["RFID_CACHE_TAMANHO"])
+    app.extensions["dedup_rfid"] = JanelaDeduplicacao(app.config["RFID_JANELA_DEDUP_SEGUNDOS"])
+    app.extensions["metricas_ingestao_rfid"] = MetricasIngestao()
+    app.extensions["cache_status_rfid"] = CacheTTL(app.config["RFID_STATUS_TTL_SEGUNDOS"])
+    app.extensions["cache_cadastros"] = CacheVersionado(
+        app.config["CADASTROS_VERIFICACAO_SEGUNDOS"]
+    )
+    app.extensions["cache_dashboard"] = CacheTTL(
+        app.config["DASHBOARD_TTL_SEGUNDOS"], tamanho_maximo=1
+    )
+    app.extensions["cache_contagem_itens"] = CacheTTL(
+        app.config["ITENS_CONTAGEM_TTL_SEGUNDOS"], tamanho_maximo=256
+    )
+    app.extensions["eventos"] = BarramentoEventos(app.config["RFID_EVENTOS_BUFFER"])
+    app.extensions["importacoes"] = ExecutorImportacoes(
+        app, app.config["IMPORTACAO_TRABALHADORES"]
+    )
+    app.extensions["fila_ingestao_rfid"] = FilaIngestao(
+        app,
+        gravar_leituras,
+        capacidade=app.config["RFID_FILA_CAPACIDADE"],
+        tamanho_lote=app.config["RFID_FILA_LOTE"],
+        intervalo_ms=app.config["RFID_FILA_INTERVALO_MS"],
+    )
+    if app.config["RFID_INGESTAO_ASSINCRONA"]:
+        instalar_sigterm()
 
     login_manager = LoginManager()
     login_manager.login_view = "main.login"
@@ -30,6 +82,9 @@ def create_app(config_overrides: dict | None = None) -> Flask:
 
     with app.app_context():
         db.create_all()
+        app.extensions["busca_fts_itens"] = busca_fts_disponivel(db.engine)
+        garantir_versao()
+        encerrar_jobs_interrompidos()
         if not Configuracao.query.first():
             db.session.add(Configuracao(periodicidade_revisao_dias=7))
             db.session.commit()
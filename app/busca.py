@@ -0,0 +1,85 @@
+"""Busca de peças por trecho do nome ou do código.
+
+No PostgreSQL, os índices de trigramas (pg_trgm) declarados em
+EnxovalItem atendem o ILIKE '%termo%'. Termos com menos de três
+caracteres não formam trigramas: continuam procurando o trecho em
+qualquer posição, com ILIKE sem índice, como as demais buscas sem FTS.
+
+No SQLite, a busca usa a tabela FTS5 ``enxoval_busca`` (tokenizador
+trigram), mantida por triggers a cada inserção, alteração ou exclusão em
+enxoval_items. Bancos criados antes dela passam a usá-la depois de
+``python scripts/migrar.py criar_busca_textual``; até lá, a busca volta
+ao ILIKE sem índice.
+"""
+
+from sqlalchemy import DDL, column, event, inspect, or_, select, table, text
+from sqlalchemy.engine import Connection, Engine
+
+from .models import EnxovalItem
+
+TAMANHO_MINIMO_TRIGRAMA = 3
+TABELA_FTS = "enxoval_busca"
+
+# Índices de EnxovalItem usados pela busca no PostgreSQL; exigem a extensão
+# pg_trgm, criada antes deles.
+INDICES_BUSCA = frozenset({"ix_enxoval_items_nome_trgm", "ix_enxoval_items_codigo_trgm"})
+
+BUSCA_ITENS = table(TABELA_FTS, column("rowid"), column(TABELA_FTS))
+
+DDL_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS} USING fts5("
+    "nome, codigo, content='enxoval_items', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON enxoval_items BEGIN "
+    f"INSERT INTO {TABELA_FTS}(rowid, nome, codigo) VALUES (new.id, new.nome, new.codigo); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON enxoval_items BEGIN "
+    f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, codigo) "
+    "VALUES ('delete', old.id, old.nome, old.codigo); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF nome, codigo "
+    "ON enxoval_items BEGIN "
+    f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, nome, codigo) "
+    "VALUES ('delete', old.id, old.nome, old.codigo); "
+    f"INSERT INTO {TABELA_FTS}(rowid, nome, codigo) VALUES (new.id, new.nome, new.codigo); "
+    "END",
+)
+
+# Bancos novos: db.create_all() já cria a extensão, a tabela FTS e os triggers.
+event.listen(
+    EnxovalItem.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for _comando in DDL_FTS:
+    event.listen(
+        EnxovalItem.__table__, "after_create", DDL(_comando).execute_if(dialect="sqlite")
+    )
+
+
+def criar_busca_fts(conexao: Connection) -> None:
+    """Cria a tabela FTS5 e os triggers (SQLite) e reindexa as peças existentes."""
+    for comando in DDL_FTS:
+        conexao.execute(text(comando))
+    conexao.execute(text(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')"))
+
+
+def busca_fts_disponivel(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite" and inspect(engine).has_table(TABELA_FTS)
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def filtro_busca(termo: str, *, usar_fts: bool = False):
+    """Condição de busca por ``termo`` em qualquer trecho do nome ou do código."""
+    if usar_fts and len(termo) >= TAMANHO_MINIMO_TRIGRAMA:
+        frase = '"{}"'.format(termo.replace('"', '""'))
+        return EnxovalItem.id.in_(
+            select(BUSCA_ITENS.c.rowid).where(BUSCA_ITENS.c[TABELA_FTS].match(frase))
+        )
+    padrao = f"%{_escapar_like(termo)}%"
+    return or_(
+        EnxovalItem.nome.ilike(padrao, escape="\\"),
+        EnxovalItem.codigo.ilike(padrao, escape="\\"),
+    )
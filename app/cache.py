@@ -0,0 +1,257 @@
+"""Estruturas de cache em memória usadas pela aplicação.
+
+Os caches vivem no processo e são guardados em ``app.extensions``,
+de modo que cada aplicação (inclusive as criadas nos testes) tenha
+os seus próprios.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class LRUCache:
+    """Cache LRU de tamanho limitado e seguro entre threads.
+
+    Mantém contadores de acertos, falhas e despejos para permitir
+    dimensionar o tamanho máximo em produção.
+    """
+
+    def __init__(self, tamanho_maximo: int) -> None:
+        self.tamanho_maximo = max(tamanho_maximo, 0)
+        self._dados: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def obter(self, chave: Hashable) -> Any | None:
+        with self._lock:
+            try:
+                valor = self._dados[chave]
+            except KeyError:
+                self.falhas += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def definir(self, chave: Hashable, valor: Any) -> None:
+        if not self.tamanho_maximo:
+            return
+        with self._lock:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self.despejos += 1
+
+    def invalidar(self, *chaves: Hashable) -> None:
+        with self._lock:
+            for chave in chaves:
+                self._dados.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "tamanho": len(self._dados),
+                "tamanho_maximo": self.tamanho_maximo,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None,
+            }
+
+
+class JanelaDeduplicacao:
+    """Descarta eventos repetidos dentro de uma janela de tempo.
+
+    Guarda apenas o instante (relógio monotônico) do último evento aceito
+    de cada chave, em ordem de chegada, o que permite expirar as chaves
+    antigas pelo início da fila sem varrer a estrutura inteira.
+    """
+
+    def __init__(self, segundos: float, tamanho_maximo: int = 100_000) -> None:
+        self.segundos = segundos
+        self.tamanho_maximo = tamanho_maximo
+        self._vistos: OrderedDict[Hashable, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.eventos = 0
+        self.suprimidos = 0
+
+    def registrar(self, chave: Hashable) -> bool:
+        """Registra um evento; retorna False se ele é repetido dentro da janela."""
+        agora = time.monotonic()
+        with self._lock:
+            self.eventos += 1
+            if self.segundos <= 0:
+                return True
+            self._expirar(agora)
+            if chave in self._vistos:
+                self.suprimidos += 1
+                return False
+            self._vistos[chave] = agora
+            while len(self._vistos) > self.tamanho_maximo:
+                self._vistos.popitem(last=False)
+            return True
+
+    def descartar(self, *chaves: Hashable) -> None:
+        """Esquece chaves registradas cujo evento não chegou a ser aplicado."""
+        with self._lock:
+            for chave in chaves:
+                self._vistos.pop(chave, None)
+
+    def _expirar(self, agora: float) -> None:
+        while self._vistos:
+            chave, instante = next(iter(self._vistos.items()))
+            if agora - instante < self.segundos:
+                break
+            del self._vistos[chave]
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "janela_segundos": self.segundos,
+                "chaves": len(self._vistos),
+                "eventos": self.eventos,
+                "suprimidos": self.suprimidos,
+                "taxa_supressao": (
+                    round(self.suprimidos / self.eventos, 4) if self.eventos else None
+                ),
+            }
+
+
+class CacheTTL:
+    """Cache de valores calculados que expiram após alguns segundos.
+
+    O cálculo de uma chave é feito por uma única thread de cada vez
+    (single-flight): requisições simultâneas esperam o resultado em
+    vez de repetir a mesma consulta. Um valor cujo cálculo começou antes
+    de ``invalidar``/``limpar`` é devolvido a quem o pediu, mas não é
+    guardado: ele pode não refletir a alteração que motivou a invalidação.
+    """
+
+    def __init__(self, segundos: float, tamanho_maximo: int = 128) -> None:
+        self.segundos = segundos
+        self.tamanho_maximo = tamanho_maximo
+        self._dados: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._travas: dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.acertos = 0
+        self.calculos = 0
+
+    def _valido(self, chave: Hashable, agora: float) -> bool:
+        entrada = self._dados.get(chave)
+        return entrada is not None and agora - entrada[0] < self.segundos
+
+    def obter(self, chave: Hashable, calcular: Callable[[], Any]) -> Any:
+        with self._lock:
+            if self._valido(chave, time.monotonic()):
+                self.acertos += 1
+                return self._dados[chave][1]
+            trava = self._travas.setdefault(chave, threading.Lock())
+
+        with trava:
+            with self._lock:
+                if self._valido(chave, time.monotonic()):
+                    self.acertos += 1
+                    return self._dados[chave][1]
+                geracao = self._geracao
+            valor = calcular()
+            with self._lock:
+                self.calculos += 1
+                if geracao != self._geracao:
+                    return valor
+                self._dados[chave] = (time.monotonic(), valor)
+                self._dados.move_to_end(chave)
+                while len(self._dados) > self.tamanho_maximo:
+                    antiga, _ = self._dados.popitem(last=False)
+                    self._travas.pop(antiga, None)
+            return valor
+
+    def idade(self, chave: Hashable) -> float | None:
+        """Segundos desde o cálculo do valor guardado, ou None se não houver."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            return time.monotonic() - entrada[0] if entrada else None
+
+    def invalidar(self, *chaves: Hashable) -> None:
+        with self._lock:
+            self._geracao += 1
+            for chave in chaves:
+                self._dados.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._dados.clear()
+
+
+class CacheVersionado:
+    """Valor único que só é recalculado quando muda a versão publicada.
+
+    A versão (normalmente lida do banco, compartilhada pelos workers) é
+    consultada no máximo a cada ``intervalo`` segundos; nesse meio-tempo o
+    valor guardado é devolvido sem nenhuma consulta. ``invalidar`` descarta
+    o valor na hora, para o processo que fez a alteração.
+    """
+
+    def __init__(self, intervalo: float) -> None:
+        self.intervalo = intervalo
+        self._valor: Any = None
+        self._versao: int | None = None
+        self._verificado_em: float | None = None
+        self._lock = threading.Lock()
+        self._trava_calculo = threading.Lock()
+        self.acertos = 0
+        self.verificacoes = 0
+        self.calculos = 0
+
+    def _recente(self, agora: float) -> bool:
+        return self._verificado_em is not None and agora - self._verificado_em < self.intervalo
+
+    def obter(self, versao_atual: Callable[[], int], calcular: Callable[[], Any]) -> Any:
+        with self._lock:
+            if self._recente(time.monotonic()):
+                self.acertos += 1
+                return self._valor
+
+        with self._trava_calculo:
+            with self._lock:
+                if self._recente(time.monotonic()):
+                    self.acertos += 1
+                    return self._valor
+            versao = versao_atual()
+            with self._lock:
+                self.verificacoes += 1
+                if self._verificado_em is not None and versao == self._versao:
+                    self._verificado_em = time.monotonic()
+                    self.acertos += 1
+                    return self._valor
+            valor = calcular()
+            with self._lock:
+                self.calculos += 1
+                self._valor, self._versao = valor, versao
+                self._verificado_em = time.monotonic()
+            return valor
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._valor = self._versao = self._verificado_em = None
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "versao": self._versao,
+                "acertos": self.acertos,
+                "verificacoes": self.verificacoes,
+                "calculos": self.calculos,
+            }
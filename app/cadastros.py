@@ -0,0 +1,89 @@
+"""Listas de cadastros ativos (setores, colaboradores, tipos de peça e tamanhos).
+
+Quase toda página monta os selects com essas listas, que mudam poucas
+vezes por mês. Elas ficam em um CacheVersionado por processo. Qualquer
+flush que crie, altere ou exclua um desses cadastros incrementa a linha
+"cadastros" de versoes_cache na mesma transação. Depois do commit, o
+próprio processo descarta o cache na hora; os demais workers percebem a
+nova versão na próxima verificação (CADASTROS_VERIFICACAO_SEGUNDOS).
+"""
+
+from typing import NamedTuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from .models import Colaborador, Setor, Tamanho, TipoPeca, VersaoCache, db
+
+VERSAO_CADASTROS = "cadastros"
+MODELOS_CADASTRO = (Setor, Colaborador, TipoPeca, Tamanho)
+LISTAS_CADASTRO = {
+    "setores_ativos": Setor,
+    "colaboradores_ativos": Colaborador,
+    "tipos_peca_ativos": TipoPeca,
+    "tamanhos_ativos": Tamanho,
+}
+
+
+class Cadastro(NamedTuple):
+    """Cópia imutável de um cadastro, segura para compartilhar entre requisições."""
+
+    id: int
+    nome: str
+
+
+def garantir_versao() -> None:
+    if db.session.get(VersaoCache, VERSAO_CADASTROS) is None:
+        db.session.add(VersaoCache(nome=VERSAO_CADASTROS, versao=0))
+        db.session.commit()
+
+
+def _versao_atual() -> int:
+    versao = db.session.execute(
+        select(VersaoCache.versao).where(VersaoCache.nome == VERSAO_CADASTROS)
+    ).scalar()
+    return versao or 0
+
+
+def _carregar() -> dict[str, tuple[Cadastro, ...]]:
+    return {
+        lista: tuple(
+            Cadastro(*linha)
+            for linha in db.session.execute(
+                select(modelo.id, modelo.nome)
+                .where(modelo.ativo.is_(True))
+                .order_by(modelo.nome.asc())
+            )
+        )
+        for lista, modelo in LISTAS_CADASTRO.items()
+    }
+
+
+def cadastros_ativos() -> dict[str, tuple[Cadastro, ...]]:
+    """Listas ativas ordenadas por nome, com as chaves usadas nos templates."""
+    return current_app.extensions["cache_cadastros"].obter(_versao_atual, _carregar)
+
+
+@event.listens_for(Session, "after_flush")
+def _incrementar_versao(session: Session, _contexto) -> None:
+    alterados = (*session.new, *session.dirty, *session.deleted)
+    if not any(isinstance(objeto, MODELOS_CADASTRO) for objeto in alterados):
+        return
+    session.connection().execute(
+        update(VersaoCache)
+        .where(VersaoCache.nome == VERSAO_CADASTROS)
+        .values(versao=VersaoCache.versao + 1)
+    )
+    session.info["cadastros_alterados"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _descartar_cache(session: Session) -> None:
+    if session.info.pop("cadastros_alterados", False) and has_app_context():
+        current_app.extensions["cache_cadastros"].invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _esquecer_alteracao(session: Session) -> None:
+    session.info.pop("cadastros_alterados", None)
@@ -0,0 +1,87 @@
+"""Distribuição de eventos em tempo real (scans, movimentações e revisões).
+
+Os eventos são publicados depois do commit pelas rotas que alteram
+peças e entregues aos assinantes do stream SSE /api/rfid/eventos.
+Cada assinante tem um buffer limitado: um cliente lento perde os
+eventos mais antigos em vez de acumular memória.
+"""
+
+import itertools
+import threading
+from collections import deque
+
+from flask import current_app
+
+
+class Assinatura:
+    """Buffer de eventos de um assinante."""
+
+    def __init__(self, tamanho_buffer: int) -> None:
+        self._buffer: deque[dict] = deque(maxlen=tamanho_buffer)
+        self._condicao = threading.Condition()
+        self.descartados = 0
+
+    def entregar(self, evento: dict) -> bool:
+        """Guarda o evento; retorna True se o mais antigo do buffer foi descartado."""
+        with self._condicao:
+            descartou = len(self._buffer) == self._buffer.maxlen
+            if descartou:
+                self.descartados += 1
+            self._buffer.append(evento)
+            self._condicao.notify()
+            return descartou
+
+    def proximos(self, timeout: float) -> list[dict]:
+        """Retorna os eventos pendentes, esperando até timeout segundos por algum."""
+        with self._condicao:
+            if not self._buffer:
+                self._condicao.wait(timeout)
+            eventos = list(self._buffer)
+            self._buffer.clear()
+            return eventos
+
+
+class BarramentoEventos:
+    """Publica eventos para todas as assinaturas ativas do processo."""
+
+    def __init__(self, tamanho_buffer: int) -> None:
+        self.tamanho_buffer = tamanho_buffer
+        self._assinaturas: set[Assinatura] = set()
+        self._lock = threading.Lock()
+        self._sequencia = itertools.count(1)
+        self.publicados = 0
+        # Acumulado no barramento: sobrevive ao cancelamento das assinaturas.
+        self.descartados = 0
+
+    def assinar(self) -> Assinatura:
+        assinatura = Assinatura(self.tamanho_buffer)
+        with self._lock:
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura) -> None:
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def publicar(self, tipo: str, dados: dict) -> None:
+        with self._lock:
+            evento = {"id": next(self._sequencia), "tipo": tipo, "dados": dados}
+            self.publicados += 1
+            assinaturas = list(self._assinaturas)
+        descartados = sum(assinatura.entregar(evento) for assinatura in assinaturas)
+        if descartados:
+            with self._lock:
+                self.descartados += descartados
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "assinantes": len(self._assinaturas),
+                "publicados": self.publicados,
+                "descartados": self.descartados,
+            }
+
+
+def publicar_evento(tipo: str, dados: dict) -> None:
+    """Publica um evento no barramento da aplicação atual."""
+    current_app.extensions["eventos"].publicar(tipo, dados)
@@ -0,0 +1,1073 @@
+"""Importação de peças a partir de planilhas CSV ou XLSX.
+
+O arquivo é lido de forma incremental (o upload não é carregado inteiro
+na memória) e as peças são gravadas em blocos de IMPORTACAO_LOTE linhas,
+cada bloco em sua própria transação. A memória usada depende do tamanho
+do bloco, não do tamanho do arquivo.
+
+Cada bloco é gravado com comandos em conjunto, sem a unidade de trabalho
+do ORM: no PostgreSQL, COPY para uma tabela temporária seguido de
+INSERT ... SELECT; nos demais bancos, executemany com RETURNING dos ids.
+Códigos e tags já cadastrados são recusados antes da gravação; se ainda
+assim o banco rejeitar o bloco, ele é refeito linha a linha e apenas a
+linha inválida falha.
+
+No modo "mesclar" a planilha é conciliada pelo código: códigos novos
+são inseridos, os existentes recebem as colunas presentes no arquivo
+(em XLSX, as do cabeçalho da aba da linha) com INSERT ... ON CONFLICT
+DO UPDATE, e uma movimentação só é registrada quando status, setor ou
+colaborador mudam.
+
+validar_csv() faz uma simulação sem gravar nada: aponta códigos e tags
+repetidos no arquivo ou já cadastrados, valores fora dos cadastros de
+tamanho, setor, colaborador e tipo de peça, e status inválidos.
+
+Arquivos .xlsx são lidos no modo read_only do openpyxl, linha a linha:
+em cada aba, a linha de cabeçalho é localizada entre as primeiras
+LINHAS_BUSCA_CABECALHO e as abas sem cabeçalho reconhecível são ignoradas.
+
+Para cargas históricas muito grandes, importar_csv_paralelo() divide o
+CSV em faixas de bytes alinhadas ao fim de linha; a leitura e a
+normalização das faixas rodam em um pool de processos e um único
+gravador, no processo principal, grava os blocos na ordem do arquivo.
+
+Com IMPORTACAO_EM_SEGUNDO_PLANO, o upload é salvo em disco e importado
+por um pool local de threads (ExecutorImportacoes). O andamento fica em
+uma linha de ImportacaoJob, atualizada a cada bloco gravado.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import unicodedata
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import IO
+
+from flask import Flask
+from openpyxl import load_workbook
+from sqlalchemy import Column, MetaData, Table, Text, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from .models import (
+    Colaborador,
+    EnxovalItem,
+    ImportacaoJob,
+    Movimentacao,
+    Setor,
+    TagRemovida,
+    Tamanho,
+    TipoPeca,
+    db,
+    normalizar_tag_rfid,
+)
+from .resumo import BLOCO_CONSULTA, ajustar_resumo
+from .rfid import invalidar_tags
+
+STATUS_IMPORTACAO = {
+    "estoque",
+    "entregue",
+    "em_uso",
+    "em_lavagem",
+    "disponivel",
+    "extraviado",
+}
+# Quantidade máxima de erros detalhados guardados no resumo.
+MAXIMO_ERROS = 100
+CAMPOS_ITEM = (
+    "nome",
+    "codigo",
+    "tag_rfid",
+    "tamanho",
+    "tamanho_customizado",
+    "descricao",
+    "colaborador",
+    "setor",
+    "status",
+)
+CAMPOS_LOCALIZACAO = {"status", "setor", "colaborador"}
+# Campos da planilha conferidos contra os cadastros auxiliares na validação.
+ROTULOS_CADASTROS = {
+    "tamanho": "Tamanho",
+    "setor": "Setor",
+    "colaborador": "Colaborador",
+    "nome": "Tipo de peça",
+}
+MODOS_IMPORTACAO = ("inserir", "mesclar")
+EXTENSOES_IMPORTACAO = (".csv", ".xlsx")
+CAMPOS_OBRIGATORIOS = {"nome", "codigo", "tamanho"}
+LINHAS_BUSCA_CABECALHO = 20
+# Chave opcional com a posição de origem da linha (aba e linha, no XLSX).
+CHAVE_ORIGEM = "_origem"
+# Tamanho aproximado de cada faixa do CSV entregue a um processo.
+BYTES_POR_FAIXA = 4 * 1024 * 1024
+# Tabela de passagem do COPY no PostgreSQL, descartada no fim da transação.
+PECAS_IMPORTACAO = Table(
+    "pecas_importacao",
+    MetaData(),
+    *(Column(campo, Text) for campo in CAMPOS_ITEM),
+    Column("observacao", Text),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+class ImportacaoCanceladaError(Exception):
+    """Levantada entre blocos quando o cancelamento da importação foi pedido."""
+
+
+class ResumoImportacao:
+    """Contadores de uma importação e os primeiros erros encontrados."""
+
+    def __init__(self) -> None:
+        self.linhas = 0
+        self.inseridas = 0
+        self.atualizadas = 0
+        self.inalteradas = 0
+        self.ignoradas = 0
+        self.falhas = 0
+        self.erros: list[dict] = []
+        self.segundos_gravacao = 0.0
+        self.segundos_normalizacao = 0.0
+
+    def registrar_erro(self, linha: int | str, mensagem: str) -> None:
+        self.falhas += 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append({"linha": linha, "mensagem": mensagem})
+
+    def como_dict(self) -> dict:
+        return {
+            "linhas": self.linhas,
+            "inseridas": self.inseridas,
+            "atualizadas": self.atualizadas,
+            "inalteradas": self.inalteradas,
+            "ignoradas": self.ignoradas,
+            "falhas": self.falhas,
+            "erros": self.erros,
+        }
+
+
+def ler_csv(fluxo: IO[bytes]) -> Iterator[dict[str, str]]:
+    """Lê um CSV binário linha a linha, decodificando UTF-8 (com ou sem BOM)."""
+    texto = io.TextIOWrapper(fluxo, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.DictReader(texto)
+    finally:
+        # Devolve o fluxo ao chamador sem fechá-lo.
+        texto.detach()
+
+
+def _normalizar_cabecalho(valor) -> str:
+    """'Código ', 'TAG RFID' e 'tag-rfid' viram 'codigo', 'tag_rfid' e 'tag_rfid'."""
+    texto = unicodedata.normalize("NFKD", str(valor or "")).encode("ascii", "ignore").decode()
+    return "_".join(texto.lower().replace("-", " ").split())
+
+
+def _texto_celula(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def ler_xlsx(fluxo: IO[bytes]) -> Iterator[dict[str, str]]:
+    """Lê as linhas de todas as abas de um XLSX sem carregar a pasta inteira."""
+    pasta = load_workbook(fluxo, read_only=True, data_only=True)
+    try:
+        for aba in pasta.worksheets:
+            cabecalho: list[str] | None = None
+            for numero, valores in enumerate(aba.iter_rows(values_only=True), start=1):
+                if cabecalho is None:
+                    candidato = [_normalizar_cabecalho(valor) for valor in valores]
+                    if set(candidato) >= CAMPOS_OBRIGATORIOS:
+                        cabecalho = candidato
+                    elif numero >= LINHAS_BUSCA_CABECALHO:
+                        break
+                    continue
+                if all(valor is None for valor in valores):
+                    continue
+                linha = {
+                    campo: _texto_celula(valor)
+                    for campo, valor in zip(cabecalho, valores, strict=False)
+                    if campo
+                }
+                linha[CHAVE_ORIGEM] = f"{aba.title}:{numero}"
+                yield linha
+    finally:
+        pasta.close()
+
+
+def ler_planilha(fluxo: IO[bytes], nome_arquivo: str) -> Iterator[dict[str, str]]:
+    """Escolhe o leitor pela extensão do arquivo; CSV quando não for .xlsx."""
+    if Path(nome_arquivo).suffix.lower() == ".xlsx":
+        return ler_xlsx(fluxo)
+    return ler_csv(fluxo)
+
+
+def preparar_linha(linha: dict[str, str]) -> dict | None:
+    """Converte uma linha do CSV nos campos da peça; None se faltar dado obrigatório."""
+    nome = (linha.get("nome") or "").strip()
+    codigo = (linha.get("codigo") or "").strip().upper()
+    tamanho = (linha.get("tamanho") or "").strip().upper()
+    if not nome or not codigo or not tamanho:
+        return None
+
+    status = (linha.get("status") or "").strip().lower() or "estoque"
+    if status not in STATUS_IMPORTACAO:
+        status = "estoque"
+    return {
+        "nome": nome,
+        "codigo": codigo,
+        "tag_rfid": normalizar_tag_rfid(linha.get("tag_rfid")),
+        "tamanho": tamanho,
+        "tamanho_customizado": (linha.get("tamanho_customizado") or "").strip() or None,
+        "descricao": (linha.get("descricao") or "").strip() or None,
+        "colaborador": (linha.get("colaborador") or "").strip() or None,
+        "setor": (linha.get("setor") or "").strip() or None,
+        "status": status,
+        "observacao": (linha.get("observacao") or "").strip() or "Importacao CSV",
+    }
+
+
+def _adicionar(campos: dict) -> None:
+    dados = dict(campos)
+    observacao = dados.pop("observacao")
+    item = EnxovalItem(**dados)
+    db.session.add(item)
+    db.session.add(
+        Movimentacao(
+            item=item,
+            status=item.status,
+            colaborador=item.colaborador,
+            setor=item.setor,
+            observacao=observacao,
+        )
+    )
+
+
+def _filtrar_conflitos(
+    bloco: list[tuple[int, dict]], resumo: ResumoImportacao
+) -> list[tuple[int, dict]]:
+    """Recusa linhas cujo código ou tag já existe no banco ou no próprio bloco."""
+    codigos = [campos["codigo"] for _, campos in bloco]
+    tags = [campos["tag_rfid"] for _, campos in bloco if campos["tag_rfid"]]
+    codigos_existentes: set[str] = set()
+    tags_existentes: set[str] = set()
+    for inicio in range(0, len(codigos), BLOCO_CONSULTA):
+        codigos_existentes.update(
+            db.session.scalars(
+                select(EnxovalItem.codigo).where(
+                    EnxovalItem.codigo.in_(codigos[inicio : inicio + BLOCO_CONSULTA])
+                )
+            )
+        )
+    for inicio in range(0, len(tags), BLOCO_CONSULTA):
+        tags_existentes.update(
+            db.session.scalars(
+                select(EnxovalItem.tag_rfid).where(
+                    EnxovalItem.tag_rfid.in_(tags[inicio : inicio + BLOCO_CONSULTA])
+                )
+            )
+        )
+
+    validas = []
+    for numero, campos in bloco:
+        if campos["codigo"] in codigos_existentes:
+            resumo.registrar_erro(numero, f"Código '{campos['codigo']}' já cadastrado")
+        elif campos["tag_rfid"] in tags_existentes:
+            resumo.registrar_erro(numero, f"Tag RFID '{campos['tag_rfid']}' já cadastrada")
+        else:
+            validas.append((numero, campos))
+            codigos_existentes.add(campos["codigo"])
+            if campos["tag_rfid"]:
+                tags_existentes.add(campos["tag_rfid"])
+    return validas
+
+
+def _inserir_com_copy(validas: list[tuple[int, dict]]) -> None:
+    """PostgreSQL: COPY para a tabela temporária e INSERT ... SELECT a partir dela."""
+    conexao = db.session.connection()
+    PECAS_IMPORTACAO.create(conexao)
+    colunas = [coluna.name for coluna in PECAS_IMPORTACAO.columns]
+    with conexao.connection.cursor() as cursor, cursor.copy(
+        f"COPY {PECAS_IMPORTACAO.name} ({', '.join(colunas)}) FROM STDIN"
+    ) as copia:
+        for _, campos in validas:
+            copia.write_row([campos[coluna] for coluna in colunas])
+
+    agora = datetime.now(UTC)
+    peca = PECAS_IMPORTACAO.c
+    conexao.execute(
+        insert(EnxovalItem).from_select(
+            [*CAMPOS_ITEM, "ativo", "created_at", "atualizado_em", "ultima_movimentacao_em"],
+            select(
+                *(peca[campo] for campo in CAMPOS_ITEM),
+                literal(True),
+                literal(agora, db.DateTime),
+                literal(agora, db.DateTime),
+                literal(agora, db.DateTime),
+            ),
+        )
+    )
+    # As movimentações encontram o id da peça pelo código, sem flush por linha.
+    conexao.execute(
+        insert(Movimentacao).from_select(
+            ["item_id", "status", "colaborador", "setor", "observacao", "created_at"],
+            select(
+                EnxovalItem.id,
+                peca.status,
+                peca.colaborador,
+                peca.setor,
+                peca.observacao,
+                literal(agora, db.DateTime),
+            ).join(EnxovalItem, EnxovalItem.codigo == peca.codigo),
+        )
+    )
+
+
+def _inserir_em_lote(validas: list[tuple[int, dict]]) -> None:
+    """Demais bancos: executemany com RETURNING, na ordem dos parâmetros."""
+    agora = datetime.now(UTC)
+    ids = db.session.scalars(
+        insert(EnxovalItem).returning(EnxovalItem.id, sort_by_parameter_order=True),
+        [
+            {
+                **{campo: campos[campo] for campo in CAMPOS_ITEM},
+                "created_at": agora,
+                "atualizado_em": agora,
+                "ultima_movimentacao_em": agora,
+            }
+            for _, campos in validas
+        ],
+    ).all()
+    db.session.execute(
+        insert(Movimentacao),
+        [
+            {
+                "item_id": item_id,
+                "status": campos["status"],
+                "colaborador": campos["colaborador"],
+                "setor": campos["setor"],
+                "observacao": campos["observacao"],
+                "created_at": agora,
+            }
+            for item_id, (_, campos) in zip(ids, validas, strict=True)
+        ],
+    )
+
+
+def _gravar_bloco(bloco: list[tuple[int, dict]], resumo: ResumoImportacao) -> list[str]:
+    """Grava um bloco em uma transação; retorna as tags das peças inseridas."""
+    validas = _filtrar_conflitos(bloco, resumo)
+    if not validas:
+        return []
+    try:
+        with ajustar_resumo(EnxovalItem.codigo, [campos["codigo"] for _, campos in validas]):
+            if db.session.get_bind().dialect.name == "postgresql":
+                _inserir_com_copy(validas)
+            else:
+                _inserir_em_lote(validas)
+        db.session.commit()
+        resumo.inseridas += len(validas)
+        return [campos["tag_rfid"] for _, campos in validas if campos["tag_rfid"]]
+    except IntegrityError:
+        db.session.rollback()
+
+    # Outra gravação concorrente ocupou um código ou tag: refaz linha a linha.
+    tags = []
+    for numero, campos in validas:
+        try:
+            _adicionar(campos)
+            db.session.commit()
+        except IntegrityError as erro:
+            db.session.rollback()
+            resumo.registrar_erro(numero, _mensagem_integridade(campos, erro))
+            continue
+        resumo.inseridas += 1
+        if campos["tag_rfid"]:
+            tags.append(campos["tag_rfid"])
+    return tags
+
+
+def _mensagem_integridade(campos: dict, erro: IntegrityError) -> str:
+    detalhe = str(erro.orig).lower()
+    if "tag_rfid" in detalhe:
+        return f"Tag RFID '{campos['tag_rfid']}' já cadastrada"
+    if "codigo" in detalhe:
+        return f"Código '{campos['codigo']}' já cadastrado"
+    return f"Peça {campos['codigo']} rejeitada pelo banco"
+
+
+def _consultar_em_blocos(colunas: tuple, filtro, valores: list) -> list:
+    linhas = []
+    for inicio in range(0, len(valores), BLOCO_CONSULTA):
+        linhas.extend(
+            db.session.execute(
+                select(*colunas).where(filtro.in_(valores[inicio : inicio + BLOCO_CONSULTA]))
+            )
+        )
+    return linhas
+
+
+def _mesclar_bloco(
+    bloco: list[tuple[int, dict]], colunas: frozenset[str], resumo: ResumoImportacao
+) -> list[str]:
+    """Insere ou atualiza um bloco pelo código; retorna as tags afetadas.
+
+    Os contadores só são somados ao resumo depois do commit. Se o banco
+    rejeitar o bloco, ele é refeito linha a linha.
+    """
+    atualizaveis = [campo for campo in CAMPOS_ITEM if campo in colunas and campo != "codigo"]
+    existentes = {
+        linha.codigo: linha._asdict()
+        for linha in _consultar_em_blocos(
+            (EnxovalItem.id, *(getattr(EnxovalItem, campo) for campo in CAMPOS_ITEM)),
+            EnxovalItem.codigo,
+            [campos["codigo"] for _, campos in bloco],
+        )
+    }
+    donos = dict(
+        _consultar_em_blocos(
+            (EnxovalItem.tag_rfid, EnxovalItem.codigo),
+            EnxovalItem.tag_rfid,
+            [campos["tag_rfid"] for _, campos in bloco if campos["tag_rfid"]],
+        )
+    )
+
+    contagem = {"inseridas": 0, "atualizadas": 0, "inalteradas": 0}
+    erros: list[tuple[int, str]] = []
+    gravar: list[dict] = []
+    movimentos: list[tuple[str, dict]] = []
+    tags_removidas: list[str] = []
+    tags_afetadas: list[str] = []
+    vistos: set[str] = set()
+    for numero, campos in bloco:
+        codigo, tag = campos["codigo"], campos["tag_rfid"]
+        if codigo in vistos:
+            erros.append((numero, f"Código '{codigo}' repetido no arquivo"))
+            continue
+        if tag and "tag_rfid" in colunas and donos.get(tag, codigo) != codigo:
+            erros.append((numero, f"Tag RFID '{tag}' já cadastrada"))
+            continue
+        vistos.add(codigo)
+
+        atual = existentes.get(codigo)
+        if atual is None:
+            contagem["inseridas"] += 1
+            final = campos
+        else:
+            alterados = {campo for campo in atualizaveis if campos[campo] != atual[campo]}
+            if not alterados:
+                contagem["inalteradas"] += 1
+                continue
+            contagem["atualizadas"] += 1
+            final = {**atual, **{campo: campos[campo] for campo in atualizaveis}}
+            # A tag já cadastrada guarda no cache a projeção antiga da peça.
+            if atual["tag_rfid"]:
+                tags_afetadas.append(atual["tag_rfid"])
+                if "tag_rfid" in alterados:
+                    tags_removidas.append(atual["tag_rfid"])
+            if not alterados & CAMPOS_LOCALIZACAO:
+                final = None
+
+        gravar.append({campo: campos[campo] for campo in CAMPOS_ITEM})
+        if tag and "tag_rfid" in colunas:
+            donos[tag] = codigo
+        if campos["tag_rfid"]:
+            tags_afetadas.append(campos["tag_rfid"])
+        if final is not None:
+            movimentos.append((codigo, {
+                "status": final["status"],
+                "colaborador": final["colaborador"],
+                "setor": final["setor"],
+                "observacao": campos["observacao"],
+            }))
+
+    try:
+        if gravar:
+            dialeto = postgresql if db.session.get_bind().dialect.name == "postgresql" else sqlite
+            instrucao = dialeto.insert(EnxovalItem)
+            instrucao = instrucao.on_conflict_do_update(
+                index_elements=[EnxovalItem.codigo],
+                set_={
+                    **{campo: instrucao.excluded[campo] for campo in atualizaveis},
+                    "atualizado_em": datetime.now(UTC),
+                },
+            ).returning(EnxovalItem.codigo, EnxovalItem.id)
+            with ajustar_resumo(EnxovalItem.codigo, [linha["codigo"] for linha in gravar]):
+                ids = dict(db.session.execute(instrucao, gravar).all())
+            if movimentos:
+                agora = datetime.now(UTC)
+                db.session.execute(
+                    insert(Movimentacao),
+                    [
+                        {**movimento, "item_id": ids[codigo], "created_at": agora}
+                        for codigo, movimento in movimentos
+                    ],
+                )
+                movidas = [ids[codigo] for codigo, _ in movimentos]
+                for inicio in range(0, len(movidas), BLOCO_CONSULTA):
+                    db.session.execute(
+                        update(EnxovalItem)
+                        .where(EnxovalItem.id.in_(movidas[inicio : inicio + BLOCO_CONSULTA]))
+                        .values(ultima_movimentacao_em=agora)
+                        .execution_options(synchronize_session=False)
+                    )
+            if tags_removidas:
+                db.session.execute(
+                    insert(TagRemovida), [{"tag_rfid": tag} for tag in tags_removidas]
+                )
+        db.session.commit()
+    except IntegrityError as erro:
+        db.session.rollback()
+        if len(bloco) == 1:
+            numero, campos = bloco[0]
+            resumo.registrar_erro(numero, _mensagem_integridade(campos, erro))
+            return []
+        tags = []
+        for linha in bloco:
+            tags.extend(_mesclar_bloco([linha], colunas, resumo))
+        return tags
+
+    for campo, valor in contagem.items():
+        setattr(resumo, campo, getattr(resumo, campo) + valor)
+    for numero, mensagem in erros:
+        resumo.registrar_erro(numero, mensagem)
+    return tags_afetadas
+
+
+def _gravar_preparadas(
+    preparadas: Iterable[tuple[int | str, dict | None, frozenset[str]]],
+    tamanho_lote: int,
+    modo: str,
+    ao_gravar: Callable[[ResumoImportacao], None] | None,
+) -> ResumoImportacao:
+    """Grava linhas já normalizadas (None = linha ignorada) em blocos.
+
+    Cada linha traz as colunas presentes no seu cabeçalho. Quando elas
+    mudam (outra aba do XLSX), o bloco pendente é gravado antes, para que
+    a mesclagem só atualize as colunas que a linha realmente tem.
+    """
+    if modo not in MODOS_IMPORTACAO:
+        raise ValueError(f"Modo de importação desconhecido: {modo}")
+
+    resumo = ResumoImportacao()
+    bloco: list[tuple[int | str, dict]] = []
+    colunas: frozenset[str] = frozenset()
+
+    def gravar() -> None:
+        inicio = time.perf_counter()
+        if modo == "mesclar":
+            invalidar_tags(*_mesclar_bloco(bloco, colunas, resumo))
+        else:
+            invalidar_tags(*_gravar_bloco(bloco, resumo))
+        resumo.segundos_gravacao += time.perf_counter() - inicio
+        if ao_gravar:
+            ao_gravar(resumo)
+
+    for numero, campos, colunas_linha in preparadas:
+        resumo.linhas += 1
+        if campos is None:
+            resumo.ignoradas += 1
+            continue
+        if colunas_linha != colunas:
+            if bloco:
+                gravar()
+                bloco = []
+            colunas = colunas_linha
+        bloco.append((numero, campos))
+        if len(bloco) >= tamanho_lote:
+            gravar()
+            bloco = []
+    if bloco:
+        gravar()
+    return resumo
+
+
+def importar_linhas(
+    linhas: Iterable[dict[str, str]],
+    tamanho_lote: int = 1000,
+    modo: str = "inserir",
+    ao_gravar: Callable[[ResumoImportacao], None] | None = None,
+) -> ResumoImportacao:
+    """Importa linhas já lidas do CSV, com commit a cada tamanho_lote peças.
+
+    ao_gravar, se informado, é chamado após cada bloco gravado e pode
+    interromper a importação levantando ImportacaoCanceladaError.
+    """
+
+    def preparadas() -> Iterator[tuple[int | str, dict | None, frozenset[str]]]:
+        # A linha 1 do arquivo é o cabeçalho; cada aba do XLSX tem o seu.
+        for numero, linha in enumerate(linhas, start=2):
+            origem = linha.pop(CHAVE_ORIGEM, numero)
+            colunas = frozenset(campo for campo in linha if campo)
+            yield origem, preparar_linha(linha), colunas
+
+    return _gravar_preparadas(preparadas(), tamanho_lote, modo, ao_gravar)
+
+
+def importar_csv(
+    fluxo: IO[bytes],
+    tamanho_lote: int = 1000,
+    modo: str = "inserir",
+    ao_gravar: Callable[[ResumoImportacao], None] | None = None,
+) -> ResumoImportacao:
+    """Importa um CSV binário (upload ou arquivo aberto em modo 'rb')."""
+    return importar_linhas(ler_csv(fluxo), tamanho_lote, modo, ao_gravar)
+
+
+def importar_planilha(
+    fluxo: IO[bytes],
+    nome_arquivo: str,
+    tamanho_lote: int = 1000,
+    modo: str = "inserir",
+    ao_gravar: Callable[[ResumoImportacao], None] | None = None,
+) -> ResumoImportacao:
+    """Importa um CSV ou XLSX, escolhido pela extensão de nome_arquivo."""
+    return importar_linhas(ler_planilha(fluxo, nome_arquivo), tamanho_lote, modo, ao_gravar)
+
+
+class ValidacaoImportacao:
+    """Resultado da simulação de uma importação, agrupado por tipo de problema."""
+
+    def __init__(self) -> None:
+        self.linhas = 0
+        self.validas = 0
+        self.problemas: dict[str, int] = {}
+        self.erros: list[dict] = []
+
+    def registrar(self, linha: int, problema: str, mensagem: str) -> None:
+        self.problemas[problema] = self.problemas.get(problema, 0) + 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append({"linha": linha, "problema": problema, "mensagem": mensagem})
+
+    def como_dict(self) -> dict:
+        return {
+            "linhas": self.linhas,
+            "validas": self.validas,
+            "com_problema": self.linhas - self.validas,
+            "problemas": self.problemas,
+            "erros": self.erros,
+        }
+
+
+def _nomes_ativos(modelo: type[db.Model]) -> set[str]:
+    """Nomes ativos de um cadastro auxiliar, em minúsculas, lidos em uma consulta."""
+    return {
+        nome.lower()
+        for nome in db.session.scalars(select(modelo.nome).where(modelo.ativo.is_(True)))
+    }
+
+
+def _checar_banco(
+    pendentes: list[tuple[int, dict, bool]], modo: str, validacao: ValidacaoImportacao
+) -> None:
+    """Confere um bloco de linhas contra os códigos e tags já cadastrados.
+
+    Cada linha traz se passou nas conferências locais; ela só conta como
+    válida se também passar nestas.
+    """
+    codigos = dict(
+        _consultar_em_blocos(
+            (EnxovalItem.codigo, EnxovalItem.id),
+            EnxovalItem.codigo,
+            [campos["codigo"] for _, campos, _ in pendentes],
+        )
+    )
+    donos = dict(
+        _consultar_em_blocos(
+            (EnxovalItem.tag_rfid, EnxovalItem.codigo),
+            EnxovalItem.tag_rfid,
+            [campos["tag_rfid"] for _, campos, _ in pendentes if campos["tag_rfid"]],
+        )
+    )
+    for numero, campos, valida in pendentes:
+        if modo == "inserir" and campos["codigo"] in codigos:
+            validacao.registrar(
+                numero, "codigo_cadastrado", f"Código '{campos['codigo']}' já cadastrado"
+            )
+            valida = False
+        dono = donos.get(campos["tag_rfid"])
+        if dono is not None and (modo == "inserir" or dono != campos["codigo"]):
+            validacao.registrar(
+                numero,
+                "tag_cadastrada",
+                f"Tag RFID '{campos['tag_rfid']}' já cadastrada na peça {dono}",
+            )
+            valida = False
+        if valida:
+            validacao.validas += 1
+
+
+def validar_linhas(
+    linhas: Iterable[dict[str, str]], tamanho_lote: int = 1000, modo: str = "inserir"
+) -> ValidacaoImportacao:
+    """Simula a importação sem gravar nada e relata os problemas encontrados.
+
+    Os cadastros auxiliares são carregados uma vez em conjuntos; códigos e
+    tags de todas as linhas com dados são conferidos contra o banco com IN
+    em blocos de tamanho_lote, e cada linha relata todos os seus problemas.
+    """
+    if modo not in MODOS_IMPORTACAO:
+        raise ValueError(f"Modo de importação desconhecido: {modo}")
+
+    validacao = ValidacaoImportacao()
+    cadastros = {
+        "tamanho": _nomes_ativos(Tamanho),
+        "setor": _nomes_ativos(Setor),
+        "colaborador": _nomes_ativos(Colaborador),
+        "nome": _nomes_ativos(TipoPeca),
+    }
+    primeira_linha: dict[tuple[str, str], int] = {}
+    pendentes: list[tuple[int, dict, bool]] = []
+
+    for numero, linha in enumerate(linhas, start=2):
+        numero = linha.pop(CHAVE_ORIGEM, numero)
+        validacao.linhas += 1
+        campos = preparar_linha(linha)
+        if campos is None:
+            validacao.registrar(
+                numero, "dados_obrigatorios", "Nome, código e tamanho são obrigatórios"
+            )
+            continue
+
+        valida = True
+        status = (linha.get("status") or "").strip().lower()
+        if status and status not in STATUS_IMPORTACAO:
+            validacao.registrar(numero, "status_invalido", f"Status '{status}' inválido")
+            valida = False
+        for campo, nomes in cadastros.items():
+            valor = campos[campo]
+            if valor and valor.lower() not in nomes:
+                validacao.registrar(
+                    numero,
+                    f"{campo}_desconhecido",
+                    f"{ROTULOS_CADASTROS[campo]} '{valor}' não cadastrado",
+                )
+                valida = False
+        for campo in ("codigo", "tag_rfid"):
+            valor = campos[campo]
+            if not valor:
+                continue
+            anterior = primeira_linha.setdefault((campo, valor), numero)
+            if anterior != numero:
+                validacao.registrar(
+                    numero,
+                    f"{campo}_repetido",
+                    f"'{valor}' repetido no arquivo (linha {anterior})",
+                )
+                valida = False
+
+        pendentes.append((numero, campos, valida))
+        if len(pendentes) >= tamanho_lote:
+            _checar_banco(pendentes, modo, validacao)
+            pendentes = []
+    if pendentes:
+        _checar_banco(pendentes, modo, validacao)
+    return validacao
+
+
+def dividir_em_faixas(
+    caminho: str | os.PathLike, bytes_por_faixa: int = BYTES_POR_FAIXA
+) -> tuple[list[str], list[tuple[int, int]]]:
+    """Retorna o cabeçalho do CSV e as faixas (início, fim) de bytes das linhas.
+
+    Cada faixa termina em um fim de linha, por isso o arquivo não pode ter
+    campos entre aspas com quebras de linha.
+    """
+    with open(caminho, "rb") as arquivo:
+        cabecalho = next(csv.reader([arquivo.readline().decode("utf-8-sig")]), [])
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        inicio = arquivo.tell()
+        faixas = []
+        while inicio < tamanho:
+            arquivo.seek(min(inicio + bytes_por_faixa, tamanho))
+            arquivo.readline()
+            faixas.append((inicio, arquivo.tell()))
+            inicio = arquivo.tell()
+    return cabecalho, faixas
+
+
+def _normalizar_faixa(
+    caminho: str, inicio: int, fim: int, cabecalho: list[str]
+) -> tuple[list[dict | None], float]:
+    """Executada nos processos: lê e normaliza as linhas de uma faixa."""
+    comeco = time.perf_counter()
+    with open(caminho, "rb") as arquivo:
+        arquivo.seek(inicio)
+        texto = arquivo.read(fim - inicio).decode("utf-8")
+    leitor = csv.DictReader(io.StringIO(texto, newline=""), fieldnames=cabecalho)
+    return [preparar_linha(linha) for linha in leitor], time.perf_counter() - comeco
+
+
+def importar_csv_paralelo(
+    caminho: str | os.PathLike,
+    processos: int,
+    tamanho_lote: int = 1000,
+    modo: str = "inserir",
+    bytes_por_faixa: int = BYTES_POR_FAIXA,
+) -> ResumoImportacao:
+    """Importa um CSV grande normalizando as faixas em paralelo.
+
+    No máximo 2 faixas por processo ficam em memória à espera do gravador.
+    O resumo traz o tempo somado da normalização nos processos e o tempo
+    de gravação.
+    """
+    cabecalho, faixas = dividir_em_faixas(caminho, bytes_por_faixa)
+    tempos_normalizacao: list[float] = []
+
+    def preparadas() -> Iterator[tuple[int, dict | None, frozenset[str]]]:
+        numero = 1
+        proximas = iter(faixas)
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+            pendentes: deque[Future] = deque()
+            for inicio, fim in proximas:
+                pendentes.append(
+                    pool.submit(_normalizar_faixa, os.fspath(caminho), inicio, fim, cabecalho)
+                )
+                if len(pendentes) >= processos * 2:
+                    break
+            while pendentes:
+                linhas, segundos = pendentes.popleft().result()
+                faixa = next(proximas, None)
+                if faixa is not None:
+                    pendentes.append(
+                        pool.submit(_normalizar_faixa, os.fspath(caminho), *faixa, cabecalho)
+                    )
+                tempos_normalizacao.append(segundos)
+                for campos in linhas:
+                    numero += 1
+                    yield numero, campos, colunas
+
+    colunas = frozenset(campo for campo in cabecalho if campo)
+    resumo = _gravar_preparadas(preparadas(), tamanho_lote, modo, None)
+    resumo.segundos_normalizacao = sum(tempos_normalizacao)
+    return resumo
+
+
+def validar_csv(
+    fluxo: IO[bytes], tamanho_lote: int = 1000, modo: str = "inserir"
+) -> ValidacaoImportacao:
+    """Simula a importação de um CSV binário sem gravar nada."""
+    return validar_linhas(ler_csv(fluxo), tamanho_lote, modo)
+
+
+def validar_planilha(
+    fluxo: IO[bytes], nome_arquivo: str, tamanho_lote: int = 1000, modo: str = "inserir"
+) -> ValidacaoImportacao:
+    """Simula a importação de um CSV ou XLSX sem gravar nada."""
+    return validar_linhas(ler_planilha(fluxo, nome_arquivo), tamanho_lote, modo)
+
+
+def _agora() -> datetime:
+    return datetime.now(UTC)
+
+
+def _como_utc(instante: datetime | None) -> datetime | None:
+    if instante is None or instante.tzinfo is not None:
+        return instante
+    return instante.replace(tzinfo=UTC)
+
+
+def _atualizar_job(job_id: int, resumo: ResumoImportacao, **valores) -> None:
+    db.session.execute(
+        update(ImportacaoJob)
+        .where(ImportacaoJob.id == job_id)
+        .values(
+            linhas=resumo.linhas,
+            inseridas=resumo.inseridas,
+            atualizadas=resumo.atualizadas,
+            inalteradas=resumo.inalteradas,
+            ignoradas=resumo.ignoradas,
+            falhas=resumo.falhas,
+            erros=json.dumps(resumo.erros, ensure_ascii=False),
+            **valores,
+        )
+    )
+    db.session.commit()
+
+
+class ExecutorImportacoes:
+    """Executa importações agendadas em um pool local de threads.
+
+    Args:
+        app: Aplicação usada para abrir o contexto das threads.
+        trabalhadores: Número de importações executadas ao mesmo tempo.
+    """
+
+    def __init__(self, app: Flask, trabalhadores: int) -> None:
+        self._app = app
+        self.trabalhadores = max(trabalhadores, 1)
+        self._pool: ThreadPoolExecutor | None = None
+        self._pendentes: set[Future] = set()
+
+    def submeter(self, job_id: int, caminho: str) -> Future:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.trabalhadores, thread_name_prefix="importacao"
+            )
+        futuro = self._pool.submit(self._executar, job_id, caminho)
+        self._pendentes.add(futuro)
+        futuro.add_done_callback(self._pendentes.discard)
+        return futuro
+
+    def aguardar(self, timeout: float | None = None) -> None:
+        """Bloqueia até que as importações submetidas terminem."""
+        wait(list(self._pendentes), timeout)
+
+    def _executar(self, job_id: int, caminho: str) -> None:
+        with self._app.app_context():
+            resumo = ResumoImportacao()
+            try:
+                job = db.session.get(ImportacaoJob, job_id)
+                if job.cancelamento_solicitado:
+                    raise ImportacaoCanceladaError
+                modo = job.modo
+                nome_arquivo = job.arquivo
+                job.status = "executando"
+                job.iniciado_em = _agora()
+                db.session.commit()
+
+                # O XLSX é um zip lido pelo openpyxl: a posição no arquivo não mede o progresso.
+                medir_bytes = _progresso_por_bytes(nome_arquivo)
+                with open(caminho, "rb") as arquivo:
+
+                    def ao_gravar(parcial: ResumoImportacao) -> None:
+                        nonlocal resumo
+                        resumo = parcial
+                        lidos = {"bytes_lidos": arquivo.tell()} if medir_bytes else {}
+                        _atualizar_job(job_id, parcial, **lidos)
+                        if db.session.scalar(
+                            select(ImportacaoJob.cancelamento_solicitado).where(
+                                ImportacaoJob.id == job_id
+                            )
+                        ):
+                            raise ImportacaoCanceladaError
+
+                    resumo = importar_planilha(
+                        arquivo,
+                        nome_arquivo,
+                        self._app.config["IMPORTACAO_LOTE"],
+                        modo,
+                        ao_gravar,
+                    )
+                _atualizar_job(
+                    job_id,
+                    resumo,
+                    status="concluida",
+                    bytes_lidos=ImportacaoJob.tamanho_bytes,
+                    concluido_em=_agora(),
+                )
+            except ImportacaoCanceladaError:
+                db.session.rollback()
+                _atualizar_job(
+                    job_id,
+                    resumo,
+                    status="cancelada",
+                    mensagem="Cancelada; os blocos já gravados foram mantidos.",
+                    concluido_em=_agora(),
+                )
+            except Exception as erro:  # noqa: BLE001
+                db.session.rollback()
+                self._app.logger.exception("Falha na importação %d", job_id)
+                _atualizar_job(
+                    job_id, resumo, status="falhou", mensagem=str(erro), concluido_em=_agora()
+                )
+            finally:
+                db.session.remove()
+                os.remove(caminho)
+
+
+def encerrar_jobs_interrompidos() -> int:
+    """Marca como falhos os jobs que um processo anterior deixou em andamento.
+
+    O executor vive no processo e os arquivos temporários não sobrevivem a
+    um reinício, então esses jobs não vão mais terminar. Retorna quantos
+    jobs foram encerrados.
+    """
+    encerrados = db.session.execute(
+        update(ImportacaoJob)
+        .where(ImportacaoJob.status.in_(("pendente", "executando")))
+        .values(
+            status="falhou",
+            mensagem="Interrompida pelo reinício do servidor; envie a planilha novamente.",
+            concluido_em=_agora(),
+        )
+    ).rowcount
+    db.session.commit()
+    return encerrados
+
+
+def agendar_importacao(arquivo, modo: str, app: Flask) -> ImportacaoJob:
+    """Salva o upload em disco, registra o job e o entrega ao executor."""
+    diretorio = app.config["IMPORTACAO_DIRETORIO"] or tempfile.gettempdir()
+    os.makedirs(diretorio, exist_ok=True)
+    extensao = Path(arquivo.filename).suffix.lower()
+    if extensao not in EXTENSOES_IMPORTACAO:
+        extensao = ".csv"
+    descritor, caminho = tempfile.mkstemp(prefix="importacao-", suffix=extensao, dir=diretorio)
+    with os.fdopen(descritor, "wb") as destino:
+        arquivo.save(destino)
+
+    job = ImportacaoJob(
+        arquivo=arquivo.filename,
+        modo=modo,
+        tamanho_bytes=os.path.getsize(caminho),
+    )
+    db.session.add(job)
+    db.session.commit()
+    app.extensions["importacoes"].submeter(job.id, caminho)
+    return job
+
+
+def _progresso_por_bytes(nome_arquivo: str) -> bool:
+    return Path(nome_arquivo).suffix.lower() != ".xlsx"
+
+
+def progresso_job(job: ImportacaoJob) -> dict:
+    """Situação de um job: contadores, linhas por segundo e tempo restante.
+
+    No XLSX, progresso e tempo restante ficam em None até a conclusão.
+    """
+    inicio = _como_utc(job.iniciado_em)
+    fim = _como_utc(job.concluido_em) or _agora()
+    decorrido = (fim - inicio).total_seconds() if inicio else 0.0
+    if _progresso_por_bytes(job.arquivo):
+        fracao = job.bytes_lidos / job.tamanho_bytes if job.tamanho_bytes else 0.0
+    else:
+        fracao = 1.0 if job.status == "concluida" else None
+    restante = None
+    if job.status == "executando" and fracao is not None and 0 < fracao < 1:
+        restante = round(decorrido * (1 - fracao) / fracao, 1)
+    return {
+        "id": job.id,
+        "arquivo": job.arquivo,
+        "modo": job.modo,
+        "status": job.status,
+        "progresso": round(min(fracao, 1.0), 4) if fracao is not None else None,
+        "linhas": job.linhas,
+        "inseridas": job.inseridas,
+        "atualizadas": job.atualizadas,
+        "inalteradas": job.inalteradas,
+        "ignoradas": job.ignoradas,
+        "falhas": job.falhas,
+        "erros": json.loads(job.erros) if job.erros else [],
+        "linhas_por_segundo": round(job.linhas / decorrido, 1) if decorrido else None,
+        "tempo_restante_segundos": restante,
+        "mensagem": job.mensagem,
+        "cancelamento_solicitado": job.cancelamento_solicitado,
+        "criado_em": job.created_at.isoformat() if job.created_at else None,
+        "concluido_em": job.concluido_em.isoformat() if job.concluido_em else None,
+    }
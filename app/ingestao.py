@@ -0,0 +1,244 @@
+"""Ingestão das leituras RFID: métricas de uso e fila assíncrona.
+
+Quando RFID_INGESTAO_ASSINCRONA está ativo, /api/rfid/scan valida a
+leitura, coloca-a nesta fila e responde imediatamente. Uma thread
+esvazia a fila em lotes de até RFID_FILA_LOTE leituras, ou a cada
+RFID_FILA_INTERVALO_MS, gravando cada lote em uma única transação.
+
+Ao encerrar o processo (saída normal ou SIGTERM, enviado por
+``docker stop``), as leituras já aceitas com 202 são gravadas antes da
+saída; a partir daí novas leituras recebem 503. create_app só instala o
+handler do SIGTERM com a ingestão assíncrona ativa.
+"""
+
+import atexit
+import queue
+import signal
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+from flask import Flask
+
+from .models import db
+
+_FILAS_ATIVAS: "weakref.WeakSet[FilaIngestao]" = weakref.WeakSet()
+_sigterm_anterior = None
+
+
+def _encerrar_filas(numero: int, quadro) -> None:
+    """Esvazia as filas e segue com o tratamento anterior do SIGTERM."""
+    for fila in list(_FILAS_ATIVAS):
+        fila.parar()
+    if callable(_sigterm_anterior):
+        _sigterm_anterior(numero, quadro)
+    elif _sigterm_anterior != signal.SIG_IGN:
+        raise SystemExit(128 + numero)
+
+
+def instalar_sigterm() -> None:
+    """Faz o SIGTERM gravar as leituras enfileiradas antes de encerrar o processo.
+
+    O SIGTERM não passa pelo atexit. Só a thread principal pode instalar o
+    handler; chamado de outra thread, não faz nada.
+    """
+    global _sigterm_anterior
+    if threading.current_thread() is not threading.main_thread():
+        return
+    atual = signal.getsignal(signal.SIGTERM)
+    if atual is not _encerrar_filas:
+        _sigterm_anterior = atual
+        signal.signal(signal.SIGTERM, _encerrar_filas)
+
+
+class MetricasIngestao:
+    """Contadores de leituras aplicadas, agregados por segundo.
+
+    Mantém no máximo um balde por segundo do último minuto, o que basta
+    para calcular a taxa de scans por minuto sem guardar cada leitura.
+    """
+
+    JANELA_SEGUNDOS = 60
+
+    def __init__(self) -> None:
+        self._baldes: deque[list[int]] = deque()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.ultimo_scan_em: datetime | None = None
+
+    def registrar(self, quantidade: int = 1) -> None:
+        segundo = int(time.monotonic())
+        with self._lock:
+            self.total += quantidade
+            self.ultimo_scan_em = datetime.now(UTC)
+            if self._baldes and self._baldes[-1][0] == segundo:
+                self._baldes[-1][1] += quantidade
+            else:
+                self._baldes.append([segundo, quantidade])
+            self._expirar(segundo)
+
+    def _expirar(self, segundo: int) -> None:
+        while self._baldes and self._baldes[0][0] <= segundo - self.JANELA_SEGUNDOS:
+            self._baldes.popleft()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            self._expirar(int(time.monotonic()))
+            return {
+                "scans_por_minuto": sum(quantidade for _, quantidade in self._baldes),
+                "total_scans": self.total,
+                "ultimo_scan_em": (
+                    self.ultimo_scan_em.isoformat() if self.ultimo_scan_em else None
+                ),
+            }
+
+
+class FilaIngestao:
+    """Fila limitada de leituras gravadas em lote por uma thread de fundo.
+
+    Args:
+        app: Aplicação usada para abrir o contexto da thread de gravação.
+        gravador: Função que recebe a lista de leituras e as grava com commit.
+        capacidade: Número máximo de leituras aguardando gravação.
+        tamanho_lote: Número máximo de leituras por transação.
+        intervalo_ms: Tempo máximo de espera para completar um lote.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        gravador: Callable[[list[dict]], None],
+        *,
+        capacidade: int,
+        tamanho_lote: int,
+        intervalo_ms: int,
+    ) -> None:
+        self._app = app
+        self._gravador = gravador
+        self._fila: queue.Queue[dict] = queue.Queue(maxsize=capacidade)
+        self.tamanho_lote = max(tamanho_lote, 1)
+        self.intervalo = max(intervalo_ms, 0) / 1000
+        self._thread: threading.Thread | None = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self.enfileiradas = 0
+        self.rejeitadas = 0
+        self.gravadas = 0
+        self.falhas = 0
+        self.lotes = 0
+        self.ultimo_lote_ms: float | None = None
+        self.maior_lote_ms = 0.0
+        self._tempo_total_ms = 0.0
+
+    def enfileirar(self, leitura: dict) -> bool:
+        """Coloca uma leitura na fila; retorna False se ela está cheia ou encerrando.
+
+        Depois de parar() a thread de gravação não volta; a leitura seria
+        confirmada e nunca gravada.
+        """
+        if self._parar.is_set():
+            with self._lock:
+                self.rejeitadas += 1
+            return False
+        self._iniciar()
+        try:
+            self._fila.put_nowait(leitura)
+        except queue.Full:
+            with self._lock:
+                self.rejeitadas += 1
+            return False
+        with self._lock:
+            self.enfileiradas += 1
+        return True
+
+    def aguardar(self) -> None:
+        """Bloqueia até que todas as leituras enfileiradas tenham sido gravadas."""
+        self._fila.join()
+
+    def parar(self, timeout: float | None = 30) -> None:
+        """Grava o que ainda está na fila e encerra a thread de fundo."""
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _iniciar(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._executar, name="fila-ingestao-rfid", daemon=True
+            )
+            self._thread.start()
+        _FILAS_ATIVAS.add(self)
+        atexit.register(self.parar)
+
+    def _executar(self) -> None:
+        while not (self._parar.is_set() and self._fila.empty()):
+            lote = self._coletar()
+            if lote:
+                self._gravar(lote)
+
+    def _coletar(self) -> list[dict]:
+        try:
+            lote = [self._fila.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        prazo = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            try:
+                if restante > 0:
+                    lote.append(self._fila.get(timeout=restante))
+                else:
+                    lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, lote: list[dict]) -> None:
+        inicio = time.perf_counter()
+        sucesso = False
+        with self._app.app_context():
+            try:
+                self._gravador(lote)
+                sucesso = True
+            except Exception:  # noqa: BLE001
+                db.session.rollback()
+                self._app.logger.exception("Falha ao gravar lote de %d leituras RFID", len(lote))
+            finally:
+                db.session.remove()
+
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self.lotes += 1
+            if sucesso:
+                self.gravadas += len(lote)
+            else:
+                self.falhas += len(lote)
+            self.ultimo_lote_ms = duracao_ms
+            self.maior_lote_ms = max(self.maior_lote_ms, duracao_ms)
+            self._tempo_total_ms += duracao_ms
+        for _ in lote:
+            self._fila.task_done()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "profundidade": self._fila.qsize(),
+                "capacidade": self._fila.maxsize,
+                "enfileiradas": self.enfileiradas,
+                "rejeitadas": self.rejeitadas,
+                "gravadas": self.gravadas,
+                "falhas": self.falhas,
+                "lotes": self.lotes,
+                "ultimo_lote_ms": (
+                    round(self.ultimo_lote_ms, 2) if self.ultimo_lote_ms is not None else None
+                ),
+                "media_lote_ms": (
+                    round(self._tempo_total_ms / self.lotes, 2) if self.lotes else None
+                ),
+                "maior_lote_ms": round(self.maior_lote_ms, 2),
+            }
@@ -2,11 +2,21 @@ from datetime import UTC, datetime
 
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import or_, update
+from sqlalchemy.orm import validates
 from werkzeug.security import check_password_hash, generate_password_hash
 
 db = SQLAlchemy()
 
 
+def normalizar_tag_rfid(valor: str | None) -> str | None:
+    """Retorna a forma canônica de uma tag RFID: sem espaços e em maiúsculas."""
+    if valor is None:
+        return None
+    tag = "".join(str(valor).split()).upper()
+    return tag or None
+
+
 class EnxovalItem(db.Model):
     __tablename__ = "enxoval_items"
 
@@ -22,6 +32,42 @@ class EnxovalItem(db.Model):
     setor = db.Column(db.String(120), nullable=True)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    atualizado_em = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        index=True,
+    )
+    # Instante da revisão mais recente, mantido por marcar_revisao(); evita
+    # agregar a tabela revisoes para achar as peças com revisão pendente.
+    ultima_revisao_em = db.Column(db.DateTime, nullable=True)
+    # Instante da Movimentacao mais recente; toda rotina que grava uma
+    # movimentação atualiza esta coluna. Usada nos alertas de peças paradas.
+    ultima_movimentacao_em = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+    # Índices da busca por trecho (app/busca.py), só no PostgreSQL: trigramas
+    # para ILIKE '%termo%'.
+    __table_args__ = (
+        db.Index("ix_enxoval_items_ativo_ultima_revisao", ativo, ultima_revisao_em),
+        db.Index(
+            "ix_enxoval_items_ativo_status_ultima_movimentacao",
+            ativo,
+            status,
+            ultima_movimentacao_em,
+        ),
+        db.Index(
+            "ix_enxoval_items_nome_trgm",
+            nome,
+            postgresql_using="gin",
+            postgresql_ops={"nome": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        db.Index(
+            "ix_enxoval_items_codigo_trgm",
+            codigo,
+            postgresql_using="gin",
+            postgresql_ops={"codigo": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     movimentacoes = db.relationship(
         "Movimentacao",
@@ -30,10 +76,35 @@ class EnxovalItem(db.Model):
         order_by="Movimentacao.created_at.desc()",
     )
 
+    @validates("tag_rfid")
+    def _normalizar_tag_rfid(self, _chave: str, valor: str | None) -> str | None:
+        return normalizar_tag_rfid(valor)
+
     def __repr__(self) -> str:
         return f"<EnxovalItem {self.codigo}>"
 
 
+def marcar_revisao(condicao, instante: datetime) -> None:
+    """Grava ``instante`` em ultima_revisao_em das peças que atendem ``condicao``.
+
+    Deve ser chamada na mesma transação que grava as Revisao. Não altera
+    atualizado_em, que marca só as mudanças que os leitores RFID precisam
+    sincronizar, e nunca volta a data de uma peça para trás.
+    """
+    db.session.execute(
+        update(EnxovalItem)
+        .where(
+            condicao,
+            or_(
+                EnxovalItem.ultima_revisao_em.is_(None),
+                EnxovalItem.ultima_revisao_em < instante,
+            ),
+        )
+        .values(ultima_revisao_em=instante, atualizado_em=EnxovalItem.atualizado_em)
+        .execution_options(synchronize_session=False)
+    )
+
+
 class Movimentacao(db.Model):
     __tablename__ = "movimentacoes"
 
@@ -48,6 +119,52 @@ class Movimentacao(db.Model):
     item = db.relationship("EnxovalItem", back_populates="movimentacoes")
 
 
+class TagRemovida(db.Model):
+    """Tag que deixou de pertencer a uma peça (exclusão ou troca de tag).
+
+    Permite que leitores externos sincronizados de forma incremental
+    removam a tag da sua lista local.
+    """
+
+    __tablename__ = "tags_removidas"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tag_rfid = db.Column(db.String(64), nullable=False)
+    removido_em = db.Column(db.DateTime, default=lambda: datetime.now(UTC), index=True)
+
+
+class ImportacaoJob(db.Model):
+    """Importação de planilha executada em segundo plano.
+
+    Os contadores são atualizados a cada bloco gravado, o que permite
+    acompanhar o progresso e pedir o cancelamento de qualquer processo.
+    """
+
+    __tablename__ = "importacao_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    arquivo = db.Column(db.String(255), nullable=False)
+    modo = db.Column(db.String(16), nullable=False, default="inserir")
+    status = db.Column(db.String(16), nullable=False, default="pendente", index=True)
+    tamanho_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_lidos = db.Column(db.BigInteger, nullable=False, default=0)
+    linhas = db.Column(db.Integer, nullable=False, default=0)
+    inseridas = db.Column(db.Integer, nullable=False, default=0)
+    atualizadas = db.Column(db.Integer, nullable=False, default=0)
+    inalteradas = db.Column(db.Integer, nullable=False, default=0)
+    ignoradas = db.Column(db.Integer, nullable=False, default=0)
+    falhas = db.Column(db.Integer, nullable=False, default=0)
+    erros = db.Column(db.Text, nullable=True)
+    mensagem = db.Column(db.Text, nullable=True)
+    cancelamento_solicitado = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ImportacaoJob {self.id} {self.status}>"
+
+
 class Configuracao(db.Model):
     __tablename__ = "configuracoes"
 
@@ -56,6 +173,34 @@ class Configuracao(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
 
 
+class ResumoInventario(db.Model):
+    """Quantidade de peças por (status, nome, setor, ativo), mantida por app/resumo.py.
+
+    Peças sem setor ficam com setor "" para que a chave não tenha NULL.
+    """
+
+    __tablename__ = "resumo_inventario"
+
+    status = db.Column(db.String(32), primary_key=True)
+    nome = db.Column(db.String(120), primary_key=True)
+    setor = db.Column(db.String(120), primary_key=True, default="")
+    ativo = db.Column(db.Boolean, primary_key=True)
+    quantidade = db.Column(db.Integer, default=0, nullable=False)
+
+
+class VersaoCache(db.Model):
+    """Versão de um conjunto de dados guardado em cache nos processos.
+
+    Cada alteração incrementa a versão na mesma transação; os workers
+    comparam a versão que guardaram com esta para saber se o cache vale.
+    """
+
+    __tablename__ = "versoes_cache"
+
+    nome = db.Column(db.String(64), primary_key=True)
+    versao = db.Column(db.Integer, default=0, nullable=False)
+
+
 class Revisao(db.Model):
     __tablename__ = "revisoes"
 
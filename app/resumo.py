@@ -0,0 +1,185 @@
+"""Resumo do inventário: quantidade de peças por (status, nome, setor, ativo).
+
+O dashboard e os relatórios leem estes contadores em vez de agrupar
+enxoval_items a cada visita. Toda gravação os ajusta na mesma transação:
+
+- alterações feitas pelo ORM (cadastro, movimentação, edição, inativação,
+  exclusão, importação linha a linha) são contadas pelos eventos de
+  sessão deste módulo, que travam e leem as chaves no banco antes e
+  depois do flush;
+- UPDATE/INSERT em massa (leituras RFID, importação em lote) rodam dentro
+  de ``ajustar_resumo(coluna, valores)``, que compara as chaves das peças
+  afetadas antes e depois da gravação.
+
+Depois do commit de qualquer uma dessas gravações, o processo descarta o
+contexto do dashboard guardado em cache (DASHBOARD_TTL_SEGUNDOS); os
+demais workers o recalculam quando o prazo vence.
+
+``python scripts/resumo_inventario.py`` reconstrói a tabela ou confere se
+ela bate com enxoval_items.
+"""
+
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import EnxovalItem, ResumoInventario, db
+
+CAMPOS_CHAVE = ("status", "nome", "setor", "ativo")
+# Tamanho dos blocos do IN, abaixo do limite de parâmetros do SQLite.
+BLOCO_CONSULTA = 500
+
+Chave = tuple[str, str, str, bool]
+
+
+def _chave(status: str, nome: str, setor: str | None, ativo: bool) -> Chave:
+    return (status, nome, setor or "", bool(ativo))
+
+
+def _contar(conexao, coluna, valores: list, *, travar: bool = False) -> Counter[Chave]:
+    contagem: Counter[Chave] = Counter()
+    for inicio in range(0, len(valores), BLOCO_CONSULTA):
+        consulta = select(*(getattr(EnxovalItem, campo) for campo in CAMPOS_CHAVE)).where(
+            coluna.in_(valores[inicio : inicio + BLOCO_CONSULTA])
+        )
+        if travar:
+            consulta = consulta.with_for_update()
+        contagem.update(_chave(*linha) for linha in conexao.execute(consulta))
+    return contagem
+
+
+def aplicar_variacoes(conexao, variacoes: Counter[Chave]) -> None:
+    """Soma as variações aos contadores, criando as chaves que ainda não existem."""
+    # Ordem fixa das chaves: transações concorrentes travam as linhas na mesma ordem.
+    linhas = [
+        {**dict(zip(CAMPOS_CHAVE, chave, strict=True)), "quantidade": quantidade}
+        for chave, quantidade in sorted(variacoes.items())
+        if quantidade
+    ]
+    if not linhas:
+        return
+    dialeto = postgresql if conexao.dialect.name == "postgresql" else sqlite
+    tabela = ResumoInventario.__table__
+    instrucao = dialeto.insert(tabela)
+    instrucao = instrucao.on_conflict_do_update(
+        index_elements=list(tabela.primary_key.columns),
+        set_={"quantidade": tabela.c.quantidade + instrucao.excluded.quantidade},
+    )
+    conexao.execute(instrucao, linhas)
+
+
+@contextmanager
+def ajustar_resumo(coluna, valores: list) -> Iterator[None]:
+    """Ajusta o resumo para a gravação em massa feita dentro do bloco.
+
+    ``coluna`` e ``valores`` selecionam as peças que a gravação pode criar
+    ou alterar (por id ou código, colunas que a gravação não muda); a
+    consulta é feita em blocos de BLOCO_CONSULTA valores. As linhas são
+    travadas antes da gravação, para que as chaves lidas continuem valendo.
+    """
+    conexao = db.session.connection()
+    antes = _contar(conexao, coluna, valores, travar=True)
+    yield
+    variacoes = _contar(conexao, coluna, valores)
+    variacoes.subtract(antes)
+    aplicar_variacoes(conexao, variacoes)
+    db.session.info["inventario_alterado"] = True
+
+
+def _chave_alterada(item: EnxovalItem) -> bool:
+    estado = inspect(item)
+    return any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_CHAVE)
+
+
+@event.listens_for(Session, "before_flush")
+def _travar_alteradas(session: Session, _contexto, _instancias) -> None:
+    # As chaves antigas vêm do banco, com as linhas travadas, e não da cópia
+    # carregada na sessão, que pode estar desatualizada (ex.: um scan RFID
+    # gravou a peça depois que ela foi lida).
+    ids = sorted(
+        {
+            item.id
+            for item in session.dirty
+            if isinstance(item, EnxovalItem) and _chave_alterada(item)
+        }
+        | {item.id for item in session.deleted if isinstance(item, EnxovalItem)}
+    )
+    antes: Counter[Chave] = Counter()
+    if ids:
+        antes = _contar(session.connection(), EnxovalItem.id, ids, travar=True)
+    session.info["resumo_antes"] = (ids, antes)
+
+
+@event.listens_for(Session, "after_flush")
+def _aplicar_flush(session: Session, _contexto) -> None:
+    # As peças novas são contadas depois do INSERT, já com os valores padrão.
+    ids, antes = session.info.pop("resumo_antes", ([], Counter()))
+    ids = [*ids, *(item.id for item in session.new if isinstance(item, EnxovalItem))]
+    if ids:
+        variacoes = _contar(session.connection(), EnxovalItem.id, ids)
+        variacoes.subtract(antes)
+        aplicar_variacoes(session.connection(), variacoes)
+    alterados = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(objeto, EnxovalItem) for objeto in alterados):
+        session.info["inventario_alterado"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _descartar_dashboard(session: Session) -> None:
+    if session.info.pop("inventario_alterado", False) and has_app_context():
+        current_app.extensions["cache_dashboard"].limpar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _esquecer_alteracao(session: Session) -> None:
+    session.info.pop("resumo_antes", None)
+    session.info.pop("inventario_alterado", None)
+
+
+def contar_inventario() -> Counter[Chave]:
+    """Contagem feita direto em enxoval_items, usada na reconstrução e na conferência."""
+    setor = func.coalesce(EnxovalItem.setor, "")
+    consulta = select(
+        EnxovalItem.status, EnxovalItem.nome, setor, EnxovalItem.ativo, func.count()
+    ).group_by(EnxovalItem.status, EnxovalItem.nome, setor, EnxovalItem.ativo)
+    return Counter({_chave(*linha[:4]): linha[4] for linha in db.session.execute(consulta)})
+
+
+def reconstruir_resumo() -> int:
+    """Refaz a tabela a partir de enxoval_items; retorna o número de chaves."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Bloqueia as gravações nas peças até o commit, sem impedir leituras.
+        db.session.execute(text("LOCK TABLE enxoval_items IN SHARE MODE"))
+    contagem = contar_inventario()
+    db.session.execute(delete(ResumoInventario))
+    if contagem:
+        db.session.execute(
+            insert(ResumoInventario),
+            [
+                {**dict(zip(CAMPOS_CHAVE, chave, strict=True)), "quantidade": quantidade}
+                for chave, quantidade in sorted(contagem.items())
+            ],
+        )
+    db.session.commit()
+    return len(contagem)
+
+
+def divergencias_resumo() -> list[tuple[Chave, int, int]]:
+    """Chaves em que o resumo difere da contagem real: (chave, esperado, registrado)."""
+    esperado = contar_inventario()
+    registrado = Counter(
+        {
+            _chave(linha.status, linha.nome, linha.setor, linha.ativo): linha.quantidade
+            for linha in ResumoInventario.query
+        }
+    )
+    return [
+        (chave, esperado[chave], registrado[chave])
+        for chave in sorted(set(esperado) | set(registrado))
+        if esperado[chave] != registrado[chave]
+    ]
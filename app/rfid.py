@@ -3,15 +3,244 @@
 Este módulo fornece endpoints e utilitários para integração
 com leitores de RFID, permitindo movimentação automatizada
 de peças através de scans.
+
+As tags são resolvidas através de um cache LRU em memória
+(tag normalizada -> projeção da peça). Toda rota que altera
+tag_rfid, ativo, status, setor ou colaborador de uma peça
+deve chamar invalidar_tags() com as tags afetadas.
+
+Leituras repetidas da mesma tag para o mesmo status dentro de
+RFID_JANELA_DEDUP_SEGUNDOS são confirmadas sem tocar no banco.
 """
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func
+import hashlib
+from datetime import UTC, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import Column, MetaData, String, Table, func, insert, literal, or_, select, update
 
-from .models import EnxovalItem, Movimentacao, db
+from .cache import CacheTTL, JanelaDeduplicacao, LRUCache
+from .eventos import BarramentoEventos, publicar_evento
+from .ingestao import FilaIngestao
+from .models import (
+    EnxovalItem,
+    Movimentacao,
+    Revisao,
+    TagRemovida,
+    db,
+    marcar_revisao,
+    normalizar_tag_rfid,
+)
+from .resumo import BLOCO_CONSULTA, ajustar_resumo
 
 rfid_bp = Blueprint("rfid", __name__, url_prefix="/api/rfid")
 
+STATUS_VALIDOS = ["estoque", "entregue", "em_uso", "em_lavagem", "disponivel"]
+CAMPOS_PROJECAO = (
+    EnxovalItem.id,
+    EnxovalItem.codigo,
+    EnxovalItem.nome,
+    EnxovalItem.tamanho,
+    EnxovalItem.status,
+    EnxovalItem.setor,
+    EnxovalItem.colaborador,
+    EnxovalItem.tag_rfid,
+)
+CAMPOS_SINCRONIZACAO = (
+    EnxovalItem.tag_rfid,
+    EnxovalItem.codigo,
+    EnxovalItem.nome,
+    EnxovalItem.tamanho,
+    EnxovalItem.status,
+)
+BLOCO_STREAMING = 1000
+CAMPOS_DESTINO = ("status", "setor", "colaborador", "observacao")
+# Tabela temporária com as tags de uma varredura, criada na conexão da requisição.
+TAGS_VARREDURA = Table(
+    "tags_varredura",
+    MetaData(),
+    Column("tag_rfid", String(64), primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+
+def _cache_tags() -> LRUCache:
+    return current_app.extensions["cache_tags_rfid"]
+
+
+def _janela_dedup() -> JanelaDeduplicacao:
+    return current_app.extensions["dedup_rfid"]
+
+
+def _fila_ingestao() -> FilaIngestao:
+    return current_app.extensions["fila_ingestao_rfid"]
+
+
+def invalidar_tags(*tags: str | None) -> None:
+    """Remove tags do cache de resolução após alterações na peça."""
+    _cache_tags().invalidar(*(tag for tag in tags if tag))
+
+
+def _ler_destino(dados: dict) -> dict:
+    """Extrai status, setor, colaborador e observação de um payload de scan."""
+    status = (dados.get("status") or "em_uso").strip().lower()
+    if status not in STATUS_VALIDOS:
+        status = "em_uso"
+    return {
+        "status": status,
+        "setor": (dados.get("setor") or "").strip() or None,
+        "colaborador": (dados.get("colaborador") or "").strip() or None,
+        "observacao": (dados.get("observacao") or "").strip() or None,
+    }
+
+
+def _resolver_tags(tags: list[str]) -> dict[str, dict]:
+    """Resolve tags em projeções de peças ativas, consultando o cache primeiro.
+
+    As tags ausentes do cache são buscadas em blocos com IN e
+    passam a ser guardadas no cache.
+    """
+    cache = _cache_tags()
+    projecoes: dict[str, dict] = {}
+    faltantes = []
+    for tag in dict.fromkeys(tags):
+        projecao = cache.obter(tag)
+        if projecao is None:
+            faltantes.append(tag)
+        else:
+            projecoes[tag] = projecao
+
+    for inicio in range(0, len(faltantes), BLOCO_CONSULTA):
+        bloco = faltantes[inicio : inicio + BLOCO_CONSULTA]
+        linhas = db.session.query(*CAMPOS_PROJECAO).filter(
+            EnxovalItem.tag_rfid.in_(bloco),
+            EnxovalItem.ativo.is_(True)
+        )
+        for linha in linhas:
+            projecao = linha._asdict()
+            cache.definir(projecao["tag_rfid"], projecao)
+            projecoes[projecao["tag_rfid"]] = projecao
+    return projecoes
+
+
+def _aplicar_leituras(tags: list[str], destino: dict) -> dict[str, dict]:
+    """Aplica o destino às peças ativas com as tags dadas, sem fazer commit.
+
+    As peças são atualizadas com UPDATE ... WHERE tag_rfid IN ... RETURNING,
+    sem carregar os objetos; as movimentações e as projeções retornadas
+    vêm das linhas gravadas, não do cache, que pode não ter visto trocas de
+    tag feitas por outros processos. Tags sem peça ativa saem do cache.
+    """
+    valores = {"status": destino["status"]}
+    if destino["setor"]:
+        valores["setor"] = destino["setor"]
+    if destino["colaborador"]:
+        valores["colaborador"] = destino["colaborador"]
+
+    agora = datetime.now(UTC)
+    tags = list(dict.fromkeys(tags))
+    atualizadas = {}
+    with ajustar_resumo(EnxovalItem.tag_rfid, tags):
+        for inicio in range(0, len(tags), BLOCO_CONSULTA):
+            resultado = db.session.execute(
+                update(EnxovalItem)
+                .where(
+                    EnxovalItem.tag_rfid.in_(tags[inicio : inicio + BLOCO_CONSULTA]),
+                    EnxovalItem.ativo.is_(True),
+                )
+                .values(**valores, ultima_movimentacao_em=agora)
+                .returning(*CAMPOS_PROJECAO)
+                .execution_options(synchronize_session=False)
+            )
+            for linha in resultado:
+                atualizadas[linha.tag_rfid] = linha._asdict()
+
+    # As projeções novas substituem as do cache depois do commit.
+    invalidar_tags(*(tag for tag in tags if tag not in atualizadas))
+
+    for tag_rfid, atualizada in atualizadas.items():
+        db.session.add(
+            Movimentacao(
+                item_id=atualizada["id"],
+                status=atualizada["status"],
+                colaborador=atualizada["colaborador"],
+                setor=atualizada["setor"],
+                observacao=destino["observacao"] or f"Scan RFID: {tag_rfid}",
+                created_at=agora,
+            )
+        )
+    return atualizadas
+
+
+def _confirmar_leituras(atualizadas: dict[str, dict]) -> None:
+    """Faz o commit e grava no cache as projeções já atualizadas."""
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        invalidar_tags(*atualizadas)
+        _janela_dedup().descartar(
+            *((tag, projecao["status"]) for tag, projecao in atualizadas.items())
+        )
+        raise
+    cache = _cache_tags()
+    for tag_rfid, projecao in atualizadas.items():
+        cache.definir(tag_rfid, projecao)
+    if atualizadas:
+        current_app.extensions["metricas_ingestao_rfid"].registrar(len(atualizadas))
+        publicar_evento("scan", {"itens": list(atualizadas.values())})
+
+
+def gravar_leituras(leituras: list[dict]) -> None:
+    """Grava um lote de leituras da fila de ingestão em uma única transação.
+
+    Cada leitura traz 'tag_rfid' e os campos de destino. Leituras
+    consecutivas com o mesmo destino são aplicadas juntas, preservando
+    a ordem de chegada. O cache de tags só recebe as projeções novas depois
+    do commit; se a gravação falhar, as tags do lote saem do cache e da
+    janela de deduplicação, para que o leitor possa repetir a leitura.
+    """
+    atualizadas: dict[str, dict] = {}
+    try:
+        for chave, grupo in groupby(leituras, key=itemgetter(*CAMPOS_DESTINO)):
+            destino = dict(zip(CAMPOS_DESTINO, chave, strict=True))
+            atualizadas.update(
+                _aplicar_leituras([leitura["tag_rfid"] for leitura in grupo], destino)
+            )
+        _confirmar_leituras(atualizadas)
+    except Exception:
+        invalidar_tags(*(leitura["tag_rfid"] for leitura in leituras))
+        _janela_dedup().descartar(
+            *((leitura["tag_rfid"], leitura["status"]) for leitura in leituras)
+        )
+        raise
+
+
+def _enfileirar_scan(tag_rfid: str, destino: dict):
+    item = _resolver_tags([tag_rfid]).get(tag_rfid)
+    if not item:
+        _janela_dedup().descartar((tag_rfid, destino["status"]))
+        return jsonify({
+            "sucesso": False,
+            "mensagem": f"Peça com RFID '{tag_rfid}' não encontrada"
+        }), 404
+
+    if not _fila_ingestao().enfileirar({"tag_rfid": tag_rfid, **destino}):
+        _janela_dedup().descartar((tag_rfid, destino["status"]))
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Fila de ingestão cheia ou encerrando, tente novamente"
+        }), 503, {"Retry-After": "1"}
+
+    return jsonify({
+        "sucesso": True,
+        "enfileirada": True,
+        "mensagem": f"Leitura da peça {item['codigo']} enfileirada",
+        "item": item,
+    }), 202
+
 
 @rfid_bp.route("/scan", methods=["POST"])
 def processar_scan():
@@ -28,6 +257,9 @@ def processar_scan():
     - sucesso: True/False
     - mensagem: Descrição do resultado
     - item: Dados da peça (se encontrada)
+
+    Com RFID_INGESTAO_ASSINCRONA ativo, a leitura é validada e enfileirada,
+    e a resposta é 202 (ou 503 se a fila estiver cheia ou encerrando).
     """
     dados = request.get_json()
     if not dados:
@@ -36,69 +268,152 @@ def processar_scan():
             "mensagem": "Dados JSON não fornecidos"
         }), 400
 
-    tag_rfid = dados.get("tag_rfid", "").strip().upper()
+    tag_rfid = normalizar_tag_rfid(dados.get("tag_rfid"))
     if not tag_rfid:
         return jsonify({
             "sucesso": False,
             "mensagem": "Tag RFID não fornecida"
         }), 400
 
-    # Buscar peça pelo RFID
-    item = EnxovalItem.query.filter(
-        func.upper(EnxovalItem.tag_rfid) == tag_rfid,
-        EnxovalItem.ativo.is_(True)
-    ).first()
+    destino = _ler_destino(dados)
+    chave_dedup = (tag_rfid, destino["status"])
+    if not _janela_dedup().registrar(chave_dedup):
+        return jsonify({
+            "sucesso": True,
+            "repetida": True,
+            "mensagem": "Leitura repetida ignorada",
+            "item": _cache_tags().obter(tag_rfid),
+        })
 
-    if not item:
+    # Se a leitura não for gravada, a repetição do leitor não pode ser descartada.
+    try:
+        if current_app.config["RFID_INGESTAO_ASSINCRONA"]:
+            return _enfileirar_scan(tag_rfid, destino)
+
+        atualizadas = _aplicar_leituras([tag_rfid], destino)
+        if not atualizadas:
+            _janela_dedup().descartar(chave_dedup)
+            return jsonify({
+                "sucesso": False,
+                "mensagem": f"Peça com RFID '{tag_rfid}' não encontrada"
+            }), 404
+
+        _confirmar_leituras(atualizadas)
+    except Exception:
+        _janela_dedup().descartar(chave_dedup)
+        raise
+    item = atualizadas[tag_rfid]
+
+    return jsonify({
+        "sucesso": True,
+        "mensagem": f"Peça {item['codigo']} atualizada para '{destino['status']}'",
+        "item": item,
+    })
+
+
+@rfid_bp.route("/scan/lote", methods=["POST"])
+def processar_scan_lote():
+    """Processa de uma vez as leituras de um portal RFID.
+
+    Espera JSON com:
+    - tags: Lista de tags lidas (strings ou objetos com 'tag_rfid')
+    - status, setor, colaborador, observacao: Destino comum a todas as
+      leituras, com as mesmas regras de /scan
+
+    Todas as tags são resolvidas com consultas em bloco e as atualizações
+    são gravadas em uma única transação. Tags repetidas no lote ou já lidas
+    dentro da janela de deduplicação são confirmadas sem movimentação.
+
+    Retorna:
+    - sucesso: True se o lote foi processado
+    - total, atualizadas, nao_encontradas, repetidas: Contadores do lote
+    - resultados: Um resultado por leitura, na ordem recebida
+    """
+    dados = request.get_json(silent=True)
+    if not dados:
         return jsonify({
             "sucesso": False,
-            "mensagem": f"Peça com RFID '{tag_rfid}' não encontrada"
-        }), 404
+            "mensagem": "Dados JSON não fornecidos"
+        }), 400
 
-    # Atualizar status
-    novo_status = dados.get("status", "em_uso").strip().lower()
-    setor = dados.get("setor", "").strip() or None
-    colaborador = dados.get("colaborador", "").strip() or None
-    observacao = dados.get("observacao", "").strip() or f"Scan RFID: {tag_rfid}"
-
-    # Validar status
-    status_validos = ["estoque", "entregue", "em_uso", "em_lavagem", "disponivel"]
-    if novo_status not in status_validos:
-        novo_status = "em_uso"
-
-    # Atualizar peça
-    item.status = novo_status
-    if setor:
-        item.setor = setor
-    if colaborador:
-        item.colaborador = colaborador
-
-    # Registrar movimentação
-    movimentacao = Movimentacao(
-        item=item,
-        status=novo_status,
-        colaborador=colaborador or item.colaborador,
-        setor=setor or item.setor,
-        observacao=observacao,
-    )
+    leituras = dados.get("tags")
+    if not isinstance(leituras, list) or not leituras:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Lista de tags não fornecida"
+        }), 400
+
+    limite = current_app.config["RFID_LOTE_MAXIMO"]
+    if len(leituras) > limite:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": f"Lote excede o limite de {limite} leituras"
+        }), 413
 
-    db.session.add(item)
-    db.session.add(movimentacao)
-    db.session.commit()
+    tags = []
+    for leitura in leituras:
+        if isinstance(leitura, dict):
+            leitura = leitura.get("tag_rfid")
+        tags.append(normalizar_tag_rfid(leitura) or "")
+
+    destino = _ler_destino(dados)
+    dedup = _janela_dedup()
+    novas = []
+    suprimidas = set()
+    for tag_rfid in dict.fromkeys(tag for tag in tags if tag):
+        if dedup.registrar((tag_rfid, destino["status"])):
+            novas.append(tag_rfid)
+        else:
+            suprimidas.add(tag_rfid)
+
+    try:
+        atualizadas = _aplicar_leituras(novas, destino)
+        dedup.descartar(*((tag, destino["status"]) for tag in novas if tag not in atualizadas))
+        _confirmar_leituras(atualizadas)
+    except Exception:
+        dedup.descartar(*((tag, destino["status"]) for tag in novas))
+        raise
+
+    resultados = []
+    vistas: set[str] = set()
+    contadores = {"atualizadas": len(atualizadas), "nao_encontradas": 0, "repetidas": 0}
+    for tag_rfid in tags:
+        if not tag_rfid:
+            resultados.append({
+                "tag_rfid": tag_rfid,
+                "sucesso": False,
+                "mensagem": "Tag RFID não fornecida",
+            })
+        elif tag_rfid in vistas or tag_rfid in suprimidas:
+            contadores["repetidas"] += 1
+            resultados.append({
+                "tag_rfid": tag_rfid,
+                "sucesso": True,
+                "repetida": True,
+                "mensagem": "Leitura repetida ignorada",
+            })
+        elif tag_rfid in atualizadas:
+            item = atualizadas[tag_rfid]
+            resultados.append({
+                "tag_rfid": tag_rfid,
+                "sucesso": True,
+                "mensagem": f"Peça {item['codigo']} atualizada para '{destino['status']}'",
+                "item": item,
+            })
+        else:
+            contadores["nao_encontradas"] += 1
+            resultados.append({
+                "tag_rfid": tag_rfid,
+                "sucesso": False,
+                "mensagem": f"Peça com RFID '{tag_rfid}' não encontrada",
+            })
+        vistas.add(tag_rfid)
 
     return jsonify({
         "sucesso": True,
-        "mensagem": f"Peça {item.codigo} atualizada para '{novo_status}'",
-        "item": {
-            "id": item.id,
-            "codigo": item.codigo,
-            "nome": item.nome,
-            "tamanho": item.tamanho,
-            "status": item.status,
-            "setor": item.setor,
-            "colaborador": item.colaborador,
-            "tag_rfid": item.tag_rfid,
-        }
+        "total": len(tags),
+        **contadores,
+        "resultados": resultados,
     })
 
 
@@ -109,10 +424,8 @@ def buscar_por_rfid(tag_rfid: str):
     Útil para verificar se uma tag está cadastrada
     antes de processar o scan.
     """
-    item = EnxovalItem.query.filter(
-        func.upper(EnxovalItem.tag_rfid) == tag_rfid.upper(),
-        EnxovalItem.ativo.is_(True)
-    ).first()
+    tag_rfid = normalizar_tag_rfid(tag_rfid) or ""
+    item = _resolver_tags([tag_rfid]).get(tag_rfid) if tag_rfid else None
 
     if not item:
         return jsonify({
@@ -122,67 +435,370 @@ def buscar_por_rfid(tag_rfid: str):
 
     return jsonify({
         "encontrado": True,
-        "item": {
-            "id": item.id,
-            "codigo": item.codigo,
-            "nome": item.nome,
-            "tamanho": item.tamanho,
-            "status": item.status,
-            "setor": item.setor,
-            "colaborador": item.colaborador,
-            "tag_rfid": item.tag_rfid,
-        }
+        "item": item,
     })
 
 
+@rfid_bp.route("/reconciliar", methods=["POST"])
+def reconciliar_setor():
+    """Confere a varredura de um setor contra as peças cadastradas nele.
+
+    Espera JSON com:
+    - setor: Setor varrido
+    - tags: Lista de tags lidas pelo coletor
+    - registrar: Se True, grava uma revisão para cada peça lida (opcional)
+    - conferente: Responsável pela varredura (obrigatório com registrar)
+
+    As tags lidas são carregadas em uma tabela temporária e as diferenças
+    são calculadas no banco, sem trazer as peças do setor para a memória.
+
+    Retorna:
+    - faltantes: Peças ativas do setor cuja tag não foi lida
+    - inesperadas: Peças lidas que estão cadastradas em outro setor
+    - desconhecidas: Tags lidas que não pertencem a nenhuma peça ativa
+    - revisoes_registradas: Quantidade de revisões gravadas
+    """
+    dados = request.get_json(silent=True)
+    if not dados:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Dados JSON não fornecidos"
+        }), 400
+
+    setor = (dados.get("setor") or "").strip()
+    leituras = dados.get("tags")
+    if not setor or not isinstance(leituras, list):
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Informe o setor e a lista de tags"
+        }), 400
+
+    limite = current_app.config["RFID_VARREDURA_MAXIMO"]
+    if len(leituras) > limite:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": f"Varredura excede o limite de {limite} leituras"
+        }), 413
+
+    registrar = bool(dados.get("registrar"))
+    conferente = (dados.get("conferente") or "").strip()
+    if registrar and not conferente:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Informe o conferente para registrar a revisão"
+        }), 400
+
+    tags = [
+        {"tag_rfid": tag}
+        for tag in dict.fromkeys(
+            normalizar_tag_rfid(leitura.get("tag_rfid") if isinstance(leitura, dict) else leitura)
+            for leitura in leituras
+        )
+        if tag
+    ]
+
+    conexao = db.session.connection()
+    # A tabela pode ter sobrado na conexão do pool após uma falha; por isso o DELETE.
+    TAGS_VARREDURA.create(conexao, checkfirst=True)
+    try:
+        conexao.execute(TAGS_VARREDURA.delete())
+        if tags:
+            conexao.execute(insert(TAGS_VARREDURA), tags)
+        lida = TAGS_VARREDURA.c.tag_rfid
+
+        faltantes = [
+            linha._asdict()
+            for linha in db.session.query(*CAMPOS_PROJECAO)
+            .outerjoin(TAGS_VARREDURA, lida == EnxovalItem.tag_rfid)
+            .filter(
+                EnxovalItem.ativo.is_(True),
+                EnxovalItem.setor == setor,
+                EnxovalItem.tag_rfid.isnot(None),
+                lida.is_(None),
+            )
+            .order_by(EnxovalItem.codigo)
+        ]
+        inesperadas = [
+            linha._asdict()
+            for linha in db.session.query(*CAMPOS_PROJECAO)
+            .join(TAGS_VARREDURA, lida == EnxovalItem.tag_rfid)
+            .filter(
+                EnxovalItem.ativo.is_(True),
+                or_(EnxovalItem.setor.is_(None), EnxovalItem.setor != setor),
+            )
+            .order_by(EnxovalItem.codigo)
+        ]
+        desconhecidas = [
+            tag
+            for (tag,) in db.session.query(lida)
+            .outerjoin(
+                EnxovalItem,
+                (EnxovalItem.tag_rfid == lida) & EnxovalItem.ativo.is_(True),
+            )
+            .filter(EnxovalItem.id.is_(None))
+            .order_by(lida)
+        ]
+
+        revisoes = 0
+        if registrar:
+            agora = datetime.now(UTC)
+            lidas = (
+                select(
+                    EnxovalItem.id,
+                    literal(conferente, String),
+                    EnxovalItem.setor,
+                    EnxovalItem.colaborador,
+                    literal(agora, db.DateTime),
+                )
+                .join(TAGS_VARREDURA, lida == EnxovalItem.tag_rfid)
+                .where(EnxovalItem.ativo.is_(True))
+            )
+            revisoes = conexao.execute(
+                insert(Revisao).from_select(
+                    ["item_id", "conferente", "setor", "colaborador", "created_at"], lidas
+                )
+            ).rowcount
+            marcar_revisao(
+                EnxovalItem.ativo.is_(True) & EnxovalItem.tag_rfid.in_(select(lida)), agora
+            )
+        TAGS_VARREDURA.drop(conexao)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if revisoes:
+        publicar_evento(
+            "reconciliacao",
+            {"setor": setor, "conferente": conferente, "revisoes": revisoes},
+        )
+
+    return jsonify({
+        "sucesso": True,
+        "setor": setor,
+        "lidas": len(tags),
+        "faltantes": faltantes,
+        "inesperadas": inesperadas,
+        "desconhecidas": desconhecidas,
+        "revisoes_registradas": revisoes,
+    })
+
+
+def _ler_cursor(valor: str) -> datetime | None:
+    try:
+        cursor = datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+    if cursor.tzinfo is not None:
+        cursor = cursor.astimezone(UTC).replace(tzinfo=None)
+    return cursor
+
+
+def _formatar_cursor(*instantes: datetime | None) -> str | None:
+    validos = [instante.replace(tzinfo=None) for instante in instantes if instante]
+    return max(validos).isoformat() if validos else None
+
+
+def _em_segundos(coluna):
+    """Instante da coluna em segundos, com fração, para agregar no banco."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", coluna)
+    return func.julianday(coluna) * 86400
+
+
 @rfid_bp.route("/tags")
 def listar_tags():
     """Lista todas as tags RFID cadastradas.
 
     Útil para sincronização com leitores externos.
+
+    Sem parâmetros, devolve a lista completa em streaming, com ETag
+    (responde 304 a If-None-Match) e um cursor. Com ?since=<cursor>,
+    devolve o que mudou depois do cursor, repetindo as alterações dos
+    últimos RFID_SINCRONIZACAO_MARGEM_SEGUNDOS antes dele: o instante
+    gravado é o do flush, e uma transação que confirma depois de outra pode
+    trazer um instante anterior ao cursor já entregue. O leitor deve
+    aplicar as listas de forma idempotente (remover e gravar por tag):
+    - alteradas: Tags novas ou com dados alterados
+    - removidas: Tags de peças inativadas, excluídas ou que trocaram de tag
+      (aplicar antes de 'alteradas')
+    - cursor: Valor a enviar em 'since' na próxima sincronização
     """
-    itens = EnxovalItem.query.filter(
-        EnxovalItem.tag_rfid.isnot(None),
-        EnxovalItem.ativo.is_(True)
-    ).all()
+    since = request.args.get("since")
+    if since:
+        return _listar_tags_alteradas(since)
+
+    # A soma dos instantes muda a cada gravação confirmada, mesmo quando a
+    # transação traz um atualizado_em anterior ao máximo já entregue.
+    total, ultima_alteracao, soma_alteracoes = db.session.query(
+        func.count(EnxovalItem.id).filter(EnxovalItem.ativo.is_(True)),
+        func.max(EnxovalItem.atualizado_em),
+        func.sum(_em_segundos(EnxovalItem.atualizado_em)),
+    ).filter(EnxovalItem.tag_rfid.isnot(None)).one()
+    removidas, ultima_remocao = db.session.query(
+        func.count(TagRemovida.id), func.max(TagRemovida.removido_em)
+    ).one()
+    cursor = _formatar_cursor(ultima_alteracao, ultima_remocao)
+
+    etag = hashlib.sha1(
+        f"{total}|{cursor}|{soma_alteracoes}|{removidas}".encode()
+    ).hexdigest()
+    if etag in request.if_none_match:
+        resposta = Response(status=304)
+        resposta.set_etag(etag)
+        return resposta
+
+    consulta = (
+        db.session.query(*CAMPOS_SINCRONIZACAO)
+        .filter(EnxovalItem.tag_rfid.isnot(None), EnxovalItem.ativo.is_(True))
+        .order_by(EnxovalItem.id)
+        .execution_options(yield_per=BLOCO_STREAMING)
+    )
+    dumps = current_app.json.dumps
+
+    def gerar():
+        yield f'{{"total": {total}, "cursor": {dumps(cursor)}, "tags": ['
+        separador = ""
+        bloco = []
+        for linha in consulta:
+            bloco.append(separador + dumps(linha._asdict()))
+            separador = ","
+            if len(bloco) >= BLOCO_STREAMING:
+                yield "".join(bloco)
+                bloco = []
+        yield "".join(bloco) + "]}"
+
+    resposta = Response(stream_with_context(gerar()), mimetype="application/json")
+    resposta.set_etag(etag)
+    return resposta
+
+
+def _listar_tags_alteradas(since: str):
+    cursor = _ler_cursor(since)
+    if cursor is None:
+        return jsonify({
+            "sucesso": False,
+            "mensagem": "Cursor inválido"
+        }), 400
+
+    alteradas = []
+    removidas = []
+    ultima_alteracao = cursor
+    inicio = cursor - timedelta(seconds=current_app.config["RFID_SINCRONIZACAO_MARGEM_SEGUNDOS"])
+    linhas = (
+        db.session.query(*CAMPOS_SINCRONIZACAO, EnxovalItem.ativo, EnxovalItem.atualizado_em)
+        .filter(EnxovalItem.tag_rfid.isnot(None), EnxovalItem.atualizado_em > inicio)
+        .order_by(EnxovalItem.atualizado_em)
+    )
+    for linha in linhas:
+        dados = linha._asdict()
+        ativo = dados.pop("ativo")
+        ultima_alteracao = max(ultima_alteracao, dados.pop("atualizado_em"))
+        if ativo:
+            alteradas.append(dados)
+        else:
+            removidas.append(dados["tag_rfid"])
+
+    remocoes = (
+        db.session.query(TagRemovida.tag_rfid, TagRemovida.removido_em)
+        .filter(TagRemovida.removido_em > inicio)
+        .order_by(TagRemovida.removido_em)
+    )
+    for tag_rfid, removido_em in remocoes:
+        removidas.append(tag_rfid)
+        ultima_alteracao = max(ultima_alteracao, removido_em)
 
     return jsonify({
-        "total": len(itens),
-        "tags": [
-            {
-                "tag_rfid": item.tag_rfid,
-                "codigo": item.codigo,
-                "nome": item.nome,
-                "tamanho": item.tamanho,
-                "status": item.status,
-            }
-            for item in itens
-        ]
+        "cursor": _formatar_cursor(ultima_alteracao),
+        "alteradas": alteradas,
+        "removidas": removidas,
     })
 
 
+@rfid_bp.route("/eventos")
+def stream_eventos():
+    """Stream Server-Sent Events com scans, movimentações e revisões.
+
+    Cada evento tem 'event' igual ao tipo ('scan', 'movimentacao' ou
+    'revisao') e 'data' em JSON. Sem eventos, um comentário de keep-alive
+    é enviado a cada RFID_EVENTOS_KEEPALIVE_SEGUNDOS.
+    """
+    barramento: BarramentoEventos = current_app.extensions["eventos"]
+    assinatura = barramento.assinar()
+    intervalo = current_app.config["RFID_EVENTOS_KEEPALIVE_SEGUNDOS"]
+    dumps = current_app.json.dumps
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                eventos = assinatura.proximos(timeout=intervalo)
+                if not eventos:
+                    yield ": keep-alive\n\n"
+                for evento in eventos:
+                    yield (
+                        f"id: {evento['id']}\nevent: {evento['tipo']}\n"
+                        f"data: {dumps(evento['dados'])}\n\n"
+                    )
+        finally:
+            barramento.cancelar(assinatura)
+
+    return Response(
+        gerar(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _calcular_estatisticas() -> dict:
+    """Conta peças ativas com e sem tag, por status, em uma única agregação."""
+    por_status = {}
+    for status, total, com_rfid in (
+        db.session.query(
+            EnxovalItem.status,
+            func.count(EnxovalItem.id),
+            func.count(EnxovalItem.tag_rfid),
+        )
+        .filter(EnxovalItem.ativo.is_(True))
+        .group_by(EnxovalItem.status)
+    ):
+        por_status[status] = {"com_rfid": com_rfid, "sem_rfid": total - com_rfid}
+
+    total_com_rfid = sum(contagem["com_rfid"] for contagem in por_status.values())
+    total_sem_rfid = sum(contagem["sem_rfid"] for contagem in por_status.values())
+    return {
+        "total_com_rfid": total_com_rfid,
+        "total_sem_rfid": total_sem_rfid,
+        "total_ativos": total_com_rfid + total_sem_rfid,
+        "por_status": por_status,
+    }
+
+
 @rfid_bp.route("/status", methods=["GET"])
 def status_rfid():
     """Retorna status da integração RFID.
 
     Endpoint para verificar se a API está funcionando
-    e obter estatísticas de uso.
+    e obter estatísticas de uso. As contagens do banco são
+    reaproveitadas por RFID_STATUS_TTL_SEGUNDOS.
     """
-    total_com_rfid = EnxovalItem.query.filter(
-        EnxovalItem.tag_rfid.isnot(None),
-        EnxovalItem.ativo.is_(True)
-    ).count()
-
-    total_sem_rfid = EnxovalItem.query.filter(
-        EnxovalItem.tag_rfid.is_(None),
-        EnxovalItem.ativo.is_(True)
-    ).count()
+    cache: CacheTTL = current_app.extensions["cache_status_rfid"]
+    estatisticas = cache.obter("estatisticas", _calcular_estatisticas)
+    dedup = _janela_dedup().estatisticas()
 
     return jsonify({
         "status": "online",
-        "estatisticas": {
-            "total_com_rfid": total_com_rfid,
-            "total_sem_rfid": total_sem_rfid,
-            "total_ativos": total_com_rfid + total_sem_rfid,
-        }
+        "estatisticas": estatisticas,
+        "idade_estatisticas_segundos": round(cache.idade("estatisticas") or 0, 1),
+        "ingestao": {
+            **current_app.extensions["metricas_ingestao_rfid"].estatisticas(),
+            "taxa_duplicadas": dedup["taxa_supressao"],
+        },
+        "cache_tags": _cache_tags().estatisticas(),
+        "deduplicacao": dedup,
+        "eventos": current_app.extensions["eventos"].estatisticas(),
+        "fila_ingestao": {
+            "ativa": current_app.config["RFID_INGESTAO_ASSINCRONA"],
+            **_fila_ingestao().estatisticas(),
+        },
     })
@@ -1,11 +1,18 @@
-import csv
 import io
 import os
 from datetime import UTC, datetime, timedelta
-from io import StringIO
 
 import qrcode
-from flask import Blueprint, jsonify, redirect, render_template, request, send_file, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    url_for,
+)
 from flask_login import current_user, login_required, login_user, logout_user
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
@@ -13,20 +20,31 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
-from sqlalchemy import func, or_, text
+from sqlalchemy import case, func, or_, text
 
+from . import importacao
+from .busca import filtro_busca
+from .cache import CacheTTL
+from .cadastros import cadastros_ativos
+from .eventos import publicar_evento
 from .models import (
     Colaborador,
     Configuracao,
     EnxovalItem,
+    ImportacaoJob,
     Movimentacao,
+    ResumoInventario,
     Revisao,
     Setor,
+    TagRemovida,
     Tamanho,
     TipoPeca,
     User,
     db,
+    marcar_revisao,
+    normalizar_tag_rfid,
 )
+from .rfid import invalidar_tags
 
 STATUS_OPTIONS = [
     "estoque",
@@ -39,6 +57,9 @@ STATUS_OPTIONS = [
 ALERT_STATUS = {"entregue", "em_uso"}
 ALERT_ATENCAO_DIAS = 2
 ALERT_CRITICO_DIAS = 4
+ALERT_LISTA_LIMITE = 100
+# Abaixo desta estimativa do planejador, a listagem faz o COUNT exato.
+LIMITE_CONTAGEM_EXATA = 10_000
 STATUS_COLORS = {
     "estoque": "#2d6a4f",
     "entregue": "#d97706",
@@ -115,6 +136,7 @@ def _criar_item(
     status: str,
     observacao: str,
 ) -> None:
+    agora = datetime.now(UTC)
     item = EnxovalItem(
         nome=nome,
         codigo=codigo,
@@ -125,6 +147,7 @@ def _criar_item(
         colaborador=colaborador,
         setor=setor,
         status=status,
+        ultima_movimentacao_em=agora,
     )
     db.session.add(item)
     db.session.add(
@@ -134,6 +157,7 @@ def _criar_item(
             colaborador=colaborador,
             setor=setor,
             observacao=observacao,
+            created_at=agora,
         )
     )
 
@@ -222,7 +246,7 @@ def index():
     if request.method == "POST":
         nome = (request.form.get("nome") or "").strip()
         codigo = (request.form.get("codigo") or "").strip().upper()
-        tag_rfid = (request.form.get("tag_rfid") or "").strip().upper() or None
+        tag_rfid = normalizar_tag_rfid(request.form.get("tag_rfid"))
         tamanho = (request.form.get("tamanho") or "").strip().upper()
         tamanho_customizado = (request.form.get("tamanho_customizado") or "").strip() or None
         descricao = (request.form.get("descricao") or "").strip() or None
@@ -337,14 +361,18 @@ def index():
         por_pagina = max(int(request.args.get("por_pagina", "25")), 5)
     except ValueError:
         por_pagina = 25
+    try:
+        apos = int(request.args.get("apos") or 0)
+        antes = int(request.args.get("antes") or 0)
+    except ValueError:
+        apos = antes = 0
 
     itens_query = EnxovalItem.query
     if apenas_ativos:
         itens_query = itens_query.filter(EnxovalItem.ativo.is_(True))
     if busca:
-        termo = f"%{busca}%"
         itens_query = itens_query.filter(
-            (EnxovalItem.nome.ilike(termo)) | (EnxovalItem.codigo.ilike(termo))
+            filtro_busca(busca, usar_fts=current_app.extensions["busca_fts_itens"])
         )
     if filtro_status:
         itens_query = itens_query.filter(EnxovalItem.status == filtro_status)
@@ -363,46 +391,43 @@ def index():
         else:
             itens_query = itens_query.filter(EnxovalItem.colaborador == filtro_colaborador)
 
-    total_itens = itens_query.count()
-    total_paginas = max((total_itens + por_pagina - 1) // por_pagina, 1)
-    if pagina > total_paginas:
-        pagina = total_paginas
-    offset = (pagina - 1) * por_pagina
-    itens = (
-        itens_query.order_by(EnxovalItem.id.desc())
-        .offset(offset)
-        .limit(por_pagina)
-        .all()
-    )
-    tipos_peca_ativos = TipoPeca.query.filter_by(
-        ativo=True
-    ).order_by(TipoPeca.nome.asc()).all()
-    colaboradores_ativos = (
-        Colaborador.query.filter_by(ativo=True).order_by(Colaborador.nome.asc()).all()
+    # Paginação por cursor (keyset) em id: o custo de uma página não depende
+    # da sua posição. "apos" avança para ids menores; "antes" volta.
+    linhas = []
+    if antes:
+        linhas = (
+            itens_query.filter(EnxovalItem.id > antes)
+            .order_by(EnxovalItem.id.asc())
+            .limit(por_pagina + 1)
+            .all()
+        )
+    if len(linhas) > por_pagina:
+        itens = linhas[:por_pagina][::-1]
+        tem_anterior = tem_proxima = True
+    else:
+        # Sem cursor, ou a volta chegou ao início da lista: primeira página.
+        if antes:
+            apos, pagina = 0, 1
+        pagina_query = itens_query.filter(EnxovalItem.id < apos) if apos else itens_query
+        linhas = pagina_query.order_by(EnxovalItem.id.desc()).limit(por_pagina + 1).all()
+        itens = linhas[:por_pagina]
+        tem_anterior = bool(apos)
+        tem_proxima = len(linhas) > por_pagina
+    if not tem_anterior:
+        pagina = 1
+
+    chave_contagem = (busca, filtro_status, filtro_setor, filtro_colaborador, apenas_ativos)
+    total_itens, contagem_estimada = current_app.extensions["cache_contagem_itens"].obter(
+        chave_contagem, lambda: _contar_itens(itens_query)
     )
-    setores_ativos = Setor.query.filter_by(ativo=True).order_by(Setor.nome.asc()).all()
-    tamanhos_ativos = Tamanho.query.filter_by(ativo=True).order_by(Tamanho.nome.asc()).all()
-    setores = Setor.query.order_by(Setor.nome.asc()).all()
+    total_paginas = None
+    if total_itens is not None:
+        total_paginas = max((total_itens + por_pagina - 1) // por_pagina, pagina)
     config = _obter_configuracao()
     limite_revisao = datetime.now(UTC) - timedelta(days=config.periodicidade_revisao_dias)
-    ultima_revisao_sub = (
-        db.session.query(
-            Revisao.item_id,
-            func.max(Revisao.created_at).label("ultima_revisao"),
-        )
-        .group_by(Revisao.item_id)
-        .subquery()
-    )
     pendentes_revisao = (
         db.session.query(func.count(EnxovalItem.id))
-        .outerjoin(ultima_revisao_sub, EnxovalItem.id == ultima_revisao_sub.c.item_id)
-        .filter(EnxovalItem.ativo.is_(True))
-        .filter(
-            or_(
-                ultima_revisao_sub.c.ultima_revisao.is_(None),
-                ultima_revisao_sub.c.ultima_revisao < limite_revisao,
-            )
-        )
+        .filter(_revisao_pendente(limite_revisao))
         .scalar()
         or 0
     )
@@ -410,11 +435,7 @@ def index():
         "index.html",
         itens=itens,
         status_options=STATUS_OPTIONS,
-        tipos_peca_ativos=tipos_peca_ativos,
-        colaboradores_ativos=colaboradores_ativos,
-        setores=setores,
-        setores_ativos=setores_ativos,
-        tamanhos_ativos=tamanhos_ativos,
+        **cadastros_ativos(),
         busca=busca,
         filtro_status=filtro_status,
         filtro_setor=filtro_setor,
@@ -424,83 +445,162 @@ def index():
         por_pagina=por_pagina,
         total_itens=total_itens,
         total_paginas=total_paginas,
-        offset=offset,
+        contagem_estimada=contagem_estimada,
+        cursor_anterior=itens[0].id if itens and tem_anterior else None,
+        cursor_proximo=itens[-1].id if itens and tem_proxima else None,
         pendentes_revisao=pendentes_revisao,
         periodicidade_revisao=config.periodicidade_revisao_dias,
     )
 
 
+def _revisao_pendente(limite: datetime):
+    """Peças ativas nunca revisadas ou com a última revisão antes de ``limite``."""
+    return EnxovalItem.ativo.is_(True) & or_(
+        EnxovalItem.ultima_revisao_em.is_(None), EnxovalItem.ultima_revisao_em < limite
+    )
+
+
+def _contar_itens(itens_query) -> tuple[int | None, bool]:
+    """Total de peças da listagem e se ele é uma estimativa.
+
+    Com ITENS_CONTAGEM="estimada" no PostgreSQL, usa a estimativa de linhas
+    do planejador (EXPLAIN) e só faz o COUNT exato quando ela é pequena.
+    Com "nenhuma", não conta. O resultado é guardado por
+    ITENS_CONTAGEM_TTL_SEGUNDOS pela rota.
+    """
+    modo = current_app.config["ITENS_CONTAGEM"]
+    if modo == "nenhuma":
+        return None, False
+    if modo == "estimada" and db.engine.dialect.name == "postgresql":
+        consulta = itens_query.with_entities(EnxovalItem.id).statement.compile(
+            dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plano = (
+            db.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {consulta}").scalar()
+        )
+        estimativa = int(plano[0]["Plan"]["Plan Rows"])
+        if estimativa >= LIMITE_CONTAGEM_EXATA:
+            return estimativa, True
+    return itens_query.order_by(None).count(), False
+
+
+def _filtro_alerta(agora: datetime):
+    """Peças entregues ou em uso paradas há mais de ALERT_ATENCAO_DIAS dias.
+
+    Percorre só o trecho do índice (ativo, status, ultima_movimentacao_em)
+    anterior ao limite.
+    """
+    return (
+        EnxovalItem.ativo.is_(True)
+        & EnxovalItem.status.in_(ALERT_STATUS)
+        & (EnxovalItem.ultima_movimentacao_em <= agora - timedelta(days=ALERT_ATENCAO_DIAS + 1))
+    )
+
+
+def _nivel_alerta(agora: datetime):
+    """Nível do alerta calculado no banco, para peças que já passam em _filtro_alerta."""
+    return case(
+        (
+            EnxovalItem.ultima_movimentacao_em
+            <= agora - timedelta(days=ALERT_CRITICO_DIAS + 1),
+            "critico",
+        ),
+        else_="atencao",
+    ).label("nivel")
+
+
+def _resumo_alertas(agora: datetime) -> list[tuple[str, str, str, int]]:
+    """Quantidade de alertas por (setor, colaborador, nível) em uma agregação."""
+    setor_expr = func.coalesce(func.nullif(EnxovalItem.setor, ""), "Sem setor")
+    colaborador_expr = func.coalesce(
+        func.nullif(EnxovalItem.colaborador, ""), "Sem colaborador"
+    )
+    nivel = _nivel_alerta(agora)
+    return (
+        db.session.query(setor_expr, colaborador_expr, nivel, func.count(EnxovalItem.id))
+        .filter(_filtro_alerta(agora))
+        .group_by(setor_expr, colaborador_expr, nivel)
+        .all()
+    )
+
+
+def _listar_alertas(agora: datetime, limite: int) -> list[tuple[EnxovalItem, int, str]]:
+    """As ``limite`` peças paradas há mais tempo, como (peça, dias parada, nível)."""
+    linhas = (
+        db.session.query(EnxovalItem, _nivel_alerta(agora))
+        .filter(_filtro_alerta(agora))
+        .order_by(EnxovalItem.ultima_movimentacao_em.asc(), EnxovalItem.id.asc())
+        .limit(limite)
+    )
+    alertas = []
+    for item, nivel in linhas:
+        ultima_mov = item.ultima_movimentacao_em
+        if ultima_mov.tzinfo is None:
+            ultima_mov = ultima_mov.replace(tzinfo=UTC)
+        alertas.append((item, (agora - ultima_mov).days, nivel))
+    return alertas
+
+
+def _contagem_status_ativos() -> dict[str, int]:
+    """Peças ativas por status, lidas do resumo do inventário (app/resumo.py)."""
+    quantidade = func.sum(ResumoInventario.quantidade)
+    return dict(
+        db.session.query(ResumoInventario.status, quantidade)
+        .filter(ResumoInventario.ativo.is_(True))
+        .group_by(ResumoInventario.status)
+        .having(quantidade > 0)
+        .all()
+    )
+
+
 def _montar_dashboard_context() -> dict:
+    # Contagens lidas do resumo do inventário (app/resumo.py), não de enxoval_items.
+    soma_quantidade = func.sum(ResumoInventario.quantidade)
     status_counts = dict(
-        db.session.query(EnxovalItem.status, func.count(EnxovalItem.id))
-        .group_by(EnxovalItem.status)
+        db.session.query(ResumoInventario.status, soma_quantidade)
+        .group_by(ResumoInventario.status)
+        .having(soma_quantidade > 0)
         .all()
     )
     pendentes_status = {"entregue", "em_uso", "em_lavagem"}
     pendentes = sum(status_counts.get(status, 0) for status in pendentes_status)
     extraviados = status_counts.get("extraviado", 0)
     total_ativos = (
-        db.session.query(func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .scalar()
-        or 0
+        db.session.query(soma_quantidade).filter(ResumoInventario.ativo.is_(True)).scalar() or 0
     )
 
     por_tipo = (
-        db.session.query(EnxovalItem.nome, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .group_by(EnxovalItem.nome)
-        .order_by(EnxovalItem.nome.asc())
+        db.session.query(ResumoInventario.nome, soma_quantidade)
+        .filter(ResumoInventario.ativo.is_(True))
+        .group_by(ResumoInventario.nome)
+        .having(soma_quantidade > 0)
+        .order_by(ResumoInventario.nome.asc())
         .all()
     )
 
-    setor_expr = func.coalesce(func.nullif(EnxovalItem.setor, ""), "Sem setor").label("setor")
+    setor_expr = func.coalesce(
+        func.nullif(ResumoInventario.setor, ""), "Sem setor"
+    ).label("setor")
     por_setor = (
-        db.session.query(setor_expr, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
+        db.session.query(setor_expr, soma_quantidade)
+        .filter(ResumoInventario.ativo.is_(True))
         .group_by(setor_expr)
+        .having(soma_quantidade > 0)
         .order_by(setor_expr.asc())
         .all()
     )
 
-    ultima_mov_subquery = (
-        db.session.query(
-            Movimentacao.item_id,
-            func.max(Movimentacao.created_at).label("ultima_mov"),
-        )
-        .group_by(Movimentacao.item_id)
-        .subquery()
-    )
-    itens_alerta = (
-        db.session.query(EnxovalItem, ultima_mov_subquery.c.ultima_mov)
-        .join(ultima_mov_subquery, EnxovalItem.id == ultima_mov_subquery.c.item_id)
-        .filter(EnxovalItem.ativo.is_(True), EnxovalItem.status.in_(ALERT_STATUS))
-        .all()
-    )
-    agora = datetime.now(UTC)
     alerta_total = {"atencao": 0, "critico": 0}
     alerta_por_setor: dict[str, dict[str, int]] = {}
     alerta_por_colaborador: dict[str, dict[str, int]] = {}
 
-    for item, ultima_mov in itens_alerta:
-        if not ultima_mov:
-            continue
-        if ultima_mov.tzinfo is None:
-            ultima_mov = ultima_mov.replace(tzinfo=UTC)
-        dias = (agora - ultima_mov).days
-        nivel = None
-        if dias > ALERT_CRITICO_DIAS:
-            nivel = "critico"
-        elif dias > ALERT_ATENCAO_DIAS:
-            nivel = "atencao"
-        if not nivel:
-            continue
-
-        alerta_total[nivel] += 1
-        setor = item.setor or "Sem setor"
-        colaborador = item.colaborador or "Sem colaborador"
-        alerta_por_setor.setdefault(setor, {"atencao": 0, "critico": 0})[nivel] += 1
-        alerta_por_colaborador.setdefault(colaborador, {"atencao": 0, "critico": 0})[nivel] += 1
+    for setor, colaborador, nivel, pecas in _resumo_alertas(datetime.now(UTC)):
+        alerta_total[nivel] += pecas
+        alerta_por_setor.setdefault(setor, {"atencao": 0, "critico": 0})[nivel] += pecas
+        por_colaborador = alerta_por_colaborador.setdefault(
+            colaborador, {"atencao": 0, "critico": 0}
+        )
+        por_colaborador[nivel] += pecas
 
     def _ordenar_alertas(dados: dict[str, dict[str, int]]) -> list[tuple[str, int, int, int]]:
         resultado = []
@@ -518,14 +618,14 @@ def _montar_dashboard_context() -> dict:
     acumulado = 0.0
     segmentos = []
     for status in STATUS_OPTIONS:
-        quantidade = status_counts.get(status, 0)
-        if quantidade == 0:
+        quantidade_status = status_counts.get(status, 0)
+        if quantidade_status == 0:
             continue
-        percentual = (quantidade / total_status) * 100
+        percentual = (quantidade_status / total_status) * 100
         status_chart.append(
             {
                 "status": status,
-                "quantidade": quantidade,
+                "quantidade": quantidade_status,
                 "percentual": percentual,
                 "color": STATUS_COLORS.get(status, "#94a3b8"),
             }
@@ -564,9 +664,16 @@ def _montar_dashboard_context() -> dict:
 @main_bp.route("/dashboard")
 @login_required
 def dashboard():
-    """Página com gráficos e indicadores do enxoval."""
-    contexto = _montar_dashboard_context()
-    return render_template("dashboard.html", **contexto)
+    """Página com gráficos e indicadores do enxoval.
+
+    O contexto é reaproveitado por DASHBOARD_TTL_SEGUNDOS e descartado
+    quando o processo grava alterações nas peças (app/resumo.py).
+    """
+    cache: CacheTTL = current_app.extensions["cache_dashboard"]
+    contexto = cache.obter("dashboard", _montar_dashboard_context)
+    return render_template(
+        "dashboard.html", **contexto, idade_dados=round(cache.idade("dashboard") or 0)
+    )
 
 
 @main_bp.route("/status")
@@ -623,37 +730,21 @@ def revisao():
             conferente = (request.form.get("conferente") or "").strip()
             item = db.session.get(EnxovalItem, item_id)
             if item and conferente:
+                agora = datetime.now(UTC)
                 revisao = Revisao(
                     item_id=item.id,
                     conferente=conferente,
                     setor=item.setor,
                     colaborador=item.colaborador,
+                    created_at=agora,
                 )
                 db.session.add(revisao)
+                marcar_revisao(EnxovalItem.id == item.id, agora)
                 db.session.commit()
             return redirect(next_url)
 
     limite = datetime.now(UTC) - timedelta(days=config.periodicidade_revisao_dias)
-    ultima_revisao_sub = (
-        db.session.query(
-            Revisao.item_id,
-            func.max(Revisao.created_at).label("ultima_revisao"),
-        )
-        .group_by(Revisao.item_id)
-        .subquery()
-    )
-
-    itens_query = (
-        db.session.query(EnxovalItem, ultima_revisao_sub.c.ultima_revisao)
-        .outerjoin(ultima_revisao_sub, EnxovalItem.id == ultima_revisao_sub.c.item_id)
-        .filter(EnxovalItem.ativo.is_(True))
-        .filter(
-            or_(
-                ultima_revisao_sub.c.ultima_revisao.is_(None),
-                ultima_revisao_sub.c.ultima_revisao < limite,
-            )
-        )
-    )
+    itens_query = EnxovalItem.query.filter(_revisao_pendente(limite))
 
     if filtro_setor:
         if filtro_setor == "__sem__":
@@ -671,10 +762,9 @@ def revisao():
             itens_query = itens_query.filter(EnxovalItem.colaborador == filtro_colaborador)
 
     itens = itens_query.order_by(EnxovalItem.id.desc()).all()
-    setores_ativos = Setor.query.filter_by(ativo=True).order_by(Setor.nome.asc()).all()
-    colaboradores_ativos = (
-        Colaborador.query.filter_by(ativo=True).order_by(Colaborador.nome.asc()).all()
-    )
+    cadastros = cadastros_ativos()
+    setores_ativos = cadastros["setores_ativos"]
+    colaboradores_ativos = cadastros["colaboradores_ativos"]
 
     return render_template(
         "revisao.html",
@@ -719,26 +809,31 @@ def revisao_scan():
             {"sucesso": False, "mensagem": f"Peça {codigo} não encontrada."}
         ), 404
 
+    agora = datetime.now(UTC)
     revisao = Revisao(
         item_id=item.id,
         conferente=conferente,
         setor=item.setor,
         colaborador=item.colaborador,
+        created_at=agora,
     )
     db.session.add(revisao)
+    marcar_revisao(EnxovalItem.id == item.id, agora)
     db.session.commit()
 
+    dados_item = {
+        "codigo": item.codigo,
+        "nome": item.nome,
+        "tamanho": item.tamanho,
+        "setor": item.setor,
+        "colaborador": item.colaborador,
+    }
+    publicar_evento("revisao", {"item": dados_item, "conferente": conferente})
     return jsonify(
         {
             "sucesso": True,
             "mensagem": f"Peça {item.codigo} conferida.",
-            "item": {
-                "codigo": item.codigo,
-                "nome": item.nome,
-                "tamanho": item.tamanho,
-                "setor": item.setor,
-                "colaborador": item.colaborador,
-            },
+            "item": dados_item,
         }
     )
 
@@ -820,36 +915,28 @@ def editar_item(item_id: int):
         return redirect(url_for("main.index"))
 
     if request.method == "POST":
+        tag_anterior = item.tag_rfid
         item.nome = (request.form.get("nome") or item.nome).strip()
         item.codigo = (request.form.get("codigo") or item.codigo).strip().upper()
         item.tamanho = (request.form.get("tamanho") or item.tamanho).strip().upper()
         item.tamanho_customizado = (request.form.get("tamanho_customizado") or "").strip() or None
-        item.tag_rfid = (request.form.get("tag_rfid") or "").strip().upper() or None
+        item.tag_rfid = normalizar_tag_rfid(request.form.get("tag_rfid"))
         item.descricao = (request.form.get("descricao") or "").strip() or None
         item.colaborador = (request.form.get("colaborador") or "").strip() or None
         item.setor = (request.form.get("setor") or "").strip() or None
 
         db.session.add(item)
+        if tag_anterior and tag_anterior != item.tag_rfid:
+            db.session.add(TagRemovida(tag_rfid=tag_anterior))
         db.session.commit()
+        invalidar_tags(tag_anterior, item.tag_rfid)
         return redirect(url_for("main.index"))
 
     # GET - mostrar formulário de edição
-    setores_ativos = Setor.query.filter_by(ativo=True).order_by(Setor.nome.asc()).all()
-    colaboradores_ativos = (
-        Colaborador.query.filter_by(ativo=True).order_by(Colaborador.nome.asc()).all()
-    )
-    tipos_peca_ativos = (
-        TipoPeca.query.filter_by(ativo=True).order_by(TipoPeca.nome.asc()).all()
-    )
-    tamanhos_ativos = Tamanho.query.filter_by(ativo=True).order_by(Tamanho.nome.asc()).all()
-
     return render_template(
         "editar_item.html",
         item=item,
-        setores_ativos=setores_ativos,
-        colaboradores_ativos=colaboradores_ativos,
-        tipos_peca_ativos=tipos_peca_ativos,
-        tamanhos_ativos=tamanhos_ativos,
+        **cadastros_ativos(),
     )
 
 
@@ -911,45 +998,113 @@ def editar_tipo_peca(tipo_id: int):
 @main_bp.route("/importar", methods=["POST"])
 @login_required
 def importar_csv():
-    """Importa dados de CSV."""
+    """Importa peças de uma planilha CSV ou XLSX.
+
+    Com IMPORTACAO_EM_SEGUNDO_PLANO, o arquivo é salvo e importado por um
+    job em segundo plano, e a resposta sai imediatamente (202 em JSON ou
+    redirecionamento para a tela de acompanhamento). Sem ele, o upload é
+    importado na própria requisição em blocos de IMPORTACAO_LOTE linhas.
+    Com modo=mesclar, peças já cadastradas são atualizadas pelo código
+    em vez de recusadas.
+    """
     arquivo = request.files.get("arquivo")
     if not arquivo or not arquivo.filename:
         return redirect(url_for("main.index"))
 
-    conteudo = arquivo.stream.read().decode("utf-8-sig")
-    leitor = csv.DictReader(StringIO(conteudo))
-    for linha in leitor:
-        nome = (linha.get("nome") or "").strip()
-        codigo = (linha.get("codigo") or "").strip().upper()
-        tag_rfid = (linha.get("tag_rfid") or "").strip().upper() or None
-        tamanho = (linha.get("tamanho") or "").strip().upper()
-        tamanho_customizado = (linha.get("tamanho_customizado") or "").strip() or None
-        descricao = (linha.get("descricao") or "").strip() or None
-        colaborador = (linha.get("colaborador") or "").strip() or None
-        setor = (linha.get("setor") or "").strip() or None
-        status = (linha.get("status") or "").strip().lower() or "estoque"
-        observacao = (linha.get("observacao") or "").strip() or "Importacao CSV"
-
-        if not nome or not codigo or not tamanho:
-            continue
-        if status not in STATUS_OPTIONS:
-            status = "estoque"
-
-        _criar_item(
-            nome=nome,
-            codigo=codigo,
-            tag_rfid=tag_rfid,
-            tamanho=tamanho,
-            tamanho_customizado=tamanho_customizado,
-            descricao=descricao,
-            colaborador=colaborador,
-            setor=setor,
-            status=status,
-            observacao=observacao,
+    modo = request.form.get("modo") or "inserir"
+    if modo not in importacao.MODOS_IMPORTACAO:
+        modo = "inserir"
+    quer_json = request.accept_mimetypes.best == "application/json"
+
+    if current_app.config["IMPORTACAO_EM_SEGUNDO_PLANO"]:
+        job = importacao.agendar_importacao(arquivo, modo, current_app)
+        if quer_json:
+            return jsonify({
+                "sucesso": True,
+                "job": importacao.progresso_job(job),
+                "progresso_url": url_for("main.progresso_importacao", job_id=job.id),
+            }), 202
+        return redirect(url_for("main.acompanhar_importacao", job_id=job.id))
+
+    resumo = importacao.importar_planilha(
+        arquivo.stream, arquivo.filename, current_app.config["IMPORTACAO_LOTE"], modo
+    )
+    if quer_json:
+        return jsonify({"sucesso": True, **resumo.como_dict()})
+    return redirect(
+        url_for(
+            "main.index",
+            importadas=resumo.inseridas,
+            atualizadas=resumo.atualizadas,
+            ignoradas=resumo.ignoradas,
+            falhas=resumo.falhas,
         )
+    )
+
+
+@main_bp.route("/importar/validar", methods=["POST"])
+@login_required
+def validar_importacao():
+    """Simula a importação da planilha enviada e mostra os problemas encontrados.
+
+    Responde em JSON quando o cliente pede application/json.
+    """
+    arquivo = request.files.get("arquivo")
+    quer_json = request.accept_mimetypes.best == "application/json"
+    if not arquivo or not arquivo.filename:
+        if quer_json:
+            return jsonify({"sucesso": False, "mensagem": "Planilha não enviada"}), 400
+        return redirect(url_for("main.index"))
+
+    modo = request.form.get("modo") or "inserir"
+    if modo not in importacao.MODOS_IMPORTACAO:
+        modo = "inserir"
+    validacao = importacao.validar_planilha(
+        arquivo.stream, arquivo.filename, current_app.config["IMPORTACAO_LOTE"], modo
+    )
+    if quer_json:
+        return jsonify({"sucesso": True, "modo": modo, **validacao.como_dict()})
+    return render_template(
+        "validacao_importacao.html",
+        arquivo=arquivo.filename,
+        modo=modo,
+        validacao=validacao.como_dict(),
+    )
+
+
+@main_bp.route("/importacoes/<int:job_id>")
+@login_required
+def acompanhar_importacao(job_id: int):
+    """Tela de acompanhamento de uma importação em segundo plano."""
+    job = db.session.get(ImportacaoJob, job_id)
+    if not job:
+        return redirect(url_for("main.index"))
+    return render_template("importacao.html", job=importacao.progresso_job(job))
 
-    db.session.commit()
-    return redirect(url_for("main.index"))
+
+@main_bp.route("/importacoes/<int:job_id>/progresso")
+@login_required
+def progresso_importacao(job_id: int):
+    """Progresso de uma importação: linhas, linhas por segundo, ETA e erros."""
+    job = db.session.get(ImportacaoJob, job_id)
+    if not job:
+        return jsonify({"sucesso": False, "mensagem": "Importação não encontrada"}), 404
+    return jsonify(importacao.progresso_job(job))
+
+
+@main_bp.route("/importacoes/<int:job_id>/cancelar", methods=["POST"])
+@login_required
+def cancelar_importacao(job_id: int):
+    """Pede o cancelamento; o job para ao terminar o bloco em andamento."""
+    job = db.session.get(ImportacaoJob, job_id)
+    if not job:
+        return jsonify({"sucesso": False, "mensagem": "Importação não encontrada"}), 404
+    if job.status in {"pendente", "executando"}:
+        job.cancelamento_solicitado = True
+        db.session.commit()
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(importacao.progresso_job(job))
+    return redirect(url_for("main.acompanhar_importacao", job_id=job.id))
 
 
 @main_bp.route("/inativar/<int:item_id>", methods=["POST"])
@@ -959,6 +1114,7 @@ def inativar_item(item_id: int):
         item.ativo = False
         db.session.add(item)
         db.session.commit()
+        invalidar_tags(item.tag_rfid)
     return redirect(request.referrer or url_for("main.index"))
 
 
@@ -974,9 +1130,11 @@ def movimentar_item(item_id: int):
     observacao = (request.form.get("observacao") or "").strip() or None
 
     if status in STATUS_OPTIONS:
+        agora = datetime.now(UTC)
         item.status = status
         item.colaborador = colaborador
         item.setor = setor
+        item.ultima_movimentacao_em = agora
         db.session.add(item)
         db.session.add(
             Movimentacao(
@@ -985,9 +1143,27 @@ def movimentar_item(item_id: int):
                 colaborador=colaborador,
                 setor=setor,
                 observacao=observacao,
+                created_at=agora,
             )
         )
         db.session.commit()
+        invalidar_tags(item.tag_rfid)
+        publicar_evento(
+            "movimentacao",
+            {
+                "item": {
+                    "id": item.id,
+                    "codigo": item.codigo,
+                    "nome": item.nome,
+                    "tamanho": item.tamanho,
+                    "status": item.status,
+                    "setor": item.setor,
+                    "colaborador": item.colaborador,
+                    "tag_rfid": item.tag_rfid,
+                },
+                "observacao": observacao,
+            },
+        )
 
     return redirect(url_for("main.index"))
 
@@ -1112,12 +1288,8 @@ def relatorio_status(periodo: str):
         return redirect(url_for("main.index"))
 
     # Estatísticas gerais
-    status_counts = dict(
-        db.session.query(EnxovalItem.status, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .group_by(EnxovalItem.status)
-        .all()
-    )
+    status_counts = _contagem_status_ativos()
+    quantidade = func.sum(ResumoInventario.quantidade)
 
     # Movimentações no período
     movimentacoes = (
@@ -1127,57 +1299,30 @@ def relatorio_status(periodo: str):
         .all()
     )
 
-    # Itens com alerta
-    ultima_mov_subquery = (
-        db.session.query(
-            Movimentacao.item_id,
-            func.max(Movimentacao.created_at).label("ultima_mov"),
-        )
-        .group_by(Movimentacao.item_id)
-        .subquery()
-    )
-
-    itens_alerta = (
-        db.session.query(EnxovalItem, ultima_mov_subquery.c.ultima_mov)
-        .join(ultima_mov_subquery, EnxovalItem.id == ultima_mov_subquery.c.item_id)
-        .filter(
-            EnxovalItem.ativo.is_(True),
-            EnxovalItem.status.in_(ALERT_STATUS),
-        )
-        .all()
+    # Itens com alerta: total agregado no banco, objetos só das mais atrasadas
+    total_alertas = (
+        db.session.query(func.count(EnxovalItem.id)).filter(_filtro_alerta(agora)).scalar()
     )
-
-    alertas = []
-    for item, ultima_mov in itens_alerta:
-        if not ultima_mov:
-            continue
-        if ultima_mov.tzinfo is None:
-            ultima_mov = ultima_mov.replace(tzinfo=UTC)
-        dias = (agora - ultima_mov).days
-        if dias > ALERT_CRITICO_DIAS:
-            alertas.append((item, dias, "critico"))
-        elif dias > ALERT_ATENCAO_DIAS:
-            alertas.append((item, dias, "atencao"))
+    alertas = _listar_alertas(agora, ALERT_LISTA_LIMITE)
 
     # Agrupar por tipo e setor
     por_tipo = (
-        db.session.query(EnxovalItem.nome, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .group_by(EnxovalItem.nome)
-        .order_by(func.count(EnxovalItem.id).desc())
+        db.session.query(ResumoInventario.nome, quantidade)
+        .filter(ResumoInventario.ativo.is_(True))
+        .group_by(ResumoInventario.nome)
+        .having(quantidade > 0)
+        .order_by(quantidade.desc())
         .limit(10)
         .all()
     )
 
-    setor_expr = func.coalesce(func.nullif(EnxovalItem.setor, ""), "Sem setor")
+    setor_expr = func.coalesce(func.nullif(ResumoInventario.setor, ""), "Sem setor")
     por_setor = (
-        db.session.query(
-            setor_expr.label("setor"),
-            func.count(EnxovalItem.id),
-        )
-        .filter(EnxovalItem.ativo.is_(True))
+        db.session.query(setor_expr.label("setor"), quantidade)
+        .filter(ResumoInventario.ativo.is_(True))
         .group_by(setor_expr)
-        .order_by(func.count(EnxovalItem.id).desc())
+        .having(quantidade > 0)
+        .order_by(quantidade.desc())
         .limit(10)
         .all()
     )
@@ -1194,6 +1339,7 @@ def relatorio_status(periodo: str):
         total_ativos=total_ativos,
         movimentacoes=movimentacoes,
         alertas=alertas,
+        total_alertas=total_alertas,
         por_tipo=por_tipo,
         por_setor=por_setor,
         status_options=STATUS_OPTIONS,
@@ -1302,12 +1448,7 @@ def relatorio_pdf(periodo: str):
         return redirect(url_for("main.index"))
 
     # Estatísticas
-    status_counts = dict(
-        db.session.query(EnxovalItem.status, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .group_by(EnxovalItem.status)
-        .all()
-    )
+    status_counts = _contagem_status_ativos()
     total_ativos = sum(status_counts.values())
 
     # Criar PDF
@@ -1395,12 +1536,7 @@ def relatorio_excel(periodo: str):
     ws["A2"] = f"Período: {data_inicio.strftime('%d/%m/%Y')} a {agora.strftime('%d/%m/%Y')}"
 
     # Estatísticas
-    status_counts = dict(
-        db.session.query(EnxovalItem.status, func.count(EnxovalItem.id))
-        .filter(EnxovalItem.ativo.is_(True))
-        .group_by(EnxovalItem.status)
-        .all()
-    )
+    status_counts = _contagem_status_ativos()
     total_ativos = sum(status_counts.values())
 
     ws["A4"] = "Status"
@@ -1499,8 +1635,12 @@ def excluir_item(item_id: int):
         # Excluir movimentações primeiro
         Movimentacao.query.filter_by(item_id=item_id).delete()
         # Excluir item
+        tag_rfid = item.tag_rfid
+        if tag_rfid:
+            db.session.add(TagRemovida(tag_rfid=tag_rfid))
         db.session.delete(item)
         db.session.commit()
+        invalidar_tags(tag_rfid)
     return redirect(request.referrer or url_for("main.index"))
 
 
@@ -1534,17 +1674,10 @@ def seed_tamanhos():
 @login_required
 def gerenciar():
     """Página principal de gerenciamento de cadastros."""
-    colaboradores_ativos = Colaborador.query.filter_by(ativo=True).all()
-    setores_ativos = Setor.query.filter_by(ativo=True).all()
-    tipos_peca_ativos = TipoPeca.query.filter_by(ativo=True).all()
-    tamanhos_ativos = Tamanho.query.filter_by(ativo=True).all()
     usuarios = User.query.order_by(User.username.asc()).all()
     return render_template(
         "gerenciar.html",
-        colaboradores_ativos=colaboradores_ativos,
-        setores_ativos=setores_ativos,
-        tipos_peca_ativos=tipos_peca_ativos,
-        tamanhos_ativos=tamanhos_ativos,
+        **cadastros_ativos(),
         usuarios=usuarios,
     )
 
@@ -1,77 +1,82 @@
-import csv
+import argparse
 import sys
+import time
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from app import create_app
-from app.models import EnxovalItem, Movimentacao, db
+from app.importacao import importar_csv_paralelo, importar_planilha, validar_planilha
 
-STATUS_OPTIONS = {
-    "estoque",
-    "entregue",
-    "em_uso",
-    "em_lavagem",
-    "disponivel",
-    "extraviado",
-}
 
-
-def criar_item(*, linha: dict[str, str]) -> None:
-    nome = (linha.get("nome") or "").strip()
-    codigo = (linha.get("codigo") or "").strip().upper()
-    tag_rfid = (linha.get("tag_rfid") or "").strip().upper() or None
-    tamanho = (linha.get("tamanho") or "").strip().upper()
-    tamanho_customizado = (linha.get("tamanho_customizado") or "").strip() or None
-    descricao = (linha.get("descricao") or "").strip() or None
-    colaborador = (linha.get("colaborador") or "").strip() or None
-    setor = (linha.get("setor") or "").strip() or None
-    status = (linha.get("status") or "").strip().lower() or "estoque"
-    observacao = (linha.get("observacao") or "").strip() or "Importacao CSV"
-
-    if not nome or not codigo or not tamanho:
-        return
-    if status not in STATUS_OPTIONS:
-        status = "estoque"
-
-    item = EnxovalItem(
-        nome=nome,
-        codigo=codigo,
-        tag_rfid=tag_rfid,
-        tamanho=tamanho,
-        tamanho_customizado=tamanho_customizado,
-        descricao=descricao,
-        colaborador=colaborador,
-        setor=setor,
-        status=status,
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa peças de enxoval de um CSV ou XLSX.")
+    parser.add_argument("caminho", type=Path, help="Planilha .csv ou .xlsx")
+    parser.add_argument(
+        "--mesclar", action="store_true", help="Atualiza as peças já cadastradas pelo código"
     )
-    db.session.add(item)
-    db.session.add(
-        Movimentacao(
-            item=item,
-            status=status,
-            colaborador=colaborador,
-            setor=setor,
-            observacao=observacao,
-        )
+    parser.add_argument(
+        "--validar", action="store_true", help="Apenas confere o arquivo, sem gravar nada"
+    )
+    parser.add_argument(
+        "--processos",
+        type=int,
+        default=1,
+        help="Processos para ler e normalizar o CSV em paralelo (cargas históricas)",
     )
+    args = parser.parse_args()
 
+    if not args.caminho.exists():
+        raise SystemExit("Arquivo nao encontrado.")
+    modo = "mesclar" if args.mesclar else "inserir"
+    paralelo = args.processos > 1 and not args.validar
+    if paralelo and args.caminho.suffix.lower() != ".csv":
+        raise SystemExit("A importacao paralela aceita apenas arquivos CSV.")
 
-def main() -> None:
-    if len(sys.argv) < 2:
-        raise SystemExit("Uso: python scripts/import_csv.py caminho/arquivo.csv")
+    app = create_app()
+    inicio = time.perf_counter()
+    with app.app_context(), args.caminho.open("rb") as arquivo:
+        if paralelo:
+            resumo = importar_csv_paralelo(
+                args.caminho, args.processos, app.config["IMPORTACAO_LOTE"], modo
+            )
+        elif args.validar:
+            validacao = validar_planilha(
+                arquivo, args.caminho.name, app.config["IMPORTACAO_LOTE"], modo
+            )
+        else:
+            resumo = importar_planilha(
+                arquivo, args.caminho.name, app.config["IMPORTACAO_LOTE"], modo
+            )
+
+    if args.validar:
+        print(f"Linhas lidas: {validacao.linhas}")
+        print(f"Linhas validas: {validacao.validas}")
+        for problema, quantidade in sorted(validacao.problemas.items()):
+            print(f"  {problema}: {quantidade}")
+        for erro in validacao.erros:
+            print(f"  linha {erro['linha']}: {erro['mensagem']}")
+        return
 
-    caminho = Path(sys.argv[1])
-    if not caminho.exists():
-        raise SystemExit("Arquivo CSV nao encontrado.")
+    print(f"Linhas lidas: {resumo.linhas}")
+    print(f"Pecas inseridas: {resumo.inseridas}")
+    print(f"Pecas atualizadas: {resumo.atualizadas}")
+    print(f"Pecas sem alteracao: {resumo.inalteradas}")
+    print(f"Linhas ignoradas (dados obrigatorios ausentes): {resumo.ignoradas}")
+    print(f"Linhas com erro: {resumo.falhas}")
+    for erro in resumo.erros:
+        print(f"  linha {erro['linha']}: {erro['mensagem']}")
 
-    app = create_app()
-    with app.app_context():
-        with caminho.open("r", encoding="utf-8-sig", newline="") as arquivo:
-            leitor = csv.DictReader(arquivo)
-            for linha in leitor:
-                criar_item(linha=linha)
-        db.session.commit()
+    duracao = time.perf_counter() - inicio
+    print(f"Duracao total: {duracao:.1f} s ({resumo.linhas / duracao:.0f} linhas/s)")
+    if resumo.segundos_gravacao:
+        print(f"Gravacao: {resumo.linhas / resumo.segundos_gravacao:.0f} linhas/s")
+    if paralelo and resumo.segundos_normalizacao:
+        por_processo = resumo.linhas / resumo.segundos_normalizacao
+        print(
+            f"Leitura e normalizacao: {por_processo:.0f} linhas/s por processo "
+            f"({args.processos} processos)"
+        )
 
 
 if __name__ == "__main__":
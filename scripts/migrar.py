@@ -0,0 +1,179 @@
+"""Migrações pontuais do banco de dados.
+
+As tabelas são criadas com ``db.create_all()``, que não altera tabelas
+já existentes. Este script aplica os ajustes que as versões novas exigem
+em bancos em produção. Todos os passos podem ser executados mais de uma vez.
+
+Uso: python scripts/migrar.py [passo ...]  (sem argumentos, executa todos)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import func, inspect, select, text, update
+
+from app import create_app
+from app.busca import INDICES_BUSCA, criar_busca_fts
+from app.models import EnxovalItem, Movimentacao, Revisao, db, normalizar_tag_rfid
+from app.resumo import reconstruir_resumo
+
+TAMANHO_LOTE = 1000
+
+
+def _adicionar_coluna(tabela: str, coluna: str, tipo: str) -> bool:
+    """Adiciona a coluna se ela ainda não existir; retorna True se adicionou."""
+    existentes = {info["name"] for info in inspect(db.engine).get_columns(tabela)}
+    if coluna in existentes:
+        return False
+    db.session.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}"))
+    db.session.commit()
+    print(f"  Coluna {tabela}.{coluna} adicionada.")
+    return True
+
+
+def _criar_indices(modelo: type[db.Model], ignorar: frozenset[str] = INDICES_BUSCA) -> None:
+    """Cria os índices do modelo cujas colunas já existem no banco.
+
+    Os índices da busca ficam para o passo criar_busca_textual, que antes
+    cria a extensão pg_trgm.
+    """
+    existentes = {info["name"] for info in inspect(db.engine).get_columns(modelo.__tablename__)}
+    for indice in modelo.__table__.indexes:
+        if indice.name in ignorar:
+            continue
+        if {coluna.name for coluna in indice.columns} <= existentes:
+            indice.create(db.engine, checkfirst=True)
+
+
+def normalizar_tags() -> None:
+    """Grava as tags RFID existentes na forma canônica usada nas buscas."""
+    linhas = (
+        db.session.query(EnxovalItem.id, EnxovalItem.tag_rfid)
+        .filter(EnxovalItem.tag_rfid.isnot(None))
+        .all()
+    )
+    por_tag: dict[str | None, list[int]] = {}
+    for item_id, tag in linhas:
+        por_tag.setdefault(normalizar_tag_rfid(tag), []).append(item_id)
+
+    atualizacoes = []
+    for item_id, tag in linhas:
+        canonica = normalizar_tag_rfid(tag)
+        if canonica == tag:
+            continue
+        if canonica and len(por_tag[canonica]) > 1:
+            print(f"  Conflito: peça {item_id} ('{tag}') colide com outra tag '{canonica}'.")
+            continue
+        atualizacoes.append({"id": item_id, "tag_rfid": canonica})
+
+    for inicio in range(0, len(atualizacoes), TAMANHO_LOTE):
+        db.session.execute(update(EnxovalItem), atualizacoes[inicio : inicio + TAMANHO_LOTE])
+    db.session.commit()
+    print(f"  {len(atualizacoes)} tags normalizadas.")
+
+
+def adicionar_atualizado_em() -> None:
+    """Cria enxoval_items.atualizado_em, usado na sincronização incremental de tags."""
+    if _adicionar_coluna("enxoval_items", "atualizado_em", "TIMESTAMP"):
+        db.session.execute(
+            text("UPDATE enxoval_items SET atualizado_em = created_at WHERE atualizado_em IS NULL")
+        )
+        db.session.commit()
+    _criar_indices(EnxovalItem)
+
+
+def adicionar_ultima_revisao_em() -> None:
+    """Cria enxoval_items.ultima_revisao_em e a preenche a partir de revisoes."""
+    _adicionar_coluna("enxoval_items", "ultima_revisao_em", "TIMESTAMP")
+    ultima = (
+        select(func.max(Revisao.created_at))
+        .where(Revisao.item_id == EnxovalItem.id)
+        .scalar_subquery()
+    )
+    preenchidas = db.session.execute(
+        update(EnxovalItem)
+        .where(
+            EnxovalItem.ultima_revisao_em.is_(None),
+            EnxovalItem.id.in_(select(Revisao.item_id)),
+        )
+        .values(ultima_revisao_em=ultima, atualizado_em=EnxovalItem.atualizado_em)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    _criar_indices(EnxovalItem)
+    print(f"  Última revisão preenchida em {preenchidas} peças.")
+
+
+def adicionar_ultima_movimentacao_em() -> None:
+    """Cria enxoval_items.ultima_movimentacao_em e a preenche a partir de movimentacoes."""
+    _adicionar_coluna("enxoval_items", "ultima_movimentacao_em", "TIMESTAMP")
+    ultima = (
+        select(func.max(Movimentacao.created_at))
+        .where(Movimentacao.item_id == EnxovalItem.id)
+        .scalar_subquery()
+    )
+    preenchidas = db.session.execute(
+        update(EnxovalItem)
+        .where(EnxovalItem.ultima_movimentacao_em.is_(None))
+        .values(
+            ultima_movimentacao_em=func.coalesce(ultima, EnxovalItem.created_at),
+            atualizado_em=EnxovalItem.atualizado_em,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    _criar_indices(EnxovalItem)
+    print(f"  Última movimentação preenchida em {preenchidas} peças.")
+
+
+def criar_busca_textual() -> None:
+    """Cria os índices da busca por trecho de nome e código (app/busca.py)."""
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        # Índices de prefixo de versões anteriores; a busca curta não os usa mais.
+        for indice in ("ix_enxoval_items_nome_prefixo", "ix_enxoval_items_codigo_prefixo"):
+            db.session.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+        db.session.commit()
+        _criar_indices(EnxovalItem, ignorar=frozenset())
+    elif db.engine.dialect.name == "sqlite":
+        criar_busca_fts(db.session.connection())
+        db.session.commit()
+    print("  Índices de busca prontos.")
+
+
+def reconstruir_resumo_inventario() -> None:
+    """Preenche resumo_inventario, criada vazia pelo db.create_all()."""
+    print(f"  {reconstruir_resumo()} combinações de status, tipo e setor.")
+
+
+# Os passos de esquema vêm antes dos de dados, que já usam o modelo atual.
+PASSOS = {
+    "adicionar_atualizado_em": adicionar_atualizado_em,
+    "adicionar_ultima_revisao_em": adicionar_ultima_revisao_em,
+    "adicionar_ultima_movimentacao_em": adicionar_ultima_movimentacao_em,
+    "criar_busca_textual": criar_busca_textual,
+    "normalizar_tags": normalizar_tags,
+    "reconstruir_resumo_inventario": reconstruir_resumo_inventario,
+}
+
+
+def main() -> None:
+    nomes = sys.argv[1:] or list(PASSOS)
+    desconhecidos = [nome for nome in nomes if nome not in PASSOS]
+    if desconhecidos:
+        raise SystemExit(
+            f"Passo(s) desconhecido(s): {', '.join(desconhecidos)}. "
+            f"Disponíveis: {', '.join(PASSOS)}"
+        )
+
+    app = create_app()
+    with app.app_context():
+        for nome in nomes:
+            print(f"== {nome}")
+            PASSOS[nome]()
+
+
+if __name__ == "__main__":
+    main()
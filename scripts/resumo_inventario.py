@@ -0,0 +1,45 @@
+"""Confere ou reconstrói o resumo do inventário (tabela resumo_inventario).
+
+Uso:
+    python scripts/resumo_inventario.py                 # confere com enxoval_items
+    python scripts/resumo_inventario.py --reconstruir   # refaz a tabela
+
+A conferência termina com código 1 quando encontra divergências.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app import create_app
+from app.resumo import divergencias_resumo, reconstruir_resumo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Confere ou reconstrói o resumo do inventário.")
+    parser.add_argument(
+        "--reconstruir", action="store_true", help="Refaz a tabela a partir de enxoval_items"
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.reconstruir:
+            print(f"Resumo reconstruído: {reconstruir_resumo()} combinações.")
+            return
+
+        divergencias = divergencias_resumo()
+        for (status, nome, setor, ativo), esperado, registrado in divergencias:
+            print(
+                f"  {status} / {nome} / {setor or 'sem setor'} / "
+                f"{'ativo' if ativo else 'inativo'}: esperado {esperado}, resumo {registrado}"
+            )
+    if divergencias:
+        raise SystemExit(f"{len(divergencias)} divergência(s). Use --reconstruir.")
+    print("Resumo do inventário confere com as peças.")
+
+
+if __name__ == "__main__":
+    main()
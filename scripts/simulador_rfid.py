@@ -0,0 +1,235 @@
+"""Simulador de leitores RFID e gerador de carga para /api/rfid/scan.
+
+Reproduz o tráfego de portais e leitores fixos: leituras individuais ou
+lotes do tamanho de um carrinho, rajadas de leituras repetidas da mesma
+tag e uma taxa de leituras configurável. Ao final, mostra a vazão e as
+latências p50/p95/p99.
+
+Exemplos:
+    # Servidor local, tags do banco configurado na aplicação
+    python scripts/simulador_rfid.py --url http://localhost:5000 --leituras 5000
+
+    # Sem servidor: cliente de teste do Flask com SQLite em memória
+    python scripts/simulador_rfid.py --banco sqlite:///:memory: --gerar 2000 --lote 300
+
+    # Tags de um CSV (coluna tag_rfid), 50 leituras/s com 3 repetições cada
+    python scripts/simulador_rfid.py --url http://localhost:5000 --csv tags.csv \\
+        --taxa 50 --repeticoes 3
+"""
+
+import argparse
+import csv
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+STATUS_CICLO = ["em_uso", "em_lavagem", "disponivel", "entregue"]
+SETORES = ["Desossa", "Abate", "Embalagem", "Lavanderia", "Expedição"]
+
+
+class ClienteHttp:
+    """Envia as requisições para um servidor em execução."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip("/")
+
+    def post(self, caminho: str, dados: dict) -> int:
+        requisicao = urllib.request.Request(
+            self.url + caminho,
+            data=json.dumps(dados).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+                resposta.read()
+                return resposta.status
+        except urllib.error.HTTPError as erro:
+            return erro.code
+
+
+class ClienteTeste:
+    """Envia as requisições pelo cliente de teste do Flask, sem rede."""
+
+    def __init__(self, app) -> None:
+        self.cliente = app.test_client()
+
+    def post(self, caminho: str, dados: dict) -> int:
+        return self.cliente.post(caminho, json=dados).status_code
+
+
+def carregar_tags_csv(caminho: Path) -> list[str]:
+    with caminho.open("r", encoding="utf-8-sig", newline="") as arquivo:
+        return [
+            linha["tag_rfid"].strip()
+            for linha in csv.DictReader(arquivo)
+            if (linha.get("tag_rfid") or "").strip()
+        ]
+
+
+def carregar_tags_banco(app) -> list[str]:
+    from app.models import EnxovalItem, db
+
+    with app.app_context():
+        return [
+            tag
+            for (tag,) in db.session.query(EnxovalItem.tag_rfid).filter(
+                EnxovalItem.tag_rfid.isnot(None), EnxovalItem.ativo.is_(True)
+            )
+        ]
+
+
+def gerar_tags(app, quantidade: int) -> None:
+    """Cadastra peças sintéticas com tag (prefixo SIM-) para a simulação."""
+    from app.models import EnxovalItem, db
+
+    with app.app_context():
+        existentes = db.session.query(EnxovalItem.id).filter(
+            EnxovalItem.codigo.like("SIM-%")
+        ).count()
+        for indice in range(existentes + 1, existentes + quantidade + 1):
+            db.session.add(
+                EnxovalItem(
+                    nome="Peça simulada",
+                    codigo=f"SIM-{indice:07d}",
+                    tag_rfid=f"E2SIM{indice:011d}",
+                    tamanho=random.choice(["P", "M", "G", "GG"]),
+                    status="estoque",
+                )
+            )
+        db.session.commit()
+
+
+def gerar_requisicoes(tags: list[str], args: argparse.Namespace) -> Iterator[tuple[str, dict]]:
+    """Gera (caminho, payload) imitando carrinhos passando pelos portais."""
+    aleatorio = random.Random(args.semente)
+    enviadas = 0
+    while enviadas < args.leituras:
+        status = aleatorio.choice(STATUS_CICLO)
+        setor = aleatorio.choice(SETORES)
+        if args.lote:
+            carrinho = aleatorio.sample(tags, min(args.lote, len(tags)))
+            leituras = carrinho * (1 + args.repeticoes)
+            aleatorio.shuffle(leituras)
+            leituras = leituras[: args.leituras - enviadas]
+            enviadas += len(leituras)
+            yield "/api/rfid/scan/lote", {"tags": leituras, "status": status, "setor": setor}
+            continue
+
+        tag = aleatorio.choice(tags)
+        for _ in range(1 + args.repeticoes):
+            if enviadas >= args.leituras:
+                break
+            enviadas += 1
+            yield "/api/rfid/scan", {"tag_rfid": tag, "status": status, "setor": setor}
+
+
+def percentil(latencias: list[float], fracao: float) -> float:
+    if len(latencias) < 2:
+        return latencias[0] if latencias else 0.0
+    return statistics.quantiles(latencias, n=100, method="inclusive")[int(fracao * 100) - 1]
+
+
+def executar(cliente, requisicoes: list[tuple[str, dict]], args: argparse.Namespace) -> None:
+    latencias: list[float] = []
+    codigos: Counter[int] = Counter()
+    lock = threading.Lock()
+    intervalo = 1 / args.taxa if args.taxa else 0
+    inicio = time.perf_counter()
+
+    def enviar(indice: int, caminho: str, dados: dict) -> None:
+        if intervalo:
+            atraso = inicio + indice * intervalo - time.perf_counter()
+            if atraso > 0:
+                time.sleep(atraso)
+        antes = time.perf_counter()
+        codigo = cliente.post(caminho, dados)
+        duracao = (time.perf_counter() - antes) * 1000
+        with lock:
+            latencias.append(duracao)
+            codigos[codigo] += 1
+
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        for indice, (caminho, dados) in enumerate(requisicoes):
+            executor.submit(enviar, indice, caminho, dados)
+    total_segundos = time.perf_counter() - inicio
+
+    leituras = sum(len(dados.get("tags", [])) or 1 for _, dados in requisicoes)
+    print("=" * 60)
+    print("SIMULAÇÃO RFID")
+    print("=" * 60)
+    print(f"Requisições:      {len(requisicoes)}")
+    print(f"Leituras:         {leituras}")
+    print(f"Duração:          {total_segundos:.2f} s")
+    print(f"Vazão:            {len(requisicoes) / total_segundos:.1f} req/s")
+    print(f"                  {leituras / total_segundos:.1f} leituras/s")
+    print(f"Latência p50:     {percentil(latencias, 0.50):.1f} ms")
+    print(f"Latência p95:     {percentil(latencias, 0.95):.1f} ms")
+    print(f"Latência p99:     {percentil(latencias, 0.99):.1f} ms")
+    print(f"Latência máxima:  {max(latencias, default=0):.1f} ms")
+    print("Códigos HTTP:     " + ", ".join(f"{k}={v}" for k, v in sorted(codigos.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulador de carga para a API RFID.")
+    parser.add_argument("--url", help="URL de um servidor em execução (ex.: http://localhost:5000)")
+    parser.add_argument(
+        "--banco",
+        help="SQLALCHEMY_DATABASE_URI para o modo sem servidor (ex.: sqlite:///:memory:)",
+    )
+    parser.add_argument("--csv", type=Path, help="CSV com a coluna tag_rfid")
+    parser.add_argument(
+        "--gerar", type=int, default=0, help="Cadastra N peças sintéticas antes de simular"
+    )
+    parser.add_argument("--leituras", type=int, default=1000, help="Total de leituras")
+    parser.add_argument("--taxa", type=float, default=0, help="Leituras/s (0 = sem limite)")
+    parser.add_argument(
+        "--repeticoes", type=int, default=0, help="Leituras repetidas de cada tag na rajada"
+    )
+    parser.add_argument(
+        "--lote", type=int, default=0, help="Tags por carrinho em /scan/lote (0 = /scan)"
+    )
+    parser.add_argument(
+        "--concorrencia", type=int, default=4, help="Requisições simultâneas (apenas com --url)"
+    )
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    app = None
+    if not args.url or args.gerar or not args.csv:
+        from app import create_app
+
+        overrides = {"TESTING": True}
+        if args.banco:
+            overrides["SQLALCHEMY_DATABASE_URI"] = args.banco
+        app = create_app(overrides)
+
+    if args.gerar:
+        gerar_tags(app, args.gerar)
+    tags = carregar_tags_csv(args.csv) if args.csv else carregar_tags_banco(app)
+    if not tags:
+        raise SystemExit("Nenhuma tag disponível. Use --csv ou --gerar.")
+
+    if args.url:
+        cliente = ClienteHttp(args.url)
+    else:
+        # Sem servidor, as requisições são atendidas no próprio processo, uma por vez.
+        cliente = ClienteTeste(app)
+        args.concorrencia = 1
+    requisicoes = list(gerar_requisicoes(tags, args))
+    executar(cliente, requisicoes, args)
+
+
+if __name__ == "__main__":
+    main()
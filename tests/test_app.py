@@ -13,6 +13,7 @@ class EnxovalAppTestCase(unittest.TestCase):
                 "TESTING": True,
                 "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
                 "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+                "IMPORTACAO_EM_SEGUNDO_PLANO": False,
             }
         )
         self.client = self.app.test_client()
@@ -0,0 +1,111 @@
+import unittest
+
+from sqlalchemy import update
+
+from app import create_app
+from app.cache import CacheTTL, LRUCache
+from app.cadastros import VERSAO_CADASTROS, cadastros_ativos
+from app.models import Setor, VersaoCache, db
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_despeja_o_menos_usado(self) -> None:
+        cache = LRUCache(2)
+        cache.definir("a", 1)
+        cache.definir("b", 2)
+        self.assertEqual(cache.obter("a"), 1)
+        cache.definir("c", 3)
+
+        self.assertIsNone(cache.obter("b"))
+        self.assertEqual(cache.obter("c"), 3)
+        estatisticas = cache.estatisticas()
+        self.assertEqual(estatisticas["tamanho"], 2)
+        self.assertEqual(estatisticas["despejos"], 1)
+        self.assertEqual(estatisticas["acertos"], 2)
+        self.assertEqual(estatisticas["falhas"], 1)
+
+
+class CacheTTLTestCase(unittest.TestCase):
+    def test_reaproveita_ate_expirar_ou_invalidar(self) -> None:
+        cache = CacheTTL(60)
+        chamadas = []
+
+        def calcular() -> int:
+            chamadas.append(1)
+            return len(chamadas)
+
+        self.assertEqual(cache.obter("a", calcular), 1)
+        self.assertEqual(cache.obter("a", calcular), 1)
+        cache.invalidar("a")
+        self.assertEqual(cache.obter("a", calcular), 2)
+
+        cache.segundos = 0
+        self.assertEqual(cache.obter("a", calcular), 3)
+
+    def test_nao_guarda_valor_calculado_antes_de_limpar(self) -> None:
+        cache = CacheTTL(60)
+
+        def calcular_durante_gravacao() -> str:
+            cache.limpar()
+            return "antigo"
+
+        self.assertEqual(cache.obter("a", calcular_durante_gravacao), "antigo")
+        self.assertIsNone(cache.idade("a"))
+        self.assertEqual(cache.obter("a", lambda: "novo"), "novo")
+        self.assertEqual(cache.obter("a", lambda: "outro"), "novo")
+
+
+class CacheCadastrosTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "CADASTROS_VERIFICACAO_SEGUNDOS": 60,
+            }
+        )
+        self.cache = self.app.extensions["cache_cadastros"]
+
+    def _setores(self) -> list[str]:
+        return [setor.nome for setor in cadastros_ativos()["setores_ativos"]]
+
+    def test_alteracao_local_descarta_o_cache(self) -> None:
+        with self.app.app_context():
+            versao_inicial = db.session.get(VersaoCache, VERSAO_CADASTROS).versao
+            self.assertEqual(self._setores(), [])
+            self.assertEqual(self._setores(), [])
+            self.assertEqual((self.cache.calculos, self.cache.acertos), (1, 1))
+
+            db.session.add(Setor(nome="Abate"))
+            db.session.commit()
+            self.assertEqual(self._setores(), ["Abate"])
+
+            setor = Setor.query.filter_by(nome="Abate").one()
+            setor.ativo = False
+            db.session.commit()
+            self.assertEqual(self._setores(), [])
+            versao = db.session.get(VersaoCache, VERSAO_CADASTROS).versao
+            self.assertEqual(versao, versao_inicial + 2)
+
+    def test_outro_worker_e_percebido_pela_versao(self) -> None:
+        with self.app.app_context():
+            self.assertEqual(self._setores(), [])
+            # Outro processo grava o setor e incrementa a versão; o cache
+            # local só percebe na próxima verificação.
+            db.session.execute(Setor.__table__.insert().values(nome="Corte", ativo=True))
+            db.session.execute(
+                update(VersaoCache)
+                .where(VersaoCache.nome == VERSAO_CADASTROS)
+                .values(versao=VersaoCache.versao + 1)
+            )
+            db.session.commit()
+            self.assertEqual(self._setores(), [])
+
+            self.cache.intervalo = 0
+            self.assertEqual(self._setores(), ["Corte"])
+            self.assertEqual(self._setores(), ["Corte"])
+            self.assertEqual(self.cache.calculos, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
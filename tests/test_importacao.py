@@ -0,0 +1,415 @@
+import io
+import os
+import tempfile
+import unittest
+
+from openpyxl import Workbook
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import create_app
+from app.importacao import (
+    dividir_em_faixas,
+    importar_csv,
+    importar_csv_paralelo,
+    importar_planilha,
+    progresso_job,
+    validar_csv,
+)
+from app.models import (
+    EnxovalItem,
+    ImportacaoJob,
+    Movimentacao,
+    Setor,
+    TagRemovida,
+    TipoPeca,
+    db,
+)
+from app.resumo import divergencias_resumo
+
+CABECALHO = "nome,codigo,tag_rfid,tamanho,setor,status\n"
+
+
+class ImportacaoCsvTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "LOGIN_DISABLED": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+                "IMPORTACAO_EM_SEGUNDO_PLANO": False,
+            }
+        )
+        self.client = self.app.test_client()
+
+    def test_importa_em_blocos_isolando_linhas_com_erro(self) -> None:
+        linhas = [f"Bata,BA-{indice:04d},tag-{indice:04d},M,Corte,em_uso\n" for indice in range(7)]
+        linhas.insert(3, "Bata,BA-0001,,M,,\n")
+        linhas.insert(5, "Sem codigo,,,M,,\n")
+        conteudo = ("\ufeff" + CABECALHO + "".join(linhas)).encode("utf-8")
+
+        with self.app.app_context():
+            resumo = importar_csv(io.BytesIO(conteudo), tamanho_lote=3)
+            self.assertEqual(resumo.linhas, 9)
+            self.assertEqual(resumo.inseridas, 7)
+            self.assertEqual(resumo.ignoradas, 1)
+            self.assertEqual(resumo.falhas, 1)
+            self.assertEqual(resumo.erros[0]["linha"], 5)
+            self.assertIn("BA-0001", resumo.erros[0]["mensagem"])
+
+            self.assertEqual(EnxovalItem.query.count(), 7)
+            self.assertEqual(Movimentacao.query.count(), 7)
+            item = EnxovalItem.query.filter_by(codigo="BA-0006").one()
+            self.assertEqual(item.tag_rfid, "TAG-0006")
+            self.assertEqual(item.status, "em_uso")
+
+    def test_insercao_em_lote_liga_movimentacoes_sem_flush(self) -> None:
+        linhas = "".join(
+            f"Bata,BA-{indice:04d},tag-{indice:04d},M,{setor},{status}\n"
+            for indice, (setor, status) in enumerate(
+                [("Corte", "em_uso"), ("Abate", "estoque"), ("Desossa", "em_lavagem")]
+            )
+        )
+        flushes = []
+
+        def contar_flush(*_argumentos) -> None:
+            flushes.append(True)
+
+        event.listen(Session, "after_flush", contar_flush)
+        try:
+            with self.app.app_context():
+                resumo = importar_csv(io.BytesIO((CABECALHO + linhas).encode("utf-8")))
+        finally:
+            event.remove(Session, "after_flush", contar_flush)
+        self.assertEqual(resumo.inseridas, 3)
+        self.assertEqual(flushes, [])
+
+        with self.app.app_context():
+            for item in EnxovalItem.query:
+                movimentacao = Movimentacao.query.filter_by(item_id=item.id).one()
+                self.assertEqual(
+                    (movimentacao.status, movimentacao.setor), (item.status, item.setor)
+                )
+                self.assertEqual(item.ultima_movimentacao_em, movimentacao.created_at)
+            self.assertEqual(divergencias_resumo(), [])
+
+    def test_conflito_no_meio_do_bloco_refaz_linha_a_linha(self) -> None:
+        linhas = "".join(f"Bata,BA-{indice:04d},,M,Corte,em_uso\n" for indice in range(4))
+        with self.app.app_context():
+            # Simula outra gravação ocupando o código depois da checagem do bloco.
+            db.session.execute(
+                text(
+                    "CREATE TRIGGER codigo_ocupado BEFORE INSERT ON enxoval_items "
+                    "WHEN new.codigo = 'BA-0002' "
+                    "BEGIN SELECT RAISE(ABORT, 'UNIQUE constraint failed: "
+                    "enxoval_items.codigo'); END"
+                )
+            )
+            db.session.commit()
+            resumo = importar_csv(io.BytesIO((CABECALHO + linhas).encode("utf-8")))
+
+            self.assertEqual(resumo.inseridas, 3)
+            self.assertEqual(resumo.falhas, 1)
+            self.assertEqual(resumo.erros[0]["linha"], 4)
+            self.assertEqual(resumo.erros[0]["mensagem"], "Código 'BA-0002' já cadastrado")
+            self.assertEqual(
+                sorted(item.codigo for item in EnxovalItem.query),
+                ["BA-0000", "BA-0001", "BA-0003"],
+            )
+            self.assertEqual(Movimentacao.query.count(), 3)
+            self.assertEqual(divergencias_resumo(), [])
+
+    def test_modo_mesclar_atualiza_pelo_codigo(self) -> None:
+        inicial = CABECALHO + "Bata,BA-0001,T1,M,Corte,estoque\nBata,BA-0002,T2,M,Corte,estoque\n"
+        corrigida = (
+            CABECALHO
+            + "Bata,BA-0001,T1,G,Corte,estoque\n"
+            + "Bata,BA-0002,T9,M,Desossa,em_uso\n"
+            + "Bata,BA-0003,T3,P,,\n"
+            + "Bata,BA-0004,T1,P,,\n"
+        )
+        with self.app.app_context():
+            importar_csv(io.BytesIO(inicial.encode("utf-8")))
+            resumo = importar_csv(io.BytesIO(corrigida.encode("utf-8")), modo="mesclar")
+            self.assertEqual(resumo.inseridas, 1)
+            self.assertEqual(resumo.atualizadas, 2)
+            self.assertEqual(resumo.falhas, 1)
+            self.assertIn("T1", resumo.erros[0]["mensagem"])
+
+            primeira = EnxovalItem.query.filter_by(codigo="BA-0001").one()
+            segunda = EnxovalItem.query.filter_by(codigo="BA-0002").one()
+            self.assertEqual(primeira.tamanho, "G")
+            self.assertEqual((segunda.tag_rfid, segunda.setor), ("T9", "Desossa"))
+            # Só a troca de setor/status gera movimentação além das iniciais.
+            self.assertEqual(Movimentacao.query.filter_by(item_id=primeira.id).count(), 1)
+            self.assertEqual(Movimentacao.query.filter_by(item_id=segunda.id).count(), 2)
+            self.assertEqual([t.tag_rfid for t in TagRemovida.query], ["T2"])
+
+            resumo = importar_csv(io.BytesIO(corrigida.encode("utf-8")), modo="mesclar")
+            self.assertEqual(resumo.inalteradas, 3)
+            self.assertEqual(resumo.atualizadas + resumo.inseridas, 0)
+
+    def test_mesclar_sem_coluna_de_tag_invalida_cache(self) -> None:
+        with self.app.app_context():
+            importar_csv(io.BytesIO((CABECALHO + "Bata,BA-0001,T1,M,Corte,estoque\n").encode()))
+        resposta = self.client.get("/api/rfid/buscar/T1")
+        self.assertEqual(resposta.get_json()["item"]["status"], "estoque")
+
+        sem_tag = "nome,codigo,tamanho,setor,status\nBata,BA-0001,M,Corte,entregue\n"
+        with self.app.app_context():
+            resumo = importar_csv(io.BytesIO(sem_tag.encode("utf-8")), modo="mesclar")
+            self.assertEqual(resumo.atualizadas, 1)
+        resposta = self.client.get("/api/rfid/buscar/T1")
+        self.assertEqual(resposta.get_json()["item"]["status"], "entregue")
+
+    def test_importacao_em_segundo_plano(self) -> None:
+        self.app.config["IMPORTACAO_EM_SEGUNDO_PLANO"] = True
+        self.app.config["IMPORTACAO_LOTE"] = 2
+        linhas = "".join(f"Bata,BA-{indice:04d},,M,,\n" for indice in range(5))
+        resposta = self.client.post(
+            "/importar",
+            data={"arquivo": (io.BytesIO((CABECALHO + linhas).encode("utf-8")), "inv.csv")},
+            content_type="multipart/form-data",
+            headers={"Accept": "application/json"},
+        )
+        self.assertEqual(resposta.status_code, 202)
+        job_id = resposta.get_json()["job"]["id"]
+        self.app.extensions["importacoes"].aguardar(timeout=10)
+
+        progresso = self.client.get(f"/importacoes/{job_id}/progresso").get_json()
+        self.assertEqual(progresso["status"], "concluida")
+        self.assertEqual(progresso["inseridas"], 5)
+        self.assertEqual(progresso["progresso"], 1.0)
+        self.assertIsNotNone(progresso["linhas_por_segundo"])
+        self.assertEqual(self.client.get(f"/importacoes/{job_id}").status_code, 200)
+
+    def test_jobs_interrompidos_falham_na_inicializacao(self) -> None:
+        with tempfile.TemporaryDirectory() as diretorio:
+            config = {
+                "TESTING": True,
+                "LOGIN_DISABLED": True,
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{diretorio}/jobs.db",
+            }
+            app = create_app(config)
+            with app.app_context():
+                db.session.add_all(
+                    [
+                        ImportacaoJob(arquivo="a.csv", status="executando"),
+                        ImportacaoJob(arquivo="b.xlsx", status="pendente"),
+                        ImportacaoJob(arquivo="c.csv", status="concluida"),
+                    ]
+                )
+                db.session.commit()
+                db.engine.dispose()
+
+            app = create_app(config)
+            with app.app_context():
+                situacoes = [job.status for job in ImportacaoJob.query.order_by(ImportacaoJob.id)]
+                self.assertEqual(situacoes, ["falhou", "falhou", "concluida"])
+                self.assertIn("reinício", ImportacaoJob.query.first().mensagem)
+                db.engine.dispose()
+
+    def test_progresso_de_xlsx_sem_estimativa_por_bytes(self) -> None:
+        with self.app.app_context():
+            job = ImportacaoJob(
+                arquivo="inv.xlsx",
+                status="executando",
+                tamanho_bytes=1000,
+                bytes_lidos=900,
+                linhas=10,
+            )
+            db.session.add(job)
+            db.session.commit()
+            progresso = progresso_job(job)
+            self.assertIsNone(progresso["progresso"])
+            self.assertIsNone(progresso["tempo_restante_segundos"])
+
+            job.status = "concluida"
+            self.assertEqual(progresso_job(job)["progresso"], 1.0)
+
+    def test_cancelamento_de_importacao_pendente(self) -> None:
+        with self.app.app_context():
+            job = ImportacaoJob(arquivo="inv.csv", modo="inserir")
+            db.session.add(job)
+            db.session.commit()
+            job_id = job.id
+
+        resposta = self.client.post(
+            f"/importacoes/{job_id}/cancelar", headers={"Accept": "application/json"}
+        )
+        self.assertTrue(resposta.get_json()["cancelamento_solicitado"])
+
+        descritor, caminho = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            arquivo.write(CABECALHO + "Bata,BA-0001,,M,,\n")
+        self.app.extensions["importacoes"].submeter(job_id, caminho).result(timeout=10)
+
+        progresso = self.client.get(f"/importacoes/{job_id}/progresso").get_json()
+        self.assertEqual(progresso["status"], "cancelada")
+        self.assertEqual(progresso["inseridas"], 0)
+
+    def test_validacao_sem_gravar(self) -> None:
+        with self.app.app_context():
+            db.session.add_all([TipoPeca(nome="Bata"), Setor(nome="Corte")])
+            db.session.add(EnxovalItem(nome="Bata", codigo="BA-0001", tamanho="M", tag_rfid="T1"))
+            db.session.commit()
+
+            conteudo = (
+                CABECALHO
+                + "Bata,BA-0001,,M,corte,\n"
+                + "Bata,BA-0002,t1,M,,\n"
+                + "Bata,BA-0003,T3,XG,Solda,perdido\n"
+                + "Luva,BA-0003,T3,P,,\n"
+                + "Bata,BA-0004,,P,,estoque\n"
+            )
+            validacao = validar_csv(io.BytesIO(conteudo.encode("utf-8")), tamanho_lote=2)
+            self.assertEqual(validacao.linhas, 5)
+            self.assertEqual(validacao.validas, 1)
+            self.assertEqual(
+                validacao.problemas,
+                {
+                    "codigo_cadastrado": 1,
+                    "tag_cadastrada": 1,
+                    "status_invalido": 1,
+                    "tamanho_desconhecido": 1,
+                    "setor_desconhecido": 1,
+                    "nome_desconhecido": 1,
+                    "codigo_repetido": 1,
+                    "tag_rfid_repetido": 1,
+                },
+            )
+            self.assertEqual(EnxovalItem.query.count(), 1)
+
+            validacao = validar_csv(io.BytesIO(conteudo.encode("utf-8")), modo="mesclar")
+            self.assertNotIn("codigo_cadastrado", validacao.problemas)
+
+    def test_validacao_confere_banco_em_linhas_com_outros_problemas(self) -> None:
+        with self.app.app_context():
+            db.session.add(TipoPeca(nome="Bata"))
+            db.session.add(EnxovalItem(nome="Bata", codigo="BA-0001", tamanho="M", tag_rfid="T1"))
+            db.session.commit()
+
+        conteudo = CABECALHO + "Bata,BA-0001,T1,M,Solda,perdido\n"
+        resposta = self.client.post(
+            "/importar/validar",
+            data={"arquivo": (io.BytesIO(conteudo.encode("utf-8")), "inv.csv")},
+            content_type="multipart/form-data",
+            headers={"Accept": "application/json"},
+        )
+        dados = resposta.get_json()
+        self.assertEqual(dados["validas"], 0)
+        self.assertEqual(
+            [erro["problema"] for erro in dados["erros"]],
+            ["status_invalido", "setor_desconhecido", "codigo_cadastrado", "tag_cadastrada"],
+        )
+
+        resposta = self.client.post(
+            "/importar/validar",
+            data={"arquivo": (io.BytesIO(conteudo.encode("utf-8")), "inv.csv")},
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(resposta.status_code, 200)
+        texto = resposta.get_data(as_text=True)
+        self.assertIn("Linha 2: Código &#39;BA-0001&#39; já cadastrado", texto)
+
+    def test_importacao_xlsx_com_varias_abas(self) -> None:
+        pasta = Workbook()
+        aba = pasta.active
+        aba.title = "Corte"
+        aba.append(["Inventário de abertura"])
+        aba.append([])
+        aba.append(["Nome", "Código", "TAG RFID", "Tamanho", "Setor"])
+        aba.append(["Bata", "ba-0001", "e200 0001", "m", "Corte"])
+        aba.append([None, None, None, None, None])
+        aba.append(["Bata", "BA-0002", None, "G", "Corte"])
+        notas = pasta.create_sheet("Notas")
+        notas.append(["Sem cabeçalho de peças"])
+        segunda = pasta.create_sheet("Desossa")
+        segunda.append(["codigo", "nome", "tamanho", "status"])
+        segunda.append([1001, "Calca", "GG", "em_uso"])
+        segunda.append(["BA-0001", "Calca", "P", "em_uso"])
+        conteudo = io.BytesIO()
+        pasta.save(conteudo)
+        conteudo.seek(0)
+
+        with self.app.app_context():
+            resumo = importar_planilha(conteudo, "inventario.xlsx")
+            self.assertEqual(resumo.linhas, 4)
+            self.assertEqual(resumo.inseridas, 3)
+            self.assertEqual(resumo.erros[0]["linha"], "Desossa:3")
+
+            item = EnxovalItem.query.filter_by(codigo="BA-0001").one()
+            self.assertEqual((item.tag_rfid, item.tamanho, item.setor), ("E2000001", "M", "Corte"))
+            item = EnxovalItem.query.filter_by(codigo="1001").one()
+            self.assertEqual(item.status, "em_uso")
+
+    def test_mesclar_xlsx_atualiza_so_as_colunas_de_cada_aba(self) -> None:
+        with self.app.app_context():
+            inicial = (
+                "nome,codigo,tamanho,setor,colaborador,status\n"
+                "Bata,BA-0001,M,Corte,Ana,em_uso\n"
+            )
+            importar_csv(io.BytesIO(inicial.encode("utf-8")))
+
+        pasta = Workbook()
+        aba = pasta.active
+        aba.append(["nome", "codigo", "tamanho", "setor", "colaborador", "status"])
+        aba.append(["Bata", "BA-0002", "G", "Abate", "Rui", "entregue"])
+        segunda = pasta.create_sheet("Tamanhos")
+        segunda.append(["nome", "codigo", "tamanho"])
+        segunda.append(["Bata", "BA-0001", "G"])
+        conteudo = io.BytesIO()
+        pasta.save(conteudo)
+        conteudo.seek(0)
+
+        with self.app.app_context():
+            resumo = importar_planilha(conteudo, "inventario.xlsx", modo="mesclar")
+            self.assertEqual((resumo.inseridas, resumo.atualizadas), (1, 1))
+            item = EnxovalItem.query.filter_by(codigo="BA-0001").one()
+            self.assertEqual(
+                (item.tamanho, item.setor, item.colaborador, item.status),
+                ("G", "Corte", "Ana", "em_uso"),
+            )
+
+    def test_importacao_paralela_por_faixas(self) -> None:
+        linhas = [f"Bata,BA-{indice:04d},t-{indice:04d},m,,\n" for indice in range(200)]
+        linhas[150] = "Bata,BA-0003,,M,,\n"
+        descritor, caminho = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            arquivo.write("\ufeff" + CABECALHO + "".join(linhas))
+        self.addCleanup(os.remove, caminho)
+
+        cabecalho, faixas = dividir_em_faixas(caminho, bytes_por_faixa=500)
+        self.assertEqual(cabecalho[:2], ["nome", "codigo"])
+        self.assertGreater(len(faixas), 2)
+        with open(caminho, "rb") as arquivo:
+            conteudo = arquivo.read()
+        for _, fim in faixas:
+            self.assertEqual(conteudo[fim - 1 : fim], b"\n")
+
+        with self.app.app_context():
+            resumo = importar_csv_paralelo(caminho, 2, tamanho_lote=64, bytes_por_faixa=500)
+            self.assertEqual(resumo.linhas, 200)
+            self.assertEqual(resumo.inseridas, 199)
+            self.assertEqual(resumo.erros[0]["linha"], 152)
+            self.assertGreater(resumo.segundos_normalizacao, 0)
+            item = EnxovalItem.query.filter_by(codigo="BA-0199").one()
+            self.assertEqual((item.tag_rfid, item.tamanho), ("T-0199", "M"))
+
+    def test_rota_retorna_resumo_em_json(self) -> None:
+        conteudo = CABECALHO + "Calca,CA-0001,,G,,\n,,,,,\n"
+        resposta = self.client.post(
+            "/importar",
+            data={"arquivo": (io.BytesIO(conteudo.encode("utf-8")), "import.csv")},
+            content_type="multipart/form-data",
+            headers={"Accept": "application/json"},
+        )
+        self.assertEqual(resposta.status_code, 200)
+        resumo = resposta.get_json()
+        self.assertEqual(resumo["inseridas"], 1)
+        self.assertEqual(resumo["ignoradas"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import re
+import unittest
+from datetime import UTC, datetime, timedelta
+
+from app import create_app
+from app.busca import filtro_busca
+from app.models import EnxovalItem, db
+
+
+class ListagemPaginadaTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "LOGIN_DISABLED": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+            }
+        )
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            for indice in range(1, 13):
+                db.session.add(
+                    EnxovalItem(
+                        nome="Bata",
+                        codigo=f"BA-{indice:04d}",
+                        tamanho="M",
+                        setor="Corte" if indice % 2 else "Abate",
+                    )
+                )
+            db.session.commit()
+
+    def _codigos(self, resposta) -> list[str]:
+        return re.findall(r"BA-\d{4}", resposta.get_data(as_text=True))
+
+    def test_navegacao_por_cursor_mantem_filtros(self) -> None:
+        resposta = self.client.get("/?setor=Corte&por_pagina=5")
+        self.assertEqual(
+            list(dict.fromkeys(self._codigos(resposta))),
+            ["BA-0011", "BA-0009", "BA-0007", "BA-0005", "BA-0003"],
+        )
+        self.assertIn("Página 1 de 2 (6 itens)", " ".join(resposta.get_data(as_text=True).split()))
+
+        with self.app.app_context():
+            cursor = EnxovalItem.query.filter_by(codigo="BA-0003").one().id
+        resposta = self.client.get(f"/?setor=Corte&por_pagina=5&apos={cursor}&pagina=2")
+        self.assertEqual(list(dict.fromkeys(self._codigos(resposta))), ["BA-0001"])
+        self.assertIn("Página 2 de 2", " ".join(resposta.get_data(as_text=True).split()))
+
+        with self.app.app_context():
+            cursor = EnxovalItem.query.filter_by(codigo="BA-0001").one().id
+        resposta = self.client.get(f"/?setor=Corte&por_pagina=5&antes={cursor}&pagina=2")
+        self.assertEqual(list(dict.fromkeys(self._codigos(resposta)))[0], "BA-0011")
+
+    def test_contagem_fica_em_cache(self) -> None:
+        self.client.get("/?por_pagina=5")
+        self.client.get("/?por_pagina=5&pagina=2&apos=8")
+        cache = self.app.extensions["cache_contagem_itens"]
+        self.assertEqual((cache.calculos, cache.acertos), (1, 1))
+
+        self.app.config["ITENS_CONTAGEM"] = "nenhuma"
+        resposta = self.client.get("/?setor=Abate&por_pagina=5")
+        self.assertNotIn("itens)", resposta.get_data(as_text=True))
+
+    def test_busca_usa_indice_fts_e_acompanha_alteracoes(self) -> None:
+        self.assertTrue(self.app.extensions["busca_fts_itens"])
+        resposta = self.client.get("/?busca=ba-0001")
+        self.assertEqual(list(dict.fromkeys(self._codigos(resposta))), ["BA-0001"])
+
+        with self.app.app_context():
+            db.session.add(EnxovalItem(nome="Moletom 100% algodão", codigo="MO-0001", tamanho="G"))
+            db.session.commit()
+
+            def encontrados(termo: str) -> list[str]:
+                consulta = EnxovalItem.query.filter(filtro_busca(termo, usar_fts=True))
+                return [item.codigo for item in consulta]
+
+            self.assertEqual(encontrados("TOM 100%"), ["MO-0001"])
+            self.assertEqual(encontrados("mo"), ["MO-0001"])
+            # Termos curtos não usam o índice FTS, mas procuram em qualquer posição.
+            self.assertEqual(encontrados("om"), ["MO-0001"])
+            self.assertEqual(sorted(encontrados("10")), ["BA-0010", "MO-0001"])
+
+            item = EnxovalItem.query.filter_by(codigo="MO-0001").one()
+            item.nome = "Jaleco"
+            db.session.commit()
+            self.assertEqual(encontrados("moletom"), [])
+            self.assertEqual(encontrados("jaleco"), ["MO-0001"])
+
+            db.session.delete(item)
+            db.session.commit()
+            self.assertEqual(encontrados("jaleco"), [])
+
+    def test_revisao_atualiza_pendencias(self) -> None:
+        resposta = self.client.get("/revisao")
+        self.assertEqual(len(set(self._codigos(resposta))), 12)
+
+        with self.app.app_context():
+            item = EnxovalItem.query.filter_by(codigo="BA-0004").one()
+            item_id = item.id
+        self.client.post(
+            "/revisao", data={"acao": "conferir", "item_id": item_id, "conferente": "Ana"}
+        )
+
+        with self.app.app_context():
+            self.assertIsNotNone(db.session.get(EnxovalItem, item_id).ultima_revisao_em)
+        codigos = set(self._codigos(self.client.get("/revisao")))
+        self.assertEqual(len(codigos), 11)
+        self.assertNotIn("BA-0004", codigos)
+        texto = " ".join(self.client.get("/").get_data(as_text=True).split())
+        self.assertIn('<span class="label">Pendentes</span> <strong>11</strong>', texto)
+
+
+    def test_alertas_usam_ultima_movimentacao(self) -> None:
+        with self.app.app_context():
+            parada = datetime.now(UTC) - timedelta(days=6)
+            for codigo, dias in (("BA-0001", 6), ("BA-0002", 3), ("BA-0003", 1)):
+                item = EnxovalItem.query.filter_by(codigo=codigo).one()
+                item.status = "em_uso"
+                item.ultima_movimentacao_em = datetime.now(UTC) - timedelta(days=dias)
+            EnxovalItem.query.filter_by(codigo="BA-0004").one().ultima_movimentacao_em = parada
+            db.session.commit()
+            item_id = EnxovalItem.query.filter_by(codigo="BA-0002").one().id
+
+        texto = " ".join(self.client.get("/relatorio/diario").get_data(as_text=True).split())
+        alertas = re.findall(r'<tr class="(\w+)"> <td>(BA-\d{4})</td>', texto)
+        self.assertEqual(alertas, [("critico", "BA-0001"), ("atencao", "BA-0002")])
+
+        texto = " ".join(self.client.get("/dashboard").get_data(as_text=True).split())
+        self.assertIn('<strong class="badge alerta">1</strong>', texto)
+        self.assertIn('<strong class="badge critico">1</strong>', texto)
+        self.assertIn("<td>Corte</td> <td>0</td> <td>1</td> <td>1</td>", texto)
+        self.assertIn("<td>Abate</td> <td>1</td> <td>0</td> <td>1</td>", texto)
+
+        self.client.post(f"/movimentar/{item_id}", data={"status": "em_uso", "setor": "Corte"})
+        with self.app.app_context():
+            movimentada = db.session.get(EnxovalItem, item_id).ultima_movimentacao_em
+            self.assertGreater(movimentada, parada.replace(tzinfo=None))
+        texto = " ".join(self.client.get("/relatorio/diario").get_data(as_text=True).split())
+        self.assertNotIn("<td>BA-0002</td>", texto)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import io
+import unittest
+
+from sqlalchemy import update
+
+from app import create_app
+from app.importacao import importar_csv
+from app.models import EnxovalItem, ResumoInventario, db
+from app.resumo import ajustar_resumo, divergencias_resumo, reconstruir_resumo
+
+CABECALHO = "nome,codigo,tag_rfid,tamanho,setor,status\n"
+
+
+class ResumoInventarioTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "LOGIN_DISABLED": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+            }
+        )
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            for indice in range(1, 5):
+                db.session.add(
+                    EnxovalItem(
+                        nome="Bata",
+                        codigo=f"BA-{indice:04d}",
+                        tamanho="M",
+                        setor="Corte" if indice % 2 else None,
+                        tag_rfid=f"TAG-{indice:04d}",
+                    )
+                )
+            db.session.commit()
+
+    def _id(self, codigo: str) -> int:
+        with self.app.app_context():
+            return EnxovalItem.query.filter_by(codigo=codigo).one().id
+
+    def _assert_sem_divergencias(self) -> None:
+        with self.app.app_context():
+            self.assertEqual(divergencias_resumo(), [])
+
+    def test_gravacoes_pelo_orm_mantem_resumo(self) -> None:
+        self._assert_sem_divergencias()
+        with self.app.app_context():
+            linha = db.session.get(ResumoInventario, ("estoque", "Bata", "Corte", True))
+            self.assertEqual(linha.quantidade, 2)
+
+        self.client.post(
+            f"/movimentar/{self._id('BA-0001')}", data={"status": "em_uso", "setor": "Abate"}
+        )
+        self._assert_sem_divergencias()
+        self.client.post(
+            f"/item/{self._id('BA-0002')}/editar",
+            data={"nome": "Jaleco", "codigo": "BA-0002", "tamanho": "G", "setor": "Corte"},
+        )
+        self._assert_sem_divergencias()
+        self.client.post(f"/inativar/{self._id('BA-0003')}")
+        self._assert_sem_divergencias()
+        self.client.post(f"/item/{self._id('BA-0004')}/excluir")
+        self._assert_sem_divergencias()
+
+        with self.app.app_context():
+            # Alteração de um atributo ainda não carregado também é contada.
+            item = db.session.get(EnxovalItem, self._id("BA-0001"))
+            db.session.expire(item, ["status"])
+            item.status = "em_lavagem"
+            db.session.commit()
+        self._assert_sem_divergencias()
+
+        texto = " ".join(self.client.get("/dashboard").get_data(as_text=True).split())
+        self.assertIn("Jaleco", texto)
+
+    def test_copia_desatualizada_na_sessao_nao_desvia_resumo(self) -> None:
+        with self.app.app_context():
+            item = EnxovalItem.query.filter_by(codigo="BA-0001").one()
+            # Gravação em massa depois da leitura: a cópia da sessão fica com o status antigo.
+            with ajustar_resumo(EnxovalItem.id, [item.id]):
+                db.session.execute(
+                    update(EnxovalItem)
+                    .where(EnxovalItem.id == item.id)
+                    .values(status="em_lavagem")
+                    .execution_options(synchronize_session=False)
+                )
+            self.assertEqual(item.status, "estoque")
+            item.setor = "Abate"
+            db.session.commit()
+            self.assertEqual(divergencias_resumo(), [])
+
+    def test_leituras_rfid_mantem_resumo(self) -> None:
+        self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "entregue"})
+        self._assert_sem_divergencias()
+        self.client.post(
+            "/api/rfid/scan/lote",
+            json={"tags": ["TAG-0002", "TAG-0003"], "status": "em_lavagem", "setor": "Lavanderia"},
+        )
+        self._assert_sem_divergencias()
+        with self.app.app_context():
+            linha = db.session.get(ResumoInventario, ("em_lavagem", "Bata", "Lavanderia", True))
+            self.assertEqual(linha.quantidade, 2)
+
+    def test_importacao_mantem_resumo(self) -> None:
+        linhas = "".join(f"Capuz,CP-{indice:04d},,G,Abate,em_uso\n" for indice in range(1, 4))
+        with self.app.app_context():
+            importar_csv(io.BytesIO((CABECALHO + linhas).encode("utf-8")), tamanho_lote=2)
+            self.assertEqual(divergencias_resumo(), [])
+
+            mescla = "Capuz,CP-0001,,G,Corte,estoque\nBata,BA-0001,,M,Abate,em_uso\n"
+            importar_csv(io.BytesIO((CABECALHO + mescla).encode("utf-8")), modo="mesclar")
+            self.assertEqual(divergencias_resumo(), [])
+
+    def test_dashboard_em_cache_descartado_nas_gravacoes(self) -> None:
+        cache = self.app.extensions["cache_dashboard"]
+        self.client.get("/dashboard")
+        texto = " ".join(self.client.get("/dashboard").get_data(as_text=True).split())
+        self.assertEqual((cache.calculos, cache.acertos), (1, 1))
+        self.assertIn("Dados calculados há 0 s.", texto)
+
+        self.client.post(
+            f"/movimentar/{self._id('BA-0001')}", data={"status": "extraviado", "setor": "Corte"}
+        )
+        texto = " ".join(self.client.get("/dashboard").get_data(as_text=True).split())
+        self.assertEqual(cache.calculos, 2)
+        self.assertIn('<span class="label">Extraviadas</span> <strong>1</strong>', texto)
+
+        self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0002", "status": "em_lavagem"})
+        texto = " ".join(self.client.get("/dashboard").get_data(as_text=True).split())
+        self.assertEqual(cache.calculos, 3)
+        self.assertIn("<span>em lavagem (1)</span>", texto)
+
+    def test_reconstrucao_corrige_divergencias(self) -> None:
+        with self.app.app_context():
+            db.session.query(ResumoInventario).update({"quantidade": 99})
+            db.session.commit()
+            self.assertEqual(len(divergencias_resumo()), 2)
+
+            self.assertEqual(reconstruir_resumo(), 2)
+            self.assertEqual(divergencias_resumo(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
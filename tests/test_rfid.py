@@ -0,0 +1,426 @@
+import signal
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, update
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app
+from app.eventos import BarramentoEventos
+from app.ingestao import _encerrar_filas
+from app.models import EnxovalItem, Movimentacao, Revisao, db
+from app.rfid import gravar_leituras
+
+
+class RfidApiTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+            }
+        )
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            for indice in range(1, 4):
+                db.session.add(
+                    EnxovalItem(
+                        nome="Bata",
+                        codigo=f"BA-{indice:04d}",
+                        tamanho="M",
+                        status="estoque",
+                        tag_rfid=f"TAG-{indice:04d}",
+                    )
+                )
+            db.session.commit()
+
+    def test_tag_normalizada_na_gravacao_e_na_busca(self) -> None:
+        with self.app.app_context():
+            db.session.add(
+                EnxovalItem(nome="Capuz", codigo="CP-0001", tamanho="G", tag_rfid=" e200 00ab ")
+            )
+            db.session.commit()
+            item = EnxovalItem.query.filter_by(codigo="CP-0001").one()
+            self.assertEqual(item.tag_rfid, "E20000AB")
+
+        resposta = self.client.get("/api/rfid/buscar/e200%2000ab")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.get_json()["item"]["codigo"], "CP-0001")
+
+        resposta = self.client.post("/api/rfid/scan", json={"tag_rfid": "e20000ab"})
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_cache_de_tags_e_invalidacao(self) -> None:
+        self.client.get("/api/rfid/buscar/TAG-0001")
+        resposta = self.client.post(
+            "/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "entregue"}
+        )
+        self.assertEqual(resposta.get_json()["item"]["status"], "entregue")
+        resposta = self.client.get("/api/rfid/buscar/TAG-0001")
+        self.assertEqual(resposta.get_json()["item"]["status"], "entregue")
+
+        # O scan grava pela tag, sem consultar o cache; só as buscas contam.
+        cache = self.client.get("/api/rfid/status").get_json()["cache_tags"]
+        self.assertEqual(cache["falhas"], 1)
+        self.assertEqual(cache["acertos"], 1)
+
+        with self.app.app_context():
+            item_id = EnxovalItem.query.filter_by(tag_rfid="TAG-0001").one().id
+        self.client.post(f"/inativar/{item_id}")
+        resposta = self.client.get("/api/rfid/buscar/TAG-0001")
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_troca_de_tag_fora_do_processo_move_a_peca_certa(self) -> None:
+        self.client.get("/api/rfid/buscar/TAG-0001")
+        self.client.get("/api/rfid/buscar/TAG-0002")
+        with self.app.app_context():
+            # Outro processo (ex.: scripts/import_csv.py --mesclar) troca as tags.
+            for origem, destino in (
+                ("TAG-0001", "TROCA"), ("TAG-0002", "TAG-0001"), ("TROCA", "TAG-0002")
+            ):
+                db.session.execute(
+                    text("UPDATE enxoval_items SET tag_rfid = :destino WHERE tag_rfid = :origem"),
+                    {"origem": origem, "destino": destino},
+                )
+            db.session.execute(
+                text("UPDATE enxoval_items SET setor = 'Abate' WHERE tag_rfid = 'TAG-0001'")
+            )
+            db.session.commit()
+            dono = EnxovalItem.query.filter_by(tag_rfid="TAG-0001").one()
+            dono_id, dono_setor = dono.id, dono.setor
+
+        resposta = self.client.post(
+            "/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "em_lavagem"}
+        )
+        item = resposta.get_json()["item"]
+        self.assertEqual((item["id"], item["setor"]), (dono_id, dono_setor))
+        with self.app.app_context():
+            self.assertEqual(db.session.get(EnxovalItem, dono_id).status, "em_lavagem")
+            movimentacao = Movimentacao.query.order_by(Movimentacao.id.desc()).first()
+            self.assertEqual(movimentacao.item_id, dono_id)
+        resposta = self.client.get("/api/rfid/buscar/TAG-0001")
+        self.assertEqual(resposta.get_json()["item"]["id"], dono_id)
+
+    def test_leituras_repetidas_na_janela_nao_geram_movimentacao(self) -> None:
+        leitura = {"tag_rfid": "TAG-0002", "status": "em_lavagem"}
+        primeira = self.client.post("/api/rfid/scan", json=leitura).get_json()
+        segunda = self.client.post("/api/rfid/scan", json=leitura).get_json()
+        self.assertNotIn("repetida", primeira)
+        self.assertTrue(segunda["repetida"])
+        self.assertEqual(segunda["item"]["status"], "em_lavagem")
+
+        resposta = self.client.post(
+            "/api/rfid/scan", json={"tag_rfid": "TAG-0002", "status": "disponivel"}
+        )
+        self.assertNotIn("repetida", resposta.get_json())
+        with self.app.app_context():
+            self.assertEqual(Movimentacao.query.count(), 2)
+
+        dedup = self.client.get("/api/rfid/status").get_json()["deduplicacao"]
+        self.assertEqual(dedup["suprimidos"], 1)
+
+    def test_sincronizacao_de_tags(self) -> None:
+        resposta = self.client.get("/api/rfid/tags")
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.get_json()
+        self.assertEqual(dados["total"], 3)
+        self.assertEqual(
+            [tag["tag_rfid"] for tag in dados["tags"]], ["TAG-0001", "TAG-0002", "TAG-0003"]
+        )
+        etag = resposta.headers["ETag"]
+        resposta = self.client.get("/api/rfid/tags", headers={"If-None-Match": etag})
+        self.assertEqual(resposta.status_code, 304)
+
+        cursor = dados["cursor"]
+        resposta = self.client.get("/api/rfid/tags", query_string={"since": cursor})
+        # Alterações dentro da margem antes do cursor são entregues de novo.
+        self.assertEqual(len(resposta.get_json()["alteradas"]), 3)
+        self.app.config["RFID_SINCRONIZACAO_MARGEM_SEGUNDOS"] = 0
+        resposta = self.client.get("/api/rfid/tags", query_string={"since": cursor})
+        self.assertEqual(resposta.get_json()["alteradas"], [])
+
+        self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "entregue"})
+        with self.app.app_context():
+            item_id = EnxovalItem.query.filter_by(tag_rfid="TAG-0002").one().id
+        self.client.post(f"/item/{item_id}/excluir")
+
+        resposta = self.client.get("/api/rfid/tags", query_string={"since": cursor})
+        dados = resposta.get_json()
+        self.assertEqual([tag["tag_rfid"] for tag in dados["alteradas"]], ["TAG-0001"])
+        self.assertEqual(dados["alteradas"][0]["status"], "entregue")
+        self.assertEqual(dados["removidas"], ["TAG-0002"])
+        self.assertGreater(dados["cursor"], cursor)
+
+        resposta = self.client.get("/api/rfid/tags", headers={"If-None-Match": etag})
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_sincronizacao_entrega_transacao_confirmada_depois_do_cursor(self) -> None:
+        cursor = self.client.get("/api/rfid/tags").get_json()["cursor"]
+        with self.app.app_context():
+            # Gravação com instante anterior ao cursor, confirmada só agora.
+            atrasado = datetime.fromisoformat(cursor) - timedelta(seconds=5)
+            db.session.execute(
+                update(EnxovalItem)
+                .where(EnxovalItem.tag_rfid == "TAG-0003")
+                .values(status="entregue", atualizado_em=atrasado)
+            )
+            db.session.commit()
+
+        dados = self.client.get("/api/rfid/tags", query_string={"since": cursor}).get_json()
+        tags = {tag["tag_rfid"]: tag["status"] for tag in dados["alteradas"]}
+        self.assertEqual(tags["TAG-0003"], "entregue")
+        self.assertEqual(dados["cursor"], cursor)
+
+    def test_etag_muda_com_transacao_confirmada_depois_do_cursor(self) -> None:
+        resposta = self.client.get("/api/rfid/tags")
+        etag, cursor = resposta.get_etag()[0], resposta.get_json()["cursor"]
+        with self.app.app_context():
+            atrasado = datetime.fromisoformat(cursor) - timedelta(seconds=5)
+            db.session.execute(
+                update(EnxovalItem)
+                .where(EnxovalItem.tag_rfid == "TAG-0001")
+                .values(status="entregue", atualizado_em=atrasado)
+            )
+            db.session.commit()
+
+        resposta = self.client.get("/api/rfid/tags", headers={"If-None-Match": etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.get_json()["cursor"], cursor)
+
+    def test_ingestao_assincrona_grava_em_lote(self) -> None:
+        self.app.config["RFID_INGESTAO_ASSINCRONA"] = True
+        for tag in ("TAG-0001", "TAG-0002", "TAG-0003"):
+            resposta = self.client.post(
+                "/api/rfid/scan", json={"tag_rfid": tag, "status": "em_lavagem"}
+            )
+            self.assertEqual(resposta.status_code, 202)
+        resposta = self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-9999"})
+        self.assertEqual(resposta.status_code, 404)
+
+        fila = self.app.extensions["fila_ingestao_rfid"]
+        fila.aguardar()
+        with self.app.app_context():
+            self.assertEqual(EnxovalItem.query.filter_by(status="em_lavagem").count(), 3)
+            self.assertEqual(Movimentacao.query.count(), 3)
+
+        estatisticas = self.client.get("/api/rfid/status").get_json()["fila_ingestao"]
+        self.assertEqual(estatisticas["gravadas"], 3)
+        self.assertEqual(estatisticas["profundidade"], 0)
+        fila.parar()
+
+    def test_fila_encerrada_recusa_leituras(self) -> None:
+        self.app.config["RFID_INGESTAO_ASSINCRONA"] = True
+        fila = self.app.extensions["fila_ingestao_rfid"]
+        fila.parar()
+        resposta = self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0001"})
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(fila.estatisticas()["rejeitadas"], 1)
+
+    def test_sigterm_instalado_so_com_ingestao_assincrona(self) -> None:
+        anterior = signal.getsignal(signal.SIGTERM)
+        self.assertIsNot(anterior, _encerrar_filas)
+        try:
+            create_app(
+                {
+                    "TESTING": True,
+                    "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+                    "RFID_INGESTAO_ASSINCRONA": True,
+                }
+            )
+            self.assertIs(signal.getsignal(signal.SIGTERM), _encerrar_filas)
+        finally:
+            signal.signal(signal.SIGTERM, anterior)
+
+    def test_falha_no_scan_permite_repetir_leitura(self) -> None:
+        with self.app.app_context():
+            db.session.execute(
+                text(
+                    "CREATE TRIGGER falha_entregue BEFORE UPDATE ON enxoval_items "
+                    "WHEN new.status = 'entregue' "
+                    "BEGIN SELECT RAISE(ABORT, 'falha simulada'); END"
+                )
+            )
+            db.session.commit()
+        for rota, corpo in (
+            ("/api/rfid/scan", {"tag_rfid": "TAG-0001"}),
+            ("/api/rfid/scan/lote", {"tags": ["TAG-0002", "TAG-0003"]}),
+        ):
+            with self.assertRaises(IntegrityError):
+                self.client.post(rota, json={**corpo, "status": "entregue"})
+
+        with self.app.app_context():
+            db.session.execute(text("DROP TRIGGER falha_entregue"))
+            db.session.commit()
+        resposta = self.client.post(
+            "/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "entregue"}
+        )
+        self.assertNotIn("repetida", resposta.get_json())
+        resposta = self.client.post(
+            "/api/rfid/scan/lote", json={"tags": ["TAG-0002", "TAG-0003"], "status": "entregue"}
+        )
+        self.assertEqual(resposta.get_json()["atualizadas"], 2)
+        with self.app.app_context():
+            self.assertEqual(EnxovalItem.query.filter_by(status="entregue").count(), 3)
+
+    def test_falha_na_gravacao_em_lote_permite_repetir_leitura(self) -> None:
+        self.client.get("/api/rfid/buscar/TAG-0001")
+        with self.app.app_context():
+            db.session.execute(
+                text(
+                    "CREATE TRIGGER falha_disponivel BEFORE UPDATE ON enxoval_items "
+                    "WHEN new.status = 'disponivel' "
+                    "BEGIN SELECT RAISE(ABORT, 'falha simulada'); END"
+                )
+            )
+            db.session.commit()
+            leituras = [
+                {"tag_rfid": "TAG-0001", "status": "em_lavagem"},
+                {"tag_rfid": "TAG-0002", "status": "disponivel"},
+            ]
+            dedup = self.app.extensions["dedup_rfid"]
+            for leitura in leituras:
+                leitura.update(setor=None, colaborador=None, observacao=None)
+                dedup.registrar((leitura["tag_rfid"], leitura["status"]))
+            with self.assertRaises(IntegrityError):
+                gravar_leituras(leituras)
+            db.session.rollback()
+
+            self.assertIsNone(self.app.extensions["cache_tags_rfid"].obter("TAG-0001"))
+            for leitura in leituras:
+                self.assertTrue(dedup.registrar((leitura["tag_rfid"], leitura["status"])))
+
+        resposta = self.client.get("/api/rfid/buscar/TAG-0001")
+        self.assertEqual(resposta.get_json()["item"]["status"], "estoque")
+
+    def test_stream_de_eventos_recebe_scans(self) -> None:
+        resposta = self.client.get("/api/rfid/eventos")
+        self.assertEqual(resposta.mimetype, "text/event-stream")
+        stream = iter(resposta.response)
+        self.assertTrue(next(stream).startswith(b"retry:"))
+
+        self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0003", "status": "entregue"})
+        evento = next(stream).decode()
+        self.assertIn("event: scan", evento)
+        self.assertIn('"codigo":"BA-0003"', evento.replace(" ", ""))
+        resposta.close()
+        self.assertEqual(self.app.extensions["eventos"].estatisticas()["assinantes"], 0)
+
+    def test_descartes_contados_apos_cancelar_assinatura(self) -> None:
+        barramento = BarramentoEventos(tamanho_buffer=2)
+        assinatura = barramento.assinar()
+        for indice in range(5):
+            barramento.publicar("scan", {"indice": indice})
+        self.assertEqual(barramento.estatisticas()["descartados"], 3)
+        barramento.cancelar(assinatura)
+        self.assertEqual(
+            barramento.estatisticas(), {"assinantes": 0, "publicados": 5, "descartados": 3}
+        )
+
+    def test_status_com_estatisticas_agregadas(self) -> None:
+        with self.app.app_context():
+            db.session.add(EnxovalItem(nome="Capuz", codigo="CP-0001", tamanho="G"))
+            db.session.commit()
+        self.client.post("/api/rfid/scan", json={"tag_rfid": "TAG-0001", "status": "entregue"})
+
+        dados = self.client.get("/api/rfid/status").get_json()
+        estatisticas = dados["estatisticas"]
+        self.assertEqual(estatisticas["total_com_rfid"], 3)
+        self.assertEqual(estatisticas["total_sem_rfid"], 1)
+        self.assertEqual(estatisticas["total_ativos"], 4)
+        self.assertEqual(
+            estatisticas["por_status"],
+            {
+                "entregue": {"com_rfid": 1, "sem_rfid": 0},
+                "estoque": {"com_rfid": 2, "sem_rfid": 1},
+            },
+        )
+        self.assertEqual(dados["ingestao"]["scans_por_minuto"], 1)
+        self.assertIsNotNone(dados["ingestao"]["ultimo_scan_em"])
+
+    def test_scan_lote(self) -> None:
+        resposta = self.client.post(
+            "/api/rfid/scan/lote",
+            json={
+                "tags": ["tag-0001", {"tag_rfid": "TAG-0002"}, "TAG-0001", "TAG-9999"],
+                "status": "em_lavagem",
+                "setor": "Lavanderia",
+            },
+        )
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.get_json()
+        self.assertEqual(dados["total"], 4)
+        self.assertEqual(dados["atualizadas"], 2)
+        self.assertEqual(dados["repetidas"], 1)
+        self.assertEqual(dados["nao_encontradas"], 1)
+        self.assertEqual(
+            [resultado["sucesso"] for resultado in dados["resultados"]],
+            [True, True, True, False],
+        )
+        self.assertEqual(dados["resultados"][0]["item"]["status"], "em_lavagem")
+
+        with self.app.app_context():
+            item = EnxovalItem.query.filter_by(codigo="BA-0001").one()
+            self.assertEqual(item.status, "em_lavagem")
+            self.assertEqual(item.setor, "Lavanderia")
+            movimentacao = Movimentacao.query.filter_by(item_id=item.id).one()
+            self.assertEqual(item.ultima_movimentacao_em, movimentacao.created_at)
+            self.assertEqual(Movimentacao.query.count(), 2)
+
+    def test_scan_lote_valida_entrada(self) -> None:
+        resposta = self.client.post("/api/rfid/scan/lote", json={"tags": []})
+        self.assertEqual(resposta.status_code, 400)
+
+        self.app.config["RFID_LOTE_MAXIMO"] = 2
+        resposta = self.client.post(
+            "/api/rfid/scan/lote", json={"tags": ["TAG-0001", "TAG-0002", "TAG-0003"]}
+        )
+        self.assertEqual(resposta.status_code, 413)
+
+    def test_reconciliacao_de_setor(self) -> None:
+        with self.app.app_context():
+            for item in EnxovalItem.query.filter(EnxovalItem.codigo != "BA-0003"):
+                item.setor = "Desossa"
+            EnxovalItem.query.filter_by(codigo="BA-0003").one().setor = "Abate"
+            db.session.commit()
+
+        dados = {"setor": "Desossa", "tags": ["tag-0001", "TAG-0003", "TAG-9999", "TAG-0001"]}
+        for _ in range(2):
+            resposta = self.client.post("/api/rfid/reconciliar", json=dados)
+            self.assertEqual(resposta.status_code, 200)
+            resultado = resposta.get_json()
+            self.assertEqual(resultado["lidas"], 3)
+            self.assertEqual([i["codigo"] for i in resultado["faltantes"]], ["BA-0002"])
+            self.assertEqual([i["codigo"] for i in resultado["inesperadas"]], ["BA-0003"])
+            self.assertEqual(resultado["desconhecidas"], ["TAG-9999"])
+            self.assertEqual(resultado["revisoes_registradas"], 0)
+
+        resposta = self.client.post(
+            "/api/rfid/reconciliar", json={**dados, "registrar": True}
+        )
+        self.assertEqual(resposta.status_code, 400)
+
+        with self.app.app_context():
+            alteracoes = dict(db.session.query(EnxovalItem.codigo, EnxovalItem.atualizado_em))
+        resposta = self.client.post(
+            "/api/rfid/reconciliar", json={**dados, "registrar": True, "conferente": "Ana"}
+        )
+        self.assertEqual(resposta.get_json()["revisoes_registradas"], 2)
+        with self.app.app_context():
+            revisoes = {(r.item.codigo, r.setor, r.conferente) for r in Revisao.query}
+            self.assertEqual(
+                revisoes, {("BA-0001", "Desossa", "Ana"), ("BA-0003", "Abate", "Ana")}
+            )
+            revisadas = {
+                item.codigo
+                for item in EnxovalItem.query.filter(EnxovalItem.ultima_revisao_em.isnot(None))
+            }
+            self.assertEqual(revisadas, {"BA-0001", "BA-0003"})
+            # A revisão não conta como alteração para a sincronização dos leitores.
+            self.assertEqual(
+                dict(db.session.query(EnxovalItem.codigo, EnxovalItem.atualizado_em)), alteracoes
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()